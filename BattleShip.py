@@ -2,6 +2,11 @@ from __future__ import annotations
 from typing import *
 from enum import Enum
 
+from linesolver import SHIP, UNKNOWN, WATER, solve_line
+from budget import Budget
+from stats import Stats
+from tracer import Tracer
+
 
 class Direction:
     x: int
@@ -192,32 +197,28 @@ class Board:
     second_middle_pieces_remaining: int
     row_constraints: List[int]
     col_constraints: List[int]
+    fleet: Tuple[int, ...]
 
     def __init__(self, size: int, board_str: Optional[List[List[str]]] = None, ship_sizes: List[int] = None,
                  row_constraints: List[int] = None, col_constraints: List[int] = None):
+        self.size = size
         self.row_constraints = row_constraints
         self.col_constraints = col_constraints
         if board_str:
+            self.fleet = tuple(ship_sizes)
             self.submarine_pieces_remaining = ship_sizes[0]
             self.start_pieces_remaining = ship_sizes[1] + ship_sizes[2] + ship_sizes[3]
             self.end_pieces_remaining = self.start_pieces_remaining
             self.first_middle_pieces_remaining = ship_sizes[2] + ship_sizes[3]
             self.second_middle_pieces_remaining = ship_sizes[3]
-            self.size = size
             self.board = [[Variable() for _ in range(size)] for _ in range(size)]
             self.queue = []
 
-            print("before handling edges\n", self)
             self.handle_edges()
-            print("after handling edges\n", self)
             self.handle_ship_constraints()
-            print("after handling ship constraints\n", self)
             self.handle_board_str(board_str)
-            print("after handling board str\n", self)
             self.handle_check_for_row_col_sizes()
-            print("after handling row col sizes\n", self)
             self.forward_check()
-            print("after forward checking\n", self)
 
     def handle_check_for_row_col_sizes(self):
         for y in range(self.size):
@@ -256,11 +257,11 @@ class Board:
             self.remove_from_all_domains_by_fun(lambda x: x.part == Part.SecondMiddle)
 
     def handle_edges(self):
-        for y in range(size):
+        for y in range(self.size):
             left_col = Direction(0, y)
-            right_col = Direction(size - 1, y)
+            right_col = Direction(self.size - 1, y)
             top_row = Direction(y, 0)
-            bottom_row = Direction(y, size - 1)
+            bottom_row = Direction(y, self.size - 1)
             self.remove_from_domain_by_fun(left_col, lambda x: (x.is_horizontal() and x.part != Part.Start))
             self.remove_from_domain_by_fun(right_col, lambda x: (x.is_horizontal() and x.part != Part.End))
             self.remove_from_domain_by_fun(top_row, lambda x: x.is_vert() and x.part != Part.Start)
@@ -294,6 +295,7 @@ class Board:
         new.queue = []
         new.row_constraints = self.row_constraints
         new.col_constraints = self.col_constraints
+        new.fleet = self.fleet
         new.submarine_pieces_remaining = self.submarine_pieces_remaining
         new.start_pieces_remaining = self.start_pieces_remaining
         new.end_pieces_remaining = self.end_pieces_remaining
@@ -312,19 +314,60 @@ class Board:
                     shortest_location = location
 
         return shortest_location
-    def backtracking_search(self) -> Optional[Board]:
+    def domain_sizes(self) -> int:
+        return sum(len(variable.domain) for row in self.board for variable in row)
+
+    def assignment_id(self, location: Direction, value: Value) -> int:
+        return (location.y * self.size + location.x) * len(values) + values.index(value)
+
+    def backtracking_search(self, stats: Optional[Stats] = None, depth: int = 0, tracer: Optional[Tracer] = None,
+                            budget: Optional[Budget] = None) -> Optional[Board]:
 
         location = self.find_shortest_domain()
         if location is None:
+            if tracer is not None:
+                tracer.on_solution(depth)
             return self
+        if budget is not None:
+            budget.tick()
+            if depth > budget.partial_depth:
+                budget.keep(depth, self.__repr__())
+        if stats is not None:
+            stats.node(depth)
+        if tracer is not None:
+            tracer.on_node(depth)
         item = self[location]
         for value in item.domain:
             try:
                 new_board = self.__copy__()
-                new_board.set(location, value)
-                new_board.forward_check()
-                return new_board.backtracking_search()
+                if tracer is not None:
+                    tracer.on_assign(depth, self.assignment_id(location, value))
+                if stats is None and tracer is None:
+                    new_board.set(location, value)
+                    new_board.forward_check()
+                else:
+                    if stats is not None:
+                        stats.placements += 1
+                    before = new_board.domain_sizes()
+                    try:
+                        new_board.set(location, value)
+                        if stats is None:
+                            new_board.forward_check()
+                        else:
+                            with stats.phase("propagation"):
+                                new_board.forward_check()
+                    finally:
+                        pruned = before - new_board.domain_sizes()
+                        if stats is not None:
+                            stats.prune("forward check", pruned)
+                        if tracer is not None and pruned:
+                            tracer.on_prune(depth + 1, "forward check", pruned)
+                return new_board.backtracking_search(stats, depth + 1, tracer, budget)
             except InvalidBoardException:
+                if stats is not None:
+                    stats.backtracks += 1
+                if tracer is not None:
+                    tracer.on_fail(depth, self.assignment_id(location, value))
                 continue
             except Exception as e:
                 raise e
@@ -334,9 +377,39 @@ class Board:
     def forward_check(self):
         self.run_queue()
         self.check_row_and_col_constraints()
+        self.check_lines()
         if self.queue:
             self.forward_check()
 
+    def line_state(self, location: Direction) -> str:
+        item = self[location]
+        if item.value is not None:
+            return WATER if item.value == water else SHIP
+        if water not in item.domain:
+            return SHIP
+        if len(item.domain) == 1:
+            return WATER
+        return UNKNOWN
+
+    def check_lines(self):
+        for y in range(self.size):
+            self.apply_line([Direction(x, y) for x in range(self.size)], self.row_constraints[y])
+        for x in range(self.size):
+            self.apply_line([Direction(x, y) for y in range(self.size)], self.col_constraints[x])
+
+    def apply_line(self, locations: List[Direction], constraint: int):
+        line = "".join(self.line_state(location) for location in locations)
+        forced = solve_line(line, constraint, self.fleet)
+        if forced is None:
+            raise InvalidBoardException("Invalid board")
+        for state, previous, location in zip(forced, line, locations):
+            if state == previous:
+                continue
+            if state == WATER:
+                self.remove_from_domain_by_fun(location, lambda x: x.is_ship)
+            elif state == SHIP:
+                self.remove_from_domain(location, water)
+
 
 
     def check_row_and_col_constraints(self):
@@ -374,6 +447,15 @@ class Board:
     def __repr__(self):
         return "\n".join([row.__repr__() for row in self.board]) + "\n"
 
+    def solution(self) -> str:
+        # the solution in the puzzle file notation, with the vertical and horizontal middles drawn as M
+        rows = []
+        for row in self.board:
+            values = [variable.value if variable.value else variable.domain[0] for variable in row]
+            rows.append("".join("M" if value.__repr__() in ["|", "||", "-", "--"] else value.__repr__()
+                                for value in values))
+        return "\n".join(rows)
+
     def __getitem__(self, item: Direction):
         if item.x < 0 or item.x >= self.size or item.y < 0 or item.y >= self.size:
             return None
@@ -481,14 +563,89 @@ class Board:
 
 
 if __name__ == '__main__':
-    file = open("hard2.txt", "r")
-    board_str = file.read().splitlines()
-    board_str = [list(row) for row in board_str]
-    sizes = [int(x) for x in board_str[2]]
-    row_constraints = [int(x) for x in board_str[0]]
-    col_constraints = [int(x) for x in board_str[1]]
-    size = len(board_str[0])
-    board_str = board_str[3:]
-    board = Board(size, board_str, sizes, row_constraints, col_constraints)
-    print(board)
-    print(board[Direction(3, 0)].value)
+    import argparse
+    import sys
+
+    from budget import EXIT_CODES, SOLVED, TIMEOUT, UNSAT, BudgetExceeded
+    # UNKNOWN is the linesolver cell glyph in this module
+    from budget import UNKNOWN as NO_VERDICT
+    from precheck import MalformedPuzzle, precheck
+    from puzzle import read_puzzle, verify
+    from stats import phase
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        default=None,
+        help="Report search statistics on stderr in the given format."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds of search."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="Give up after this many search nodes."
+    )
+    args = parser.parse_args()
+    stats = Stats() if args.stats else None
+    with phase(stats, "parse"):
+        puzzle = read_puzzle(args.inputfile)
+    try:
+        reason = precheck(puzzle)
+    except MalformedPuzzle as error:
+        sys.exit("malformed puzzle: {}".format(error))
+    budget = Budget(args.timeout, args.max_nodes) if args.timeout is not None or args.max_nodes is not None else None
+    solution = None
+    # only precheck proves a puzzle unsatisfiable here, this search is kept for comparison and misses solutions,
+    # draws wrong grids and fails outright, so anything short of a verified grid leaves the answer unknown
+    status = UNSAT
+    if reason is None:
+        status = NO_VERDICT
+        try:
+            with phase(stats, "search"):
+                board = Board(puzzle.size, puzzle.board_str, list(puzzle.ship_constraints),
+                              list(puzzle.row_constraints), list(puzzle.col_constraints))
+                result = board.backtracking_search(stats, budget=budget)
+            solution = result.solution() if result is not None else None
+            reason = "the search found no solution" if solution is None else None
+        except BudgetExceeded:
+            status = TIMEOUT
+        except InvalidBoardException:
+            reason = "the search gave up on the board"
+        except Exception as error:
+            reason = "the search failed with {}: {}".format(type(error).__name__, error)
+        if solution is not None:
+            if verify(puzzle, solution):
+                status = SOLVED
+            else:
+                reason = "the search drew a grid that breaks the puzzle:\n{}".format(solution)
+                solution = None
+    with phase(stats, "output"):
+        write_file = open(args.outputfile, 'w')
+        write_file.write(solution.__repr__() if solution is None else solution)
+        print(solution)
+    if status != SOLVED:
+        print("status: {}".format(status), file=sys.stderr)
+    if reason is not None:
+        print("reason: {}".format(reason), file=sys.stderr)
+    if stats is not None:
+        print(stats.to_json(), file=sys.stderr)
+    sys.exit(EXIT_CODES[status])
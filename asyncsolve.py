@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import weakref
+from typing import *
+
+from budget import SolveResult
+from puzzle import Puzzle
+from service import warm_up
+from solver import solve
+
+JobKey = Tuple[str, int, Tuple[int, ...], Tuple[int, ...], Tuple[int, ...], Tuple[str, ...], Optional[float],
+               Optional[int]]
+
+
+def worker_main(connection):
+    warm_up()
+    while True:
+        try:
+            engine, puzzle, timeout, max_nodes = connection.recv()
+        except EOFError:
+            return
+        try:
+            result = solve(puzzle, engine, timeout, max_nodes)
+        except Exception as e:
+            result = e
+        connection.send(result)
+
+
+class Worker:
+    process: multiprocessing.Process
+    connection: Any
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+    def stop(self):
+        self.kill()
+        self.connection.close()
+
+
+class AsyncSolver:
+    """Solves puzzles in a managed pool of worker processes without blocking the event loop.
+
+    At most `workers` jobs run at once, further requests wait on a semaphore. Concurrent requests for the
+    same puzzle and options share one job. Cancelling the awaiting task cancels the job once nobody else is
+    waiting for it, which kills its worker process; a fresh worker takes its place on the next job.
+    """
+    workers: int
+    context: Any
+    semaphore: asyncio.Semaphore
+    idle: List[Worker]
+    jobs: Dict[JobKey, Tuple[asyncio.Task, List[int]]]
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.context = multiprocessing.get_context()
+        self.semaphore = asyncio.Semaphore(self.workers)
+        self.idle = []
+        self.jobs = {}
+
+    async def solve(self, puzzle: Puzzle, engine: str = "battle", timeout: Optional[float] = None,
+                    max_nodes: Optional[int] = None) -> SolveResult:
+        key = (engine, puzzle.size, tuple(puzzle.row_constraints), tuple(puzzle.col_constraints),
+               tuple(puzzle.ship_constraints), tuple("".join(row) for row in puzzle.board_str), timeout, max_nodes)
+        if key not in self.jobs:
+            task = asyncio.ensure_future(self.run(engine, puzzle, timeout, max_nodes))
+            self.jobs[key] = (task, [0])
+            task.add_done_callback(lambda done: self.jobs.pop(key, None))
+        task, waiting = self.jobs[key]
+        waiting[0] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and waiting[0] == 1:
+                task.cancel()
+            raise
+        finally:
+            waiting[0] -= 1
+
+    async def run(self, engine: str, puzzle: Puzzle, timeout: Optional[float],
+                  max_nodes: Optional[int]) -> SolveResult:
+        async with self.semaphore:
+            worker = self.idle.pop() if self.idle else Worker(self.context)
+            loop = asyncio.get_running_loop()
+            pending = None
+            try:
+                worker.connection.send((engine, puzzle, timeout, max_nodes))
+                # shielded, a cancel must not abandon the executor thread while it is still reading
+                pending = loop.run_in_executor(None, worker.connection.recv)
+                result = await asyncio.shield(pending)
+            except BaseException:
+                # Cancelled or the worker died, it may be half way through a search so it cannot be reused. The
+                # connection is only closed once the thread reading from it is done, which killing the worker
+                # brings about with an EOFError.
+                worker.kill()
+                while pending is not None and not pending.done():
+                    try:
+                        await asyncio.wait([pending])
+                    except asyncio.CancelledError:
+                        # cancelled again, by close() say, which must not leave the connection open either
+                        pass
+                if pending is not None and not pending.cancelled():
+                    pending.exception()
+                worker.connection.close()
+                raise
+            self.idle.append(worker)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def close(self):
+        tasks = [task for task, _ in self.jobs.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for worker in self.idle:
+            worker.stop()
+        self.idle = []
+
+    async def __aenter__(self) -> AsyncSolver:
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+# asyncio primitives belong to one event loop, so the shared solver is kept per loop
+default_solvers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+async def solve_async(puzzle: Puzzle, engine: str = "battle", timeout: Optional[float] = None,
+                      max_nodes: Optional[int] = None) -> SolveResult:
+    """Solve with a process pool shared by everything running on this event loop, sized to the number of
+    cores."""
+    loop = asyncio.get_running_loop()
+    if loop not in default_solvers:
+        default_solvers[loop] = AsyncSolver()
+    return await default_solvers[loop].solve(puzzle, engine, timeout, max_nodes)
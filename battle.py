@@ -2,16 +2,31 @@ from __future__ import annotations
 
 import argparse
 import copy
+import itertools
+import random
+import sys
 import time
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import *
 from enum import Enum
 
+from budget import SOLVED, TIMEOUT, UNSAT, Budget, BudgetExceeded, SolveResult
+from linesolver import SHIP, UNKNOWN, WATER, solve_line
+from precheck import MalformedPuzzle, precheck
+from puzzle import Puzzle, read_puzzle
+from stats import Stats, phase
+from symmetry import Symmetry, puzzle_symmetries, transform_cell, transform_grid
+from tracer import Tracer, open_tracer
+
 
 class Direction:
+    __slots__ = ("x", "y", "vertical")
     x: int
     y: int
-    vertical: Optional[bool] = None
+    vertical: Optional[bool]
 
     def __init__(self, x: int, y: int, vertical: Optional[bool] = None):
         self.x = x
@@ -27,6 +42,7 @@ class Direction:
 
 @dataclass
 class Ship:
+    __slots__ = ("size", "first_piece", "vertical")
     size: int
     first_piece: Direction
     vertical: bool
@@ -60,125 +76,483 @@ class Ship:
         return upper_left, bottom_right
 
 
+# The search works on placement ids instead of Ship objects. A placement id packs the first cell, the
+# orientation and the size into one int: ((y * board_size + x) * 2 + vertical) * 4 + size - 1.
+# Dropping the size bits gives the slot of the placement inside the Domain of its size.
+
+def placement_id(size: int, x: int, y: int, vertical: bool, board_size: int) -> int:
+    return ((y * board_size + x) * 2 + vertical) * 4 + size - 1
+
+
+class PlacementTable:
+    board_size: int
+    cells: List[Tuple[int, ...]]
+    glyphs: List[bytes]
+    conflicts: List[List[Tuple[int, ...]]]
+    covers: List[List[Tuple[int, ...]]]
+    surrounds: List[List[Tuple[int, ...]]]
+    row_lines: List[List[Tuple[int, ...]]]
+    col_lines: List[List[Tuple[int, ...]]]
+    row_touching: List[List[Tuple[int, ...]]]
+    col_touching: List[List[Tuple[int, ...]]]
+
+    def __init__(self, board_size: int):
+        # cells[id] are the cells a placement covers (empty if it leaves the board), conflicts[id][size - 1]
+        # the slots of that size it rules out, covers/surrounds[size - 1][cell] the slots that put a ship on
+        # the cell or water around it, and row/col_lines and row/col_touching the slots along and across lines.
+        n = board_size
+        self.board_size = n
+        self.cells = []
+        for slot in range(2 * n * n):
+            cell, vertical = divmod(slot, 2)
+            y, x = divmod(cell, n)
+            for size in range(1, 5):
+                if vertical and y + size <= n:
+                    self.cells.append(tuple((y + offset) * n + x for offset in range(size)))
+                elif not vertical and x + size <= n:
+                    self.cells.append(tuple(y * n + x + offset for offset in range(size)))
+                else:
+                    self.cells.append(())
+        self.glyphs = []
+        for placement in range(8 * n * n):
+            size = (placement & 3) + 1
+            if size == 1:
+                glyph = b"S"
+            elif placement >> 2 & 1:
+                glyph = b"^" + b"M" * (size - 2) + b"v"
+            else:
+                glyph = b"<" + b"M" * (size - 2) + b">"
+            self.glyphs.append(glyph if self.cells[placement] else b"")
+
+        self.covers = [[() for _ in range(n * n)] for _ in range(4)]
+        self.row_lines = [[() for _ in range(n)] for _ in range(4)]
+        self.col_lines = [[() for _ in range(n)] for _ in range(4)]
+        self.row_touching = [[() for _ in range(n)] for _ in range(4)]
+        self.col_touching = [[() for _ in range(n)] for _ in range(4)]
+        for slot in range(2 * n * n):
+            for size in range(1, 5):
+                cells = self.cells[slot * 4 + size - 1]
+                for cell in cells:
+                    self.covers[size - 1][cell] += (slot,)
+                for row in sorted({cell // n for cell in cells}):
+                    self.row_touching[size - 1][row] += (slot,)
+                for col in sorted({cell % n for cell in cells}):
+                    self.col_touching[size - 1][col] += (slot,)
+                if cells and slot % 2 == 0:
+                    self.row_lines[size - 1][cells[0] // n] += (slot,)
+                elif cells:
+                    self.col_lines[size - 1][cells[0] % n] += (slot,)
+
+        self.surrounds = [[() for _ in range(n * n)] for _ in range(4)]
+        for size in range(1, 5):
+            for cell in range(n * n):
+                inside = set(self.covers[size - 1][cell])
+                touching = set()
+                for neighbour in self.neighbourhood(cell):
+                    touching.update(self.covers[size - 1][neighbour])
+                self.surrounds[size - 1][cell] = tuple(sorted(touching - inside))
+
+        self.conflicts = []
+        for placement in range(8 * n * n):
+            halo = set()
+            for cell in self.cells[placement]:
+                halo.update(self.neighbourhood(cell))
+            self.conflicts.append([tuple(sorted({slot for cell in halo for slot in self.covers[size - 1][cell]}))
+                                   for size in range(1, 5)])
+
+    def neighbourhood(self, cell: int) -> List[int]:
+        n = self.board_size
+        y, x = divmod(cell, n)
+        return [ny * n + nx for ny in range(max(0, y - 1), min(n, y + 2)) for nx in range(max(0, x - 1), min(n, x + 2))]
+
+    def glyph(self, placement: int, cell: int) -> int:
+        return self.glyphs[placement][self.cells[placement].index(cell)]
+
+    def ship(self, placement: int) -> Ship:
+        slot = placement >> 2
+        cell, vertical = divmod(slot, 2)
+        y, x = divmod(cell, self.board_size)
+        return Ship((placement & 3) + 1, Direction(x, y, bool(vertical)), bool(vertical))
+
+
+@lru_cache(maxsize=None)
+def placement_table(board_size: int) -> PlacementTable:
+    return PlacementTable(board_size)
+
+
+# what a partial board says about a placement, for the symmetry breaking test
+EXCLUDED = 0
+PLACED = 1
+UNDECIDED = 2
+
+
+def placement_image(placement: int, symmetry: Symmetry, board_size: int) -> int:
+    # a submarine maps to the horizontal copy of its cell, the one its domain keeps
+    cells = sorted(transform_cell(cell % board_size, cell // board_size, board_size, symmetry)[::-1]
+                   for cell in placement_table(board_size).cells[placement])
+    (y, x), size = cells[0], len(cells)
+    return placement_id(size, x, y, size > 1 and cells[1][1] == x, board_size)
+
+
+class SymmetryBreaker:
+    """Lex-leader symmetry breaking for a puzzle that is its own mirror image or rotation. A solution is read
+    as a 0/1 vector over placement ids and only the greatest solution of each orbit is searched for: for every
+    symmetry, at the first id where a solution and its image differ the solution must hold the ship. Partial
+    boards are tested with placed ships as 1, pruned placements as 0, and the test stops at the first
+    undecided pair."""
+    size: int
+    symmetries: List[Symmetry]
+    pairs: List[List[Tuple[int, int]]]
+
+    def __init__(self, size: int, symmetries: List[Symmetry]):
+        # symmetries must be closed under inverses, puzzle_symmetries gives such a set
+        self.size = size
+        self.symmetries = symmetries
+        table = placement_table(size)
+        placements = [placement for placement in range(8 * size * size)
+                      if table.cells[placement] and not (placement & 3 == 0 and placement >> 2 & 1)]
+        self.pairs = []
+        for symmetry in symmetries:
+            images = [(placement, placement_image(placement, symmetry, size)) for placement in placements]
+            self.pairs.append([(placement, image) for placement, image in images if placement != image])
+
+    def values(self, board: Board) -> bytearray:
+        values = bytearray(8 * self.size * self.size)
+        for domain in board.all_domains():
+            if domain.num_ships_remaining:
+                for slot, alive in enumerate(domain.live):
+                    if alive:
+                        values[domain.placement(slot)] = UNDECIDED
+        for placement in board.ships:
+            values[placement] = PLACED
+        return values
+
+    def violated(self, board: Board) -> bool:
+        values = self.values(board)
+        for pairs in self.pairs:
+            for placement, image in pairs:
+                ours = values[placement]
+                theirs = values[image]
+                if ours != theirs or ours == UNDECIDED:
+                    if ours == EXCLUDED and theirs == PLACED:
+                        return True
+                    break
+        return False
+
+    def orbit(self, solution: str) -> List[str]:
+        """The distinct solutions a solution maps to, itself included."""
+        rows = solution.split()
+        images = {"\n".join(transform_grid(rows, symmetry)) for symmetry in self.symmetries}
+        return [solution] + sorted(images - {solution})
+
+
+def symmetry_breaker(puzzle: Puzzle) -> Optional[SymmetryBreaker]:
+    symmetries = puzzle_symmetries(puzzle)
+    return SymmetryBreaker(puzzle.size, symmetries) if symmetries else None
+
+
 class ShipException(Exception):
-    pass
+    culprits: int
+
+    def __init__(self, message: str, culprits: int = -1):
+        # culprits is a bitmask over the search depths whose placements caused the failure,
+        # -1 means the cause is unknown and every placement on the path is blamed.
+        super().__init__(message)
+        self.culprits = culprits
+
+
+class NogoodStore:
+    capacity: int
+    nogoods: OrderedDict
+    watches: Dict[int, Set[FrozenSet[int]]]
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.nogoods = OrderedDict()
+        self.watches = {}
+
+    def add(self, nogood: FrozenSet[int]):
+        if not nogood or nogood in self.nogoods:
+            return
+        self.nogoods[nogood] = None
+        for key in nogood:
+            self.watches.setdefault(key, set()).add(nogood)
+        if len(self.nogoods) > self.capacity:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for key in evicted:
+                self.watches[key].discard(evicted)
+
+    def check(self, key: int, path: Dict[int, int]) -> Optional[FrozenSet[int]]:
+        for nogood in self.watches.get(key, ()):
+            if all(other in path for other in nogood if other != key):
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+
+def order_domain(board: Board, domain: Domain, moves: List[int], search: Search) -> List[int]:
+    return moves
+
+
+def order_least_constraining(board: Board, domain: Domain, moves: List[int], search: Search) -> List[int]:
+    others = [other for other in board.domains if other is not domain]
+    return sorted(moves, key=lambda move: sum(other.eliminated_by(move) for other in others))
+
+
+def order_tightest(board: Board, domain: Domain, moves: List[int], search: Search) -> List[int]:
+    # slack of a line is how many coverable cells it has beyond the ship cells it still needs
+    size = board.size
+    covered = board.covered_cells()
+    row_slack = [sum(covered[y * size:(y + 1) * size]) - board.row_constraints[y] for y in range(size)]
+    col_slack = [sum(covered[x::size]) - board.col_constraints[x] for x in range(size)]
+    cells = board.table.cells
+    return sorted(moves, key=lambda move: min(min(row_slack[cell // size], col_slack[cell % size])
+                                              for cell in cells[move]))
+
+
+def order_random(board: Board, domain: Domain, moves: List[int], search: Search) -> List[int]:
+    search.rng.shuffle(moves)
+    return moves
+
+
+VALUE_ORDERS: Dict[str, Callable[[Board, Domain, List[int], Search], List[int]]] = {
+    "domain": order_domain,
+    "lcv": order_least_constraining,
+    "tightest": order_tightest,
+    "random": order_random,
+}
+
+
+class Search:
+    nogoods: NogoodStore
+    order: Callable[[Board, Domain, List[int], Search], List[int]]
+    rng: random.Random
+    nodes: int
+    stats: Optional[Stats]
+    tracer: Optional[Tracer]
+    budget: Optional[Budget]
+    symmetry: Optional[SymmetryBreaker]
+    decompose: bool
+    observed: bool
+
+    def __init__(self, order: str = "domain", seed: Optional[int] = None, stats: Optional[Stats] = None,
+                 tracer: Optional[Tracer] = None, budget: Optional[Budget] = None,
+                 symmetry: Optional[SymmetryBreaker] = None, decompose: bool = False):
+        self.nogoods = NogoodStore()
+        self.order = VALUE_ORDERS[order]
+        self.rng = random.Random(seed)
+        self.nodes = 0
+        self.stats = stats
+        self.tracer = tracer
+        self.budget = budget
+        self.symmetry = symmetry
+        self.decompose = decompose
+        # prunes are only counted when someone listens, an unobserved search skips the bookkeeping
+        self.observed = stats is not None or tracer is not None
+
+
+@dataclass
+class Component:
+    """A group of live placements that shares no unfilled row or column with, and cannot touch, the
+    placements outside it, with the lines it has to fill and the slots it holds per ship size."""
+    rows: List[int]
+    cols: List[int]
+    slots: List[List[int]]
+
+    def fleets(self, board: Board) -> List[Tuple[int, ...]]:
+        # the ship counts per size that fill the component's rows exactly, it takes no other ship cells
+        demand = sum(board.row_constraints[row] for row in self.rows)
+        if demand != sum(board.col_constraints[col] for col in self.cols):
+            return []
+        limits = [min(domain.num_ships_remaining, len(slots)) for domain, slots in zip(board.all_domains(), self.slots)]
+        return [fleet for fleet in itertools.product(*[range(limit + 1) for limit in limits])
+                if sum(size * count for size, count in enumerate(fleet, 1)) == demand]
 
 
 class Domain:
     domain_size: int
     num_ships_remaining: int
+    ship_reasons: int
     ship_size: int
-    vertical_ships: List[List[bool]]
-    horizontal_ships: List[List[bool]]
+    live: bytearray
+    reasons: List[int]
     board_size: int
+    table: PlacementTable
 
     def __init__(self, board_size: int, ship_size: int, num_ships: int):
         self.ship_size = ship_size
-        self.vertical_ships = [[True for _ in range(board_size)] for _ in range(board_size)]
-        self.horizontal_ships = [[True for _ in range(board_size)] for _ in range(board_size)]
         self.board_size = board_size
-        self.domain_size = board_size * board_size * 2
+        self.table = placement_table(board_size)
+        self.live = bytearray(2 * board_size * board_size)
+        self.reasons = [0] * (2 * board_size * board_size)
         self.num_ships_remaining = num_ships
-        for x in range(board_size):
-            for y in range(board_size):
-                location = Direction(x, y)
-                vertical_ship = Ship(ship_size, location, True)
-                horizontal_ship = Ship(ship_size, location, False)
-                actual_box_top, actual_box_bottom = vertical_ship.actual_box()
-                if actual_box_bottom.x >= board_size or actual_box_bottom.y >= board_size:
-                    direction = Direction(x, y, True)
-                    self[direction] = False
-                actual_box_top, actual_box_bottom = horizontal_ship.actual_box()
-                if actual_box_bottom.x >= board_size or actual_box_bottom.y >= board_size:
-                    direction = Direction(x, y, False)
-                    self[direction] = False
-
-    def __getitem__(self, key: Direction):
-        if 0 <= key.x < self.board_size and 0 <= key.y < self.board_size:
-            if key.vertical:
-                return self.vertical_ships[key.y][key.x]
-            else:
-                return self.horizontal_ships[key.y][key.x]
-
-    def __setitem__(self, key: Direction, value):
-        if 0 <= key.x < self.board_size and 0 <= key.y < self.board_size:
-            if value == False and self[key]:
+        self.ship_reasons = 0
+        for slot in range(2 * board_size * board_size):
+            # a submarine has no orientation, keep only the horizontal copy of each cell
+            if self.table.cells[slot * 4 + ship_size - 1] and not (ship_size == 1 and slot % 2):
+                self.live[slot] = 1
+        self.domain_size = sum(self.live)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the placement table is shared per board size, rebuild the reference instead of pickling it
+        state = self.__dict__.copy()
+        del state["table"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self.table = placement_table(self.board_size)
+
+    def __deepcopy__(self, memo) -> Domain:
+        new = Domain.__new__(Domain)
+        new.__dict__.update(self.__dict__)
+        new.live = bytearray(self.live)
+        new.reasons = self.reasons.copy()
+        return new
+
+    def __getitem__(self, slot: int) -> bool:
+        return bool(self.live[slot])
+
+    def placement(self, slot: int) -> int:
+        return slot * 4 + self.ship_size - 1
+
+    def prune(self, slot: int, reason: int):
+        if self.live[slot]:
+            self.live[slot] = 0
+            self.reasons[slot] = reason
+            self.domain_size -= 1
+
+    def prune_all(self, slots: Iterable[int], reason: int):
+        live = self.live
+        for slot in slots:
+            if live[slot]:
+                live[slot] = 0
+                self.reasons[slot] = reason
                 self.domain_size -= 1
-                if key.vertical:
-                    self.vertical_ships[key.y][key.x] = False
-                else:
-                    self.horizontal_ships[key.y][key.x] = False
 
-    def domain(self) -> Generator[Ship]:
-        for x in range(self.board_size):
-            for y in range(self.board_size):
-                if self.vertical_ships[y][x]:
-                    yield Ship(self.ship_size, Direction(x, y, True), True)
-                if self.horizontal_ships[y][x]:
-                    yield Ship(self.ship_size, Direction(x, y, False), False)
+    def check_wipe_out(self):
+        if self.domain_size == 0 and self.num_ships_remaining > 0:
+            raise ShipException("No more possible ship locations", self.conflict())
+        elif self.domain_size < 0:
+            raise Exception("Domain size is negative")
 
-    def set_ship(self, ship: Ship):
+    def conflict(self) -> int:
+        culprits = 0
+        for reason in self.reasons:
+            culprits |= reason
+        return culprits
+
+    def domain(self) -> Generator[int]:
+        n = self.board_size
+        live = self.live
+        for x in range(n):
+            for y in range(n):
+                slot = (y * n + x) * 2
+                if live[slot + 1]:
+                    yield self.placement(slot + 1)
+                if live[slot]:
+                    yield self.placement(slot)
+
+    def set_ship(self, placement: int, reason: int = 0):
         if self.num_ships_remaining == 0:
             return
-        if ship.size == self.ship_size:
+        if (placement & 3) + 1 == self.ship_size:
             self.num_ships_remaining -= 1
-        upper_left, bottom_right = ship.find_rect_overlap(True, self.ship_size)
-
-        for x in range(upper_left.x, bottom_right.x + 1):
-            for y in range(upper_left.y, bottom_right.y + 1):
-                direction = Direction(x, y, True)
-                self[direction] = False
+            self.ship_reasons |= reason
+        self.prune_all(self.table.conflicts[placement][self.ship_size - 1], reason)
+        self.check_wipe_out()
+
+    def set_water(self, cell: int, reason: int = 0):
+        self.prune_all(self.table.covers[self.ship_size - 1][cell], reason)
+        self.check_wipe_out()
+
+    def covered_cells(self) -> bytearray:
+        covered = bytearray(self.board_size * self.board_size)
+        cells = self.table.cells
+        offset = self.ship_size - 1
+        for slot, alive in enumerate(self.live):
+            if alive:
+                for cell in cells[slot * 4 + offset]:
+                    covered[cell] = 1
+        return covered
+
+    def row_supply(self, row: int, covered: bytearray) -> int:
+        # upper bound on the cells of a row the remaining ships of this size can still fill
+        live = self.live
+        along = any(live[slot] for slot in self.table.row_lines[self.ship_size - 1][row])
+        per_ship = self.ship_size if along else 1
+        return min(sum(covered[row * self.board_size:(row + 1) * self.board_size]), self.num_ships_remaining * per_ship)
+
+    def col_supply(self, col: int, covered: bytearray) -> int:
+        live = self.live
+        along = any(live[slot] for slot in self.table.col_lines[self.ship_size - 1][col])
+        per_ship = self.ship_size if along else 1
+        return min(sum(covered[col::self.board_size]), self.num_ships_remaining * per_ship)
+
+    def slots_conflict(self, slots: Iterable[int]) -> int:
+        culprits = 0
+        reasons = self.reasons
+        for slot in slots:
+            culprits |= reasons[slot]
+        return culprits
+
+    def row_conflict(self, row: int) -> int:
+        if self.num_ships_remaining == 0:
+            return self.ship_reasons
+        return self.ship_reasons | self.slots_conflict(self.table.row_touching[self.ship_size - 1][row])
 
-        upper_left, bottom_right = ship.find_rect_overlap(False, self.ship_size)
-        for x in range(upper_left.x, bottom_right.x + 1):
-            for y in range(upper_left.y, bottom_right.y + 1):
-                direction = Direction(x, y, False)
-                self[direction] = False
+    def col_conflict(self, col: int) -> int:
+        if self.num_ships_remaining == 0:
+            return self.ship_reasons
+        return self.ship_reasons | self.slots_conflict(self.table.col_touching[self.ship_size - 1][col])
 
-        if self.domain_size == 0 and self.num_ships_remaining > 0:
-            raise ShipException("No more possible ship locations")
-        elif self.domain_size < 0:
-            raise Exception("Domain size is negative")
+    def eliminated_by(self, placement: int) -> int:
+        live = self.live
+        return sum(live[slot] for slot in self.table.conflicts[placement][self.ship_size - 1])
 
-    def set_water(self, location: Direction):
-        for x in range(location.x - self.ship_size + 1, location.x + 1):
-            self[Direction(x, location.y, False)] = False
-        for y in range(location.y - self.ship_size + 1, location.y + 1):
-            self[Direction(location.x, y, True)] = False
+    def covering(self, cell: int) -> List[int]:
+        return [self.placement(slot) for slot in self.table.covers[self.ship_size - 1][cell] if self.live[slot]]
 
-        if self.domain_size == 0 and self.num_ships_remaining > 0:
-            raise ShipException("No more possible ship locations")
+    def covering_conflict(self, cell: int) -> int:
+        if self.num_ships_remaining == 0:
+            return self.ship_reasons
+        return self.slots_conflict(self.table.covers[self.ship_size - 1][cell])
 
-        elif self.domain_size < 0:
-            raise Exception("Domain size is negative")
+    def require_ship(self, cell: int, reason: int) -> bool:
+        # the cell must hold a ship, so no placement may put it in its surrounding water
+        previous_size = self.domain_size
+        self.prune_all(self.table.surrounds[self.ship_size - 1][cell], reason)
+        self.check_wipe_out()
+        return self.domain_size != previous_size
 
     def __repr__(self):
-        vertical_ships = [["V" if item else "." for item in row] for row in self.vertical_ships]
-        horizontal_ships = [["H" if item else "." for item in row] for row in self.horizontal_ships]
+        n = self.board_size
+        vertical_ships = [["V" if self.live[(y * n + x) * 2 + 1] else "." for x in range(n)] for y in range(n)]
+        horizontal_ships = [["H" if self.live[(y * n + x) * 2] else "." for x in range(n)] for y in range(n)]
         return "\n".join([" ".join(row) for row in vertical_ships]) + "\n\n" + "\n".join(
             [" ".join(row) for row in horizontal_ships])
 
-    def remaining_ship_row(self, row: int, remaining_ship: int):
+    def remaining_ship_row(self, row: int, remaining_ship: int, reason: int = 0):
         if remaining_ship == 0:
             for x in range(self.board_size):
-                self.set_water(Direction(x, row, False))
+                self.set_water(row * self.board_size + x, reason)
 
         elif remaining_ship < self.ship_size:
-            for x in range(self.board_size):
-                self[Direction(x, row, False)] = False
+            self.prune_all(self.table.row_lines[self.ship_size - 1][row], reason)
 
-    def remaining_ship_col(self, col: int, remaining_ship: int):
+    def remaining_ship_col(self, col: int, remaining_ship: int, reason: int = 0):
         if remaining_ship == 0:
             for y in range(self.board_size):
-                self.set_water(Direction(col, y, True))
+                self.set_water(y * self.board_size + col, reason)
         elif remaining_ship < self.ship_size:
-            for y in range(self.board_size):
-                self[Direction(col, y, True)] = False
+            self.prune_all(self.table.col_lines[self.ship_size - 1][col], reason)
 
 
 class Board:
-    ships: List[Ship]
+    ships: array
     size: int
+    table: PlacementTable
+    grid: bytearray
     submarine_domain: Domain
     two_ship_domain: Domain
     three_ship_domain: Domain
@@ -186,52 +560,22 @@ class Board:
     domains: List[Domain]
     row_constraints: List[int]
     col_constraints: List[int]
+    row_reasons: List[int]
+    col_reasons: List[int]
+    path: Dict[int, int]
 
     def board_repr(self) -> List[List[str]]:
-        board = [["." for _ in range(self.size)] for _ in range(self.size)]
-        for ship in self.ships:
-            if ship.vertical:
-                direction = Direction(0, 1)
-            else:
-                direction = Direction(1, 0)
-            if ship.size == 1:
-                board[ship.first_piece.y][ship.first_piece.x] = "S"
-            elif ship.vertical:
-                if ship.size == 2:
-                    board[ship.first_piece.y][ship.first_piece.x] = "^"
-                    board[ship.first_piece.y + 1][ship.first_piece.x] = "v"
-                elif ship.size == 3:
-                    board[ship.first_piece.y][ship.first_piece.x] = "^"
-                    board[ship.first_piece.y + 1][ship.first_piece.x] = "M"
-                    board[ship.first_piece.y + 2][ship.first_piece.x] = "v"
-                elif ship.size == 4:
-                    board[ship.first_piece.y][ship.first_piece.x] = "^"
-                    board[ship.first_piece.y + 1][ship.first_piece.x] = "M"
-                    board[ship.first_piece.y + 2][ship.first_piece.x] = "M"
-                    board[ship.first_piece.y + 3][ship.first_piece.x] = "v"
-            else:
-                if ship.size == 2:
-                    board[ship.first_piece.y][ship.first_piece.x] = "<"
-                    board[ship.first_piece.y][ship.first_piece.x + 1] = ">"
-                elif ship.size == 3:
-                    board[ship.first_piece.y][ship.first_piece.x] = "<"
-                    board[ship.first_piece.y][ship.first_piece.x + 1] = "M"
-                    board[ship.first_piece.y][ship.first_piece.x + 2] = ">"
-                elif ship.size == 4:
-                    board[ship.first_piece.y][ship.first_piece.x] = "<"
-                    board[ship.first_piece.y][ship.first_piece.x + 1] = "M"
-                    board[ship.first_piece.y][ship.first_piece.x + 2] = "M"
-                    board[ship.first_piece.y][ship.first_piece.x + 3] = ">"
-
-
-        return board
+        return [list(self.grid[row * self.size:(row + 1) * self.size].decode()) for row in range(self.size)]
 
     def __repr__(self):
-        return "\n".join(["".join(row) for row in self.board_repr()])
+        return self.grid.decode()
 
     def __init__(self, size: int, ship_constraints: List[int] = None, row_constraints: List[int] = None,
                  col_constraints: List[int] = None):
         self.size = size
+        self.table = placement_table(size)
+        # one row of cell glyphs per line, each row followed by a newline so the grid is its own output
+        self.grid = bytearray((b"." * size + b"\n") * size)[:-1]
         if ship_constraints:
             self.submarine_domain = Domain(size, 1, ship_constraints[0])
             self.two_ship_domain = Domain(size, 2, ship_constraints[1])
@@ -240,54 +584,258 @@ class Board:
             self.domains = [self.submarine_domain, self.two_ship_domain, self.three_ship_domain, self.four_ship_domain]
             self.row_constraints = row_constraints
             self.col_constraints = col_constraints
-            self.ships = []
+            self.ships = array('i')
+            self.row_reasons = [0 for _ in range(size)]
+            self.col_reasons = [0 for _ in range(size)]
+            self.path = {}
             for row in range(size):
                 for domain in self.domains:
                     domain.remaining_ship_row(row, row_constraints[row])
             for col in range(size):
                 for domain in self.domains:
                     domain.remaining_ship_col(col, col_constraints[col])
-
-
-    def set_ship(self, ship: Ship):
-        direction = ship.first_piece
-        vertical = ship.vertical
-        size = ship.size
-        self.ships.append(ship)
+            self.drop_placed_domains()
+
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["table"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self.table = placement_table(self.size)
+
+    def __deepcopy__(self, memo) -> Board:
+        # Ships are never mutated once placed, so only the mutable search state is copied.
+        new = Board.__new__(Board)
+        new.__dict__.update(self.__dict__)
+        copies = {id(domain): copy.deepcopy(domain, memo) for domain in
+                  [self.submarine_domain, self.two_ship_domain, self.three_ship_domain, self.four_ship_domain]}
+        new.submarine_domain = copies[id(self.submarine_domain)]
+        new.two_ship_domain = copies[id(self.two_ship_domain)]
+        new.three_ship_domain = copies[id(self.three_ship_domain)]
+        new.four_ship_domain = copies[id(self.four_ship_domain)]
+        new.domains = [copies[id(domain)] for domain in self.domains]
+        new.ships = array('i', self.ships)
+        new.grid = bytearray(self.grid)
+        new.row_constraints = self.row_constraints.copy()
+        new.col_constraints = self.col_constraints.copy()
+        new.row_reasons = self.row_reasons.copy()
+        new.col_reasons = self.col_reasons.copy()
+        new.path = self.path.copy()
+        return new
+
+    def set_ship(self, placement: int, reason: int = 0):
+        direction = self.table.ship(placement).first_piece
+        vertical = direction.vertical
+        size = (placement & 3) + 1
+        self.ships.append(placement)
+        for cell, glyph in zip(self.table.cells[placement], self.table.glyphs[placement]):
+            self.grid[cell + cell // self.size] = glyph
         for domain in self.domains:
-            domain.set_ship(ship)
+            domain.set_ship(placement, reason)
 
         if vertical:
             for y in range(direction.y, direction.y + size):
                 self.row_constraints[y] -= 1
+                self.row_reasons[y] |= reason
                 if self.row_constraints[y] < 0:
-                    raise ShipException("Ship does not fit in board")
+                    raise ShipException("Ship does not fit in board", self.row_reasons[y])
             self.col_constraints[direction.x] -= size
+            self.col_reasons[direction.x] |= reason
         else:
             self.row_constraints[direction.y] -= size
+            self.row_reasons[direction.y] |= reason
             for x in range(direction.x, direction.x + size):
                 self.col_constraints[x] -= 1
+                self.col_reasons[x] |= reason
                 if self.col_constraints[x] < 0:
-                    raise ShipException("Ship does not fit in board")
+                    raise ShipException("Ship does not fit in board", self.col_reasons[x])
 
-        if self.row_constraints[direction.y] < 0 or self.col_constraints[direction.x] < 0:
-            raise ShipException("Ship does not fit in board")
+        if self.row_constraints[direction.y] < 0:
+            raise ShipException("Ship does not fit in board", self.row_reasons[direction.y])
+        if self.col_constraints[direction.x] < 0:
+            raise ShipException("Ship does not fit in board", self.col_reasons[direction.x])
 
         for domain in self.domains:
-            domain.remaining_ship_row(direction.y, self.row_constraints[direction.y])
-            domain.remaining_ship_col(direction.x, self.col_constraints[direction.x])
+            domain.remaining_ship_row(direction.y, self.row_constraints[direction.y], self.row_reasons[direction.y])
+            domain.remaining_ship_col(direction.x, self.col_constraints[direction.x], self.col_reasons[direction.x])
+
+        self.drop_placed_domains()
+
+    def all_domains(self) -> List[Domain]:
+        return [self.submarine_domain, self.two_ship_domain, self.three_ship_domain, self.four_ship_domain]
 
-        self.domains = [domain for domain in self.domains if domain.num_ships_remaining > 0]
+    def drop_placed_domains(self):
+        # The search branches on the domains left, so a size with no ships left to place must leave them, both
+        # after its last ship and from the start when the fleet has none of it.
+        self.domains = [domain for domain in self.all_domains() if domain.num_ships_remaining > 0]
+
+    def covered_cells(self) -> bytearray:
+        covered = bytearray(self.size * self.size)
+        for domain in self.domains:
+            for cell, alive in enumerate(domain.covered_cells()):
+                if alive:
+                    covered[cell] = 1
+        return covered
+
+    def live_placements(self) -> int:
+        return sum(domain.domain_size for domain in self.all_domains())
+
+    def counted(self, search: Search, propagator: str, fun: Callable[..., Any], *args) -> Any:
+        before = self.live_placements()
+        try:
+            return fun(*args)
+        finally:
+            pruned = before - self.live_placements()
+            if search.stats is not None:
+                search.stats.prune(propagator, pruned)
+            if search.tracer is not None and pruned:
+                search.tracer.on_prune(len(self.path), propagator, pruned)
+
+    def propagate(self, search: Optional[Search] = None):
+        if search is None or not search.observed:
+            self.propagate_loop(None)
+        elif search.stats is None:
+            self.propagate_loop(search)
+        else:
+            with search.stats.phase("propagation"):
+                self.propagate_loop(search)
+
+    def propagate_loop(self, search: Optional[Search]):
+        while self.domains:
+            for domain in self.domains:
+                if domain.domain_size < domain.num_ships_remaining:
+                    raise ShipException("Not enough placements left for the remaining ships",
+                                        domain.conflict() | domain.ship_reasons)
+            covered_by_domain = [(domain, domain.covered_cells()) for domain in self.domains]
+            covered = bytearray(self.size * self.size)
+            for _, cells in covered_by_domain:
+                for cell, alive in enumerate(cells):
+                    if alive:
+                        covered[cell] = 1
+            if search is None:
+                if not self.propagate_capacity(covered_by_domain, covered) and not self.propagate_lines(covered):
+                    return
+            elif (not self.counted(search, "capacity", self.propagate_capacity, covered_by_domain, covered)
+                  and not self.counted(search, "lines", self.propagate_lines, covered)):
+                return
+
+    def propagate_capacity(self, covered_by_domain: List[Tuple[Domain, bytearray]], covered: bytearray) -> bool:
+        # Capacity reasoning: each row and column must still be able to receive its remaining ship cells
+        # from the live placements, and each ship size needs at least as many placements as ships left.
+        # When the coverable cells of a line exactly match its demand, they must all hold ships.
+        for row in range(self.size):
+            demand = self.row_constraints[row]
+            cells = [cell for cell in range(row * self.size, (row + 1) * self.size) if covered[cell]]
+            supply = min(len(cells), sum(domain.row_supply(row, cells_of) for domain, cells_of in covered_by_domain))
+            if supply < demand or (demand > 0 and len(cells) == demand):
+                culprits = self.row_culprits(row)
+                if supply < demand:
+                    raise ShipException("Row {} cannot be filled".format(row), culprits)
+                changed = False
+                for cell in cells:
+                    changed |= self.require_ship(cell, culprits)
+                if changed:
+                    return True
+        for col in range(self.size):
+            demand = self.col_constraints[col]
+            cells = [cell for cell in range(col, self.size * self.size, self.size) if covered[cell]]
+            supply = min(len(cells), sum(domain.col_supply(col, cells_of) for domain, cells_of in covered_by_domain))
+            if supply < demand or (demand > 0 and len(cells) == demand):
+                culprits = self.col_culprits(col)
+                if supply < demand:
+                    raise ShipException("Column {} cannot be filled".format(col), culprits)
+                changed = False
+                for cell in cells:
+                    changed |= self.require_ship(cell, culprits)
+                if changed:
+                    return True
+        return False
+
+    def propagate_lines(self, covered: bytearray) -> bool:
+        # Nonogram-style line solving over the cells no placed ship has claimed yet.
+        fleet = tuple(domain.num_ships_remaining for domain in self.all_domains())
+        for row in range(self.size):
+            cells = range(row * self.size, (row + 1) * self.size)
+            line = "".join(UNKNOWN if covered[cell] else WATER for cell in cells)
+            forced = solve_line(line, self.row_constraints[row], fleet)
+            if forced != line:
+                culprits = self.row_culprits(row)
+                if forced is None:
+                    raise ShipException("Row {} has no consistent filling".format(row), culprits)
+                if self.apply_line(forced, line, cells, culprits):
+                    return True
+        for col in range(self.size):
+            cells = range(col, self.size * self.size, self.size)
+            line = "".join(UNKNOWN if covered[cell] else WATER for cell in cells)
+            forced = solve_line(line, self.col_constraints[col], fleet)
+            if forced != line:
+                culprits = self.col_culprits(col)
+                if forced is None:
+                    raise ShipException("Column {} has no consistent filling".format(col), culprits)
+                if self.apply_line(forced, line, cells, culprits):
+                    return True
+        return False
+
+    def apply_line(self, forced: str, line: str, cells: Iterable[int], reason: int) -> bool:
+        changed = False
+        for state, previous, cell in zip(forced, line, cells):
+            if state == previous:
+                continue
+            if state == WATER:
+                changed |= self.set_water(cell, reason)
+            elif state == SHIP:
+                changed |= self.require_ship(cell, reason)
+        return changed
+
+    def row_culprits(self, row: int) -> int:
+        culprits = self.row_reasons[row]
+        for domain in self.all_domains():
+            culprits |= domain.row_conflict(row)
+        return culprits
+
+    def col_culprits(self, col: int) -> int:
+        culprits = self.col_reasons[col]
+        for domain in self.all_domains():
+            culprits |= domain.col_conflict(col)
+        return culprits
+
+    def set_water(self, cell: int, reason: int) -> bool:
+        changed = False
+        for domain in self.domains:
+            previous_size = domain.domain_size
+            domain.set_water(cell, reason)
+            changed |= domain.domain_size != previous_size
+        return changed
+
+    def require_ship(self, cell: int, reason: int) -> bool:
+        if self.grid[cell + cell // self.size] != ord("."):
+            return False
+        changed = False
+        for domain in self.domains:
+            changed |= domain.require_ship(cell, reason)
+        covering = [placement for domain in self.domains for placement in domain.covering(cell)]
+        culprits = reason
+        for domain in self.all_domains():
+            culprits |= domain.covering_conflict(cell)
+        if len(covering) == 0:
+            raise ShipException("No ship can cover a required cell", culprits)
+        if len(covering) == 1:
+            self.set_ship(covering[0], culprits)
+            changed = True
+        return changed
 
     def handle_simple_hints(self, board_str: List[List[str]]):
         for row in range(self.size):
             for col in range(self.size):
                 hint = board_str[row][col]
                 if hint == "S":
-                    self.set_ship(Ship(1, Direction(col, row), False))
+                    self.set_ship(placement_id(1, col, row, False, self.size))
                 elif hint == ".":
                     for domain in self.domains:
-                        domain.set_water(Direction(col, row, False))
+                        domain.set_water(row * self.size + col)
     def handle_complex_hints(self, board_str: List[List[str]]) -> List[Board]:
         queue = [self]
         for row in range(self.size):
@@ -307,53 +855,293 @@ class Board:
 
     def find_hint(self, location: Direction, hint: str) -> List[Board]:
         new_boards = []
+        cell = location.y * self.size + location.x
         for domain in self.domains:
-            for value in domain.domain():
+            for value in domain.covering(cell):
+                # only copy the board for placements that draw the hinted glyph on the cell
+                if self.table.glyph(value, cell) != ord(hint):
+                    continue
                 new_board = copy.deepcopy(self)
                 try:
                     new_board.set_ship(value)
-                    if new_board.board_repr()[location.y][location.x] == hint:
-                        new_boards.append(new_board)
+                    new_boards.append(new_board)
                 except:
                     pass
         return new_boards
 
     def validate_hint(self, location: Direction, hint: str) -> bool:
-        if self.board_repr()[location.y][location.x] == hint:
-            return True
+        return self.grid[location.y * (self.size + 1) + location.x] == ord(hint)
+
+    def backtracking(self, search: Optional[Search] = None) -> Optional[Board]:
+        if search is None:
+            search = Search()
+        try:
+            self.propagate(search)
+            return self.backjump(search)
+        except ShipException:
+            return None
+
+    def lines_connected(self) -> bool:
+        # placements that share a line to fill are never independent, so the board only splits when the
+        # rows and columns joined by the placements crossing them fall apart
+        n = self.size
+        parent = list(range(2 * n))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        groups = sum(1 for line in range(n) if self.row_constraints[line] > 0) + \
+            sum(1 for line in range(n) if self.col_constraints[line] > 0)
+        cells = self.table.cells
+        for domain in self.domains:
+            offset = domain.ship_size - 1
+            for slot, alive in enumerate(domain.live):
+                if alive:
+                    placed = cells[slot * 4 + offset]
+                    anchor = find(placed[0] // n)
+                    for cell in placed:
+                        for line in [cell // n, n + cell % n]:
+                            root = find(line)
+                            if root != anchor:
+                                parent[root] = anchor
+                                groups -= 1
+                    if groups == 1:
+                        return True
+        return groups <= 1
+
+    def components(self) -> List[Component]:
+        # Union-find over rows, columns and cells: a placement joins the lines it puts ship cells in, and
+        # every cell of its halo that some live placement could cover, which is how two placements clash.
+        n = self.size
+        parent = list(range(2 * n + n * n))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        covered = self.covered_cells()
+        anchors = []
+        for domain in self.domains:
+            for slot, alive in enumerate(domain.live):
+                if not alive:
+                    continue
+                cells = self.table.cells[domain.placement(slot)]
+                anchor = find(2 * n + cells[0])
+                for cell in cells:
+                    for node in [cell // n, n + cell % n] + [2 * n + neighbour for neighbour in
+                                                            self.table.neighbourhood(cell) if covered[neighbour]]:
+                        root = find(node)
+                        if root != anchor:
+                            parent[root] = anchor
+                anchors.append((domain.ship_size, slot, 2 * n + cells[0]))
+        components: Dict[int, Component] = {}
+        for size, slot, anchor in anchors:
+            component = components.setdefault(find(anchor), Component([], [], [[] for _ in range(4)]))
+            component.slots[size - 1].append(slot)
+        for line in range(n):
+            # a line that still needs ships but has no placement left is a component that cannot be filled
+            if self.row_constraints[line] > 0:
+                components.setdefault(find(line), Component([], [], [[] for _ in range(4)])).rows.append(line)
+            if self.col_constraints[line] > 0:
+                components.setdefault(find(n + line), Component([], [], [[] for _ in range(4)])).cols.append(line)
+        return list(components.values())
+
+    def restrict(self, component: Component, fleet: Tuple[int, ...]) -> Board:
+        board = copy.deepcopy(self)
+        for domain, slots, count in zip(board.all_domains(), component.slots, fleet):
+            keep = set(slots)
+            domain.prune_all([slot for slot, alive in enumerate(domain.live) if alive and slot not in keep], 0)
+            domain.num_ships_remaining = count
+        rows = set(component.rows)
+        cols = set(component.cols)
+        board.row_constraints = [remaining if line in rows else 0 for line, remaining in enumerate(self.row_constraints)]
+        board.col_constraints = [remaining if line in cols else 0 for line, remaining in enumerate(self.col_constraints)]
+        board.drop_placed_domains()
+        return board
+
+    def merge(self, parts: List[Board]) -> Board:
+        board = copy.deepcopy(self)
+        for part in parts:
+            for placement in part.ships[len(self.ships):]:
+                board.ships.append(placement)
+                for cell, glyph in zip(self.table.cells[placement], self.table.glyphs[placement]):
+                    board.grid[cell + cell // self.size] = glyph
+        board.row_constraints = [0] * self.size
+        board.col_constraints = [0] * self.size
+        board.domains = []
+        return board
 
-    def backtracking(self) -> Optional[Board]:
+    def solve_components(self, components: List[Component], search: Search) -> Optional[Board]:
+        """Searches the independent components of a propagated board one by one, for each way of splitting
+        the remaining fleet between them, and puts their solutions together. A component is searched once per
+        share of the fleet it is given, so the search spaces add up instead of multiplying."""
+        remaining = tuple(domain.num_ships_remaining for domain in self.all_domains())
+        options = [component.fleets(self) for component in components]
+        # reachable[index] are the fleets the components from index on can take together
+        reachable = [set() for _ in components] + [{(0, 0, 0, 0)}]
+        for index in range(len(components) - 1, -1, -1):
+            reachable[index] = {total for total in (tuple(a + b for a, b in zip(fleet, rest))
+                                                    for fleet in options[index] for rest in reachable[index + 1])
+                                if all(count <= limit for count, limit in zip(total, remaining))}
+        solved: Dict[Tuple[int, Tuple[int, ...]], Optional[Board]] = {}
+
+        def part(index: int, fleet: Tuple[int, ...]) -> Optional[Board]:
+            if (index, fleet) not in solved:
+                search.nogoods = NogoodStore()
+                solved[index, fleet] = self.restrict(components[index], fleet).backtracking(search)
+            return solved[index, fleet]
+
+        def assign(index: int, left: Tuple[int, ...]) -> Optional[List[Board]]:
+            if index == len(components):
+                return []
+            for fleet in options[index]:
+                rest = tuple(count - used for count, used in zip(left, fleet))
+                if rest not in reachable[index + 1]:
+                    continue
+                solution = part(index, fleet)
+                if solution is None:
+                    continue
+                parts = assign(index + 1, rest)
+                if parts is not None:
+                    return [solution] + parts
+            return None
+
+        # nogoods learned for one share of the fleet do not hold for another, nor for the board as a whole
+        nogoods = search.nogoods
+        try:
+            parts = assign(0, remaining)
+        finally:
+            search.nogoods = nogoods
+        return self.merge(parts) if parts is not None else None
+
+    def backjump(self, search: Search) -> Board:
+        # Conflict-directed backjumping: every placement on the search path owns one bit, prunes remember
+        # the bits that caused them, and a failure that does not involve this level's bit skips the level.
         domains = sorted(self.domains, key=lambda x: x.domain_size)
+        depth = len(self.path)
+        tracer = search.tracer
+        if search.symmetry is not None and search.symmetry.violated(self):
+            if search.stats is not None:
+                search.stats.prune("symmetry", 1)
+            if tracer is not None:
+                tracer.on_prune(depth, "symmetry", 1)
+            raise ShipException("A mirror image of this assignment is searched instead")
         if len(domains) == 0:
+            if tracer is not None:
+                tracer.on_solution(depth)
             return self
+        # the symmetry test looks at the whole board, a component on its own would fail it
+        if search.decompose and search.symmetry is None and not self.lines_connected():
+            components = self.components()
+            if len(components) > 1:
+                solution = self.solve_components(components, search)
+                if solution is None:
+                    raise ShipException("No share of the fleet between the components can be placed")
+                return solution
         domain = domains[0]
-        for move in domain.domain():
-            domain[move.first_piece] = False
-
-            new_board = copy.deepcopy(self)
+        bit = 1 << depth
+        search.nodes += 1
+        if search.budget is not None:
+            search.budget.tick()
+            if depth > search.budget.partial_depth:
+                search.budget.keep(depth, self.__repr__())
+        stats = search.stats
+        if stats is not None:
+            stats.node(depth)
+        if tracer is not None:
+            tracer.on_node(depth)
+        for move in search.order(self, domain, list(domain.domain()), search):
             try:
-                new_board.set_ship(move)
-                result = new_board.backtracking()
+                if tracer is not None:
+                    tracer.on_assign(depth, move)
+                nogood = search.nogoods.check(move, self.path)
+                if nogood is not None:
+                    if stats is not None:
+                        stats.prune("nogoods", 1)
+                    if tracer is not None:
+                        tracer.on_prune(depth, "nogoods", 1)
+                    raise ShipException("Placement completes a learned nogood", self.path_culprits(nogood) | bit)
+                new_board = copy.deepcopy(self)
+                new_board.path[move] = bit
+                if not search.observed:
+                    new_board.set_ship(move, bit)
+                else:
+                    if stats is not None:
+                        stats.placements += 1
+                    new_board.counted(search, "placement", new_board.set_ship, move, bit)
+                new_board.propagate(search)
+                return new_board.backjump(search)
+            except ShipException as e:
+                if stats is not None:
+                    stats.backtracks += 1
+                if tracer is not None:
+                    tracer.on_fail(depth, move)
+                if not e.culprits & bit:
+                    raise
+                domain.prune(move >> 2, e.culprits & ~bit)
+
+        conflict = domain.conflict()
+        search.nogoods.add(frozenset(key for key, culprit in self.path.items() if culprit & conflict))
+        raise ShipException("No placement left for a ship of size {}".format(domain.ship_size), conflict)
+
+    def path_culprits(self, placements: Iterable[int]) -> int:
+        culprits = 0
+        for key in placements:
+            culprits |= self.path.get(key, 0)
+        return culprits
+
+    def solve(self, board_str: List[List[str]], search: Optional[Search] = None) -> Optional[Board]:
+        if search is None:
+            search = Search()
+        with phase(search.stats, "hints"):
+            self.handle_simple_hints(board_str)
+            boards = self.handle_complex_hints(board_str)
+        with phase(search.stats, "search"):
+            for board in boards:
+                # nogoods are only valid below the hint placements they were learned from
+                search.nogoods = NogoodStore()
+                result = board.backtracking(search)
                 if result:
                     return result
-            except:
-                pass
-    def solve(self, board_str):
-        self.handle_simple_hints(board_str)
-        boards = self.handle_complex_hints(board_str)
-        for board in boards:
-            result = board.backtracking()
-            if result:
-                return result
-
-
-
-
-
-
-
 
 
+def run(board: Board, board_str: List[List[str]], search: Search) -> SolveResult:
+    try:
+        final = board.solve(board_str, search)
+    except BudgetExceeded:
+        return SolveResult(TIMEOUT, None, search.stats, search.budget.partial)
+    except ShipException:
+        # the hints alone already contradict the constraints
+        final = None
+    if final is None:
+        return SolveResult(UNSAT, None, search.stats)
+    return SolveResult(SOLVED, final.__repr__(), search.stats)
+
+
+def solve(puzzle: Puzzle, order: str = "domain", seed: Optional[int] = None, stats: Optional[Stats] = None,
+          timeout: Optional[float] = None, max_nodes: Optional[int] = None,
+          break_symmetry: bool = False, decompose: bool = False, collect_stats: bool = False) -> SolveResult:
+    # collect_stats is the shorthand for passing a fresh Stats, which the result carries either way
+    if collect_stats and stats is None:
+        stats = Stats()
+    budget = Budget(timeout, max_nodes) if timeout is not None or max_nodes is not None else None
+    symmetry = symmetry_breaker(puzzle) if break_symmetry else None
+    search = Search(order, seed, stats, budget=budget, symmetry=symmetry, decompose=decompose)
+    # the search takes the sums as upper bounds, sums that do not add up to the fleet have to be caught here
+    reason = precheck(puzzle)
+    if reason is not None:
+        return SolveResult(UNSAT, None, search.stats, reason=reason)
+    try:
+        board = Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                      list(puzzle.col_constraints))
+    except ShipException:
+        return SolveResult(UNSAT, None, search.stats)
+    return run(board, puzzle.board_str, search)
 
 
 if __name__ == "__main__":
@@ -377,21 +1165,100 @@ if __name__ == "__main__":
         required=True,
         help="The output file that contains the solution."
     )
+    parser.add_argument(
+        "--order",
+        choices=sorted(VALUE_ORDERS),
+        default="domain",
+        help="The order in which the placements of a ship are tried."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="The seed used by the random placement order."
+    )
+    parser.add_argument(
+        "--nodes",
+        action="store_true",
+        help="Report the number of search nodes on stderr."
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        default=None,
+        help="Report search statistics on stderr in the given format."
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        help="Write a log of the search events to this file, see tracer.py to summarise or diff logs."
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=["jsonl", "binary"],
+        default="jsonl",
+        help="The format of the search event log."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds of search."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="Give up after this many search nodes."
+    )
+    parser.add_argument(
+        "--break-symmetry",
+        action="store_true",
+        help="Skip the mirror images of assignments when the puzzle is its own mirror image or rotation."
+    )
+    parser.add_argument(
+        "--decompose",
+        action="store_true",
+        help="Search the independent regions a board falls apart into one at a time, at the cost of a "
+             "connectivity test at every search node."
+    )
     args = parser.parse_args()
-    file = open(args.inputfile, 'r')
-
-    board_str = file.read().splitlines()
-    board_str = [list(row) for row in board_str]
-    sizes = [int(x) for x in board_str[2]]
-    row_constraints = [int(x) for x in board_str[0]]
-    col_constraints = [int(x) for x in board_str[1]]
-    size = len(board_str[0])
-    board_str = board_str[3:]
-    board = Board(size, sizes, row_constraints, col_constraints)
-    final = board.solve(board_str)
-    write_file = open(args.outputfile, 'w')
-    write_file.write(final.__repr__())
-    print(final)
+    stats = Stats() if args.stats else None
+    tracer, trace_file = open_tracer(args.trace, args.trace_format == "binary") if args.trace else (None, None)
+    with phase(stats, "parse"):
+        puzzle = read_puzzle(args.inputfile)
+    try:
+        reason = precheck(puzzle)
+    except MalformedPuzzle as error:
+        sys.exit("malformed puzzle: {}".format(error))
+    budget = Budget(args.timeout, args.max_nodes) if args.timeout is not None or args.max_nodes is not None else None
+    search = Search(args.order, args.seed, stats, tracer, budget,
+                    symmetry_breaker(puzzle) if args.break_symmetry else None, args.decompose)
+    if reason is not None:
+        result = SolveResult(UNSAT, None, stats, reason=reason)
+    else:
+        try:
+            board = Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                          list(puzzle.col_constraints))
+            result = run(board, puzzle.board_str, search)
+        except ShipException:
+            result = SolveResult(UNSAT, None, stats)
+    if args.nodes:
+        print("nodes: {}".format(search.nodes), file=sys.stderr)
+    with phase(stats, "output"):
+        write_file = open(args.outputfile, 'w')
+        write_file.write(result.solution.__repr__() if result.solution is None else result.solution)
+        print(result.solution)
+    if result.status != SOLVED:
+        print("status: {}".format(result.status), file=sys.stderr)
+    if result.reason is not None:
+        print("reason: {}".format(result.reason), file=sys.stderr)
+    if stats is not None:
+        print(stats.to_json(), file=sys.stderr)
+    if trace_file is not None:
+        trace_file.close()
+    sys.exit(result.exit_code)
 
 
 
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+
+# imported by the library API, so no typing or dataclasses at run time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import *
+
+    from stats import Stats
+
+SOLVED = "solved"
+UNSAT = "unsat"
+TIMEOUT = "timeout"
+# an incomplete search that found nothing, or a search that failed, proves nothing about the puzzle
+UNKNOWN = "unknown"
+
+# process exit status of the CLIs for each outcome, unknown shares 1 with the uncaught errors
+EXIT_CODES = {SOLVED: 0, UNSAT: 20, TIMEOUT: 124, UNKNOWN: 1}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Budget:
+    """A time and node allowance for one solve. Solvers call tick() once per search node, which raises
+    BudgetExceeded once either limit is used up, and hand over the deepest partial assignment they reach."""
+    deadline: Optional[float]
+    max_nodes: Optional[int]
+    nodes: int
+    partial_depth: int
+    partial: Optional[str]
+
+    def __init__(self, timeout: Optional[float] = None, max_nodes: Optional[int] = None):
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.partial_depth = -1
+        self.partial = None
+
+    def tick(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise BudgetExceeded("node budget of {} exhausted".format(self.max_nodes))
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded("time budget exhausted")
+
+    def keep(self, depth: int, partial: str):
+        self.partial_depth = depth
+        self.partial = partial
+
+
+class SolveResult:
+    status: str
+    solution: Optional[str]
+    stats: Optional[Stats]
+    partial: Optional[str]
+    reason: Optional[str]
+
+    def __init__(self, status: str, solution: Optional[str] = None, stats: Optional[Stats] = None,
+                 partial: Optional[str] = None, reason: Optional[str] = None):
+        self.status = status
+        self.solution = solution
+        self.stats = stats
+        self.partial = partial
+        # why the puzzle was rejected before any search, see precheck.py
+        self.reason = reason
+
+    def __repr__(self):
+        return "SolveResult(status={!r}, solution={!r}, stats={!r}, partial={!r}, reason={!r})".format(
+            self.status, self.solution, self.stats, self.partial, self.reason)
+
+    def __eq__(self, other):
+        if not isinstance(other, SolveResult):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
+
+    @property
+    def exit_code(self) -> int:
+        return EXIT_CODES[self.status]
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import *
+
+from budget import SOLVED, UNSAT, SolveResult
+from puzzle import Puzzle, format_puzzle
+from symmetry import SYMMETRIES, Symmetry, inverse, transform_grid, transform_puzzle
+
+
+def canonical_form(puzzle: Puzzle) -> Tuple[str, Symmetry]:
+    """The least text form of the puzzle over its 8 symmetric images, and the symmetry that produces it."""
+    return min((format_puzzle(transform_puzzle(puzzle, symmetry)), symmetry) for symmetry in SYMMETRIES)
+
+
+class CacheStats:
+    hits: int
+    disk_hits: int
+    misses: int
+
+    def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.disk_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.disk_hits) / self.lookups if self.lookups else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 6)}
+
+
+class SolutionCache:
+    """Results of solved and unsatisfiable puzzles keyed by canonical form, so a transpose or mirror image
+    of a puzzle seen before is a hit and gets the stored solution mapped back onto it. A bounded LRU in
+    memory sits in front of an optional sqlite file that persists across runs. Timeouts are not cached."""
+    capacity: int
+    entries: OrderedDict[str, Tuple[str, Optional[str]]]
+    stats: CacheStats
+
+    def __init__(self, capacity: int = 4096, path: Optional[str] = None):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.stats = CacheStats()
+        self.db = None
+        if path is not None:
+            import sqlite3
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (puzzle TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                            "solution TEXT)")
+
+    def remember(self, key: str, entry: Tuple[str, Optional[str]]):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def lookup(self, puzzle: Puzzle) -> Optional[SolveResult]:
+        key, symmetry = canonical_form(puzzle)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+        elif self.db is not None:
+            row = self.db.execute("SELECT status, solution FROM results WHERE puzzle = ?", (key,)).fetchone()
+            if row is not None:
+                entry = (row[0], row[1])
+                self.remember(key, entry)
+                self.stats.disk_hits += 1
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        status, solution = entry
+        if solution is not None:
+            solution = "\n".join(transform_grid(solution.split("\n"), inverse(symmetry)))
+        return SolveResult(status, solution)
+
+    def store(self, puzzle: Puzzle, result: SolveResult):
+        if result.status not in [SOLVED, UNSAT]:
+            return
+        key, symmetry = canonical_form(puzzle)
+        solution = result.solution
+        if solution is not None:
+            solution = "\n".join(transform_grid(solution.split(), symmetry))
+        self.remember(key, (result.status, solution))
+        if self.db is not None:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, result.status, solution))
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self) -> SolutionCache:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
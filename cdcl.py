@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import heapq
+from typing import *
+
+from budget import Budget
+
+RESTART_BASE = 100
+VAR_DECAY = 0.95
+
+
+def luby(i: int) -> int:
+    # the i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class CDCLSolver:
+    """A small conflict-driven clause learning SAT solver.
+
+    Clauses are lists of DIMACS literals over variables 1..num_vars. Internally literal v is 2v and -v is
+    2v + 1. Two watched literals per clause, first unique implication point learning, activity based
+    branching with phase saving and Luby restarts.
+    """
+    num_vars: int
+    clauses: List[List[int]]
+    watches: List[List[int]]
+    values: List[int]
+    level: List[int]
+    reason: List[int]
+    trail: List[int]
+    trail_lim: List[int]
+    qhead: int
+    activity: List[float]
+    polarity: List[int]
+    heap: List[Tuple[float, int]]
+    var_inc: float
+    ok: bool
+    conflicts: int
+    decisions: int
+    propagations: int
+    max_level: int
+
+    def __init__(self, num_vars: int, clauses: Iterable[Iterable[int]] = ()):
+        self.num_vars = num_vars
+        self.clauses = []
+        self.watches = [[] for _ in range(2 * num_vars + 2)]
+        # values are indexed by internal literal: 1 true, 0 false, -1 unassigned
+        self.values = [-1] * (2 * num_vars + 2)
+        self.level = [0] * (num_vars + 1)
+        self.reason = [-1] * (num_vars + 1)
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.activity = [0.0] * (num_vars + 1)
+        self.polarity = [1] * (num_vars + 1)
+        self.heap = [(0.0, var) for var in range(1, num_vars + 1)]
+        self.var_inc = 1.0
+        self.ok = True
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.max_level = 0
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def add_clause(self, clause: Iterable[int]) -> bool:
+        if not self.ok:
+            return False
+        lits = set()
+        for literal in clause:
+            lit = 2 * abs(literal) + (literal < 0)
+            if lit ^ 1 in lits or self.values[lit] == 1:
+                return True
+            if self.values[lit] == -1:
+                lits.add(lit)
+        lits = sorted(lits)
+        if not lits:
+            self.ok = False
+        elif len(lits) == 1:
+            self.enqueue(lits[0], -1)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(lits)
+        return self.ok
+
+    def attach(self, lits: List[int]) -> int:
+        index = len(self.clauses)
+        self.clauses.append(lits)
+        self.watches[lits[0]].append(index)
+        self.watches[lits[1]].append(index)
+        return index
+
+    def enqueue(self, lit: int, reason: int):
+        var = lit >> 1
+        self.values[lit] = 1
+        self.values[lit ^ 1] = 0
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def propagate(self) -> Optional[int]:
+        # returns the index of a conflicting clause, or None once every implication is on the trail
+        values = self.values
+        clauses = self.clauses
+        watches = self.watches
+        head = self.qhead
+        while head < len(self.trail):
+            false_lit = self.trail[head] ^ 1
+            head += 1
+            self.propagations += 1
+            watching = watches[false_lit]
+            kept = []
+            i = 0
+            while i < len(watching):
+                index = watching[i]
+                i += 1
+                clause = clauses[index]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if values[first] == 1:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    if values[clause[k]] != 0:
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if values[first] == 0:
+                        kept.extend(watching[i:])
+                        watches[false_lit] = kept
+                        self.qhead = len(self.trail)
+                        return index
+                    self.enqueue(first, index)
+            watches[false_lit] = kept
+        self.qhead = head
+        return None
+
+    def analyze(self, conflict: int) -> Tuple[List[int], int]:
+        seen = [False] * (self.num_vars + 1)
+        learnt = [0]
+        pending = 0
+        lit = -1
+        index = len(self.trail) - 1
+        current = len(self.trail_lim)
+        clause = self.clauses[conflict]
+        while True:
+            for other in (clause if lit == -1 else clause[1:]):
+                var = other >> 1
+                if not seen[var] and self.level[var] > 0:
+                    seen[var] = True
+                    self.bump(var)
+                    if self.level[var] >= current:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            while not seen[self.trail[index] >> 1]:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            seen[lit >> 1] = False
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[lit >> 1]]
+        learnt[0] = lit ^ 1
+
+        if len(learnt) == 1:
+            return learnt, 0
+        deepest = max(range(1, len(learnt)), key=lambda position: self.level[learnt[position] >> 1])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.level[learnt[1] >> 1]
+
+    def bump(self, var: int):
+        self.activity[var] += self.var_inc
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1) if self.values[2 * v] == -1]
+            heapq.heapify(self.heap)
+        elif self.values[2 * var] == -1:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def cancel_until(self, level: int):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in reversed(self.trail[start:]):
+            var = lit >> 1
+            self.polarity[var] = lit & 1
+            self.values[lit] = -1
+            self.values[lit ^ 1] = -1
+            self.reason[var] = -1
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch(self) -> int:
+        # the heap holds stale entries, skip assigned variables and entries whose activity moved on
+        while self.heap:
+            activity, var = heapq.heappop(self.heap)
+            if self.values[2 * var] == -1 and -activity == self.activity[var]:
+                return 2 * var + self.polarity[var]
+        for var in range(1, self.num_vars + 1):
+            if self.values[2 * var] == -1:
+                return 2 * var + self.polarity[var]
+        return -1
+
+    def solve(self, budget: Optional[Budget] = None) -> Optional[List[bool]]:
+        """Returns model[var] for var in 1..num_vars (model[0] is unused), or None if unsatisfiable. Every
+        decision is a node of the budget, which raises BudgetExceeded once it runs out."""
+        if not self.ok or self.propagate() is not None:
+            self.ok = False
+            return None
+        restarts = 1
+        limit = RESTART_BASE * luby(restarts)
+        since_restart = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                since_restart += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return None
+                learnt, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], -1)
+                else:
+                    self.enqueue(learnt[0], self.attach(learnt))
+                self.var_inc /= VAR_DECAY
+                continue
+            if since_restart >= limit:
+                restarts += 1
+                limit = RESTART_BASE * luby(restarts)
+                since_restart = 0
+                self.cancel_until(0)
+                continue
+            lit = self.pick_branch()
+            if lit == -1:
+                return [False] + [self.values[2 * var] == 1 for var in range(1, self.num_vars + 1)]
+            if budget is not None:
+                budget.tick()
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self.max_level = max(self.max_level, len(self.trail_lim))
+            self.enqueue(lit, -1)
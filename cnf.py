@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import *
+
+from battle import placement_id, placement_table
+from budget import SOLVED, TIMEOUT, UNSAT, Budget, BudgetExceeded, SolveResult
+from cdcl import CDCLSolver
+from puzzle import Puzzle, read_puzzle
+from stats import Stats, phase
+
+SHIP_HINTS = "S^v<>M"
+BACKENDS = ["auto", "cdcl", "pysat", "pycosat"]
+
+
+class CNF:
+    num_vars: int
+    clauses: List[List[int]]
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses = []
+
+    def new_var(self) -> int:
+        self.num_vars += 1
+        return self.num_vars
+
+    def add(self, clause: List[int]):
+        self.clauses.append(clause)
+
+    def exactly(self, lits: List[int], k: int):
+        """Sequential counter: register (i, j) is true iff at least j of the first i literals are true."""
+        if k > len(lits):
+            self.add([])
+            return
+        if k == 0:
+            for lit in lits:
+                self.add([-lit])
+            return
+        previous: List[Optional[int]] = []
+        for i, lit in enumerate(lits):
+            current: List[Optional[int]] = []
+            for j in range(1, min(i + 1, k + 1) + 1):
+                register = self.new_var()
+                below = previous[j - 1] if j - 1 < len(previous) else None
+                carry = previous[j - 2] if j >= 2 else None
+                # register -> below or (lit and carry), with the register for j = 0 always true
+                if below is not None:
+                    self.add([-below, register])
+                if j == 1:
+                    self.add([-lit, register])
+                    self.add([-register, lit] + ([below] if below is not None else []))
+                else:
+                    self.add([-lit, -carry, register])
+                    self.add([-register, carry] + ([below] if below is not None else []))
+                    self.add([-register, lit] + ([below] if below is not None else []))
+                current.append(register)
+            previous = current
+        self.add([previous[k - 1]])
+        if k < len(previous):
+            self.add([-previous[k]])
+
+    def to_dimacs(self) -> str:
+        lines = ["p cnf {} {}".format(self.num_vars, len(self.clauses))]
+        lines += [" ".join(str(lit) for lit in clause + [0]) for clause in self.clauses]
+        return "\n".join(lines) + "\n"
+
+
+class PuzzleEncoding:
+    """CNF for a puzzle over one literal per cell (the cell holds part of a ship) and one per placement.
+
+    A cell is a ship iff some placement covers it, a placement forces water on every cell around it, so
+    ships neither touch nor overlap, and the row sums, column sums and fleet counts are exactly-k counters.
+    """
+    puzzle: Puzzle
+    cnf: CNF
+    cell_vars: List[int]
+    placement_vars: Dict[int, int]
+
+    def __init__(self, puzzle: Puzzle):
+        self.puzzle = puzzle
+        self.cnf = CNF()
+        n = puzzle.size
+        table = placement_table(n)
+        hints = [puzzle.board_str[cell // n][cell % n] for cell in range(n * n)]
+        self.cell_vars = [self.cnf.new_var() for _ in range(n * n)]
+        self.placement_vars = {}
+        by_size: List[List[int]] = [[] for _ in range(4)]
+        covering: List[List[int]] = [[] for _ in range(n * n)]
+        for size in range(1, 5):
+            for y in range(n):
+                for x in range(n):
+                    for vertical in ([False] if size == 1 else [True, False]):
+                        placement = placement_id(size, x, y, vertical, n)
+                        if not table.cells[placement]:
+                            continue
+                        var = self.cnf.new_var()
+                        self.placement_vars[placement] = var
+                        by_size[size - 1].append(var)
+                        for cell in table.cells[placement]:
+                            covering[cell].append(var)
+                            self.cnf.add([-var, self.cell_vars[cell]])
+                        cells = table.cells[placement]
+                        halo = {neighbour for cell in cells for neighbour in table.neighbourhood(cell)} - set(cells)
+                        for cell in sorted(halo):
+                            self.cnf.add([-var, -self.cell_vars[cell]])
+                        for cell, glyph in zip(cells, table.glyphs[placement]):
+                            if hints[cell] in SHIP_HINTS and ord(hints[cell]) != glyph:
+                                self.cnf.add([-var])
+
+        for cell in range(n * n):
+            self.cnf.add([-self.cell_vars[cell]] + covering[cell])
+            if hints[cell] == ".":
+                self.cnf.add([-self.cell_vars[cell]])
+            elif hints[cell] in SHIP_HINTS:
+                self.cnf.add([self.cell_vars[cell]])
+
+        for row in range(n):
+            self.cnf.exactly([self.cell_vars[row * n + col] for col in range(n)], puzzle.row_constraints[row])
+        for col in range(n):
+            self.cnf.exactly([self.cell_vars[row * n + col] for row in range(n)], puzzle.col_constraints[col])
+        for size in range(1, 5):
+            self.cnf.exactly(by_size[size - 1], puzzle.ship_constraints[size - 1])
+
+    def decode(self, model: List[bool]) -> str:
+        n = self.puzzle.size
+        table = placement_table(n)
+        grid = bytearray(b"." * (n * n))
+        for placement, var in self.placement_vars.items():
+            if model[var]:
+                for cell, glyph in zip(table.cells[placement], table.glyphs[placement]):
+                    grid[cell] = glyph
+        return "\n".join(grid[row * n:(row + 1) * n].decode() for row in range(n))
+
+
+def solve_cnf(cnf: CNF, backend: str = "auto", stats: Optional[Stats] = None,
+              budget: Optional[Budget] = None) -> Optional[List[bool]]:
+    """Returns model[var] for var in 1..num_vars, or None if unsatisfiable. With backend "auto" an installed
+    SAT library is preferred over the built in CDCL solver. Only the built in solver observes the budget."""
+    if backend in ["auto", "pysat"]:
+        try:
+            from pysat.solvers import Solver
+        except ImportError:
+            if backend == "pysat":
+                raise
+        else:
+            with Solver(bootstrap_with=cnf.clauses) as solver:
+                if not solver.solve():
+                    return None
+                true_vars = {lit for lit in solver.get_model() if lit > 0}
+            return [False] + [var in true_vars for var in range(1, cnf.num_vars + 1)]
+    if backend in ["auto", "pycosat"]:
+        try:
+            import pycosat
+        except ImportError:
+            if backend == "pycosat":
+                raise
+        else:
+            result = pycosat.solve(cnf.clauses, vars=cnf.num_vars)
+            if result == "UNSAT":
+                return None
+            true_vars = {lit for lit in result if lit > 0}
+            return [False] + [var in true_vars for var in range(1, cnf.num_vars + 1)]
+    solver = CDCLSolver(cnf.num_vars, cnf.clauses)
+    try:
+        return solver.solve(budget)
+    finally:
+        if stats is not None:
+            # decisions are the search nodes and every conflict undoes part of the trail
+            stats.nodes += solver.decisions
+            stats.backtracks += solver.conflicts
+            stats.max_depth = max(stats.max_depth, solver.max_level)
+            stats.prune("unit propagation", solver.propagations)
+
+
+def solve(puzzle: Puzzle, backend: str = "auto", stats: Optional[Stats] = None, timeout: Optional[float] = None,
+          max_nodes: Optional[int] = None) -> SolveResult:
+    budget = Budget(timeout, max_nodes) if timeout is not None or max_nodes is not None else None
+    with phase(stats, "encode"):
+        encoding = PuzzleEncoding(puzzle)
+    return run(encoding, backend, stats, budget)
+
+
+def run(encoding: PuzzleEncoding, backend: str = "auto", stats: Optional[Stats] = None,
+        budget: Optional[Budget] = None) -> SolveResult:
+    try:
+        with phase(stats, "search"):
+            model = solve_cnf(encoding.cnf, backend, stats, budget)
+    except BudgetExceeded:
+        return SolveResult(TIMEOUT, None, stats)
+    if model is None:
+        return SolveResult(UNSAT, None, stats)
+    return SolveResult(SOLVED, encoding.decode(model), stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--dimacs",
+        type=str,
+        default=None,
+        help="Also write the CNF encoding of the puzzle to this file in DIMACS format."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="auto",
+        help="SAT solver to use, auto prefers an installed SAT library over the built in CDCL solver."
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        default=None,
+        help="Report search statistics on stderr in the given format."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds of search."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="Give up after this many decisions of the built in solver."
+    )
+    args = parser.parse_args()
+    stats = Stats() if args.stats else None
+    with phase(stats, "parse"):
+        puzzle = read_puzzle(args.inputfile)
+    with phase(stats, "encode"):
+        encoding = PuzzleEncoding(puzzle)
+    if args.dimacs:
+        with open(args.dimacs, "w") as file:
+            file.write(encoding.cnf.to_dimacs())
+    budget = Budget(args.timeout, args.max_nodes) if args.timeout is not None or args.max_nodes is not None else None
+    result = run(encoding, args.backend, stats, budget)
+    with phase(stats, "output"):
+        write_file = open(args.outputfile, 'w')
+        write_file.write(result.solution.__repr__() if result.solution is None else result.solution)
+        print(result.solution)
+    if result.status != SOLVED:
+        print("status: {}".format(result.status), file=sys.stderr)
+    if stats is not None:
+        print(stats.to_json(), file=sys.stderr)
+    sys.exit(result.exit_code)
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from typing import *
+
+from puzzle import Puzzle, format_puzzle, read_puzzle
+
+# corpus file: a header of magic, board size and record count followed by fixed size records of
+#   size, the four fleet counts, the row sums and the column sums as one byte each,
+#   then the hint grid in row major order, two cells per byte with the first cell in the low nibble
+MAGIC = b"BSCORP1\n"
+HEADER_SIZE = len(MAGIC) + 8
+HINTS = "0.S^v<>M"
+HINT_CODES = {glyph: code for code, glyph in enumerate(HINTS)}
+
+
+class CorpusError(Exception):
+    pass
+
+
+def record_size(size: int) -> int:
+    return 1 + 4 + 2 * size + (size * size + 1) // 2
+
+
+def pack_puzzle(puzzle: Puzzle) -> bytes:
+    n = puzzle.size
+    if not 0 < n < 256 or any(not 0 <= x < 256 for x in puzzle.row_constraints + puzzle.col_constraints +
+                              list(puzzle.ship_constraints)):
+        raise CorpusError("puzzle does not fit in a corpus record")
+    record = bytearray(record_size(n))
+    record[0] = n
+    record[1:5] = bytes(puzzle.ship_constraints)
+    record[5:5 + n] = bytes(puzzle.row_constraints)
+    record[5 + n:5 + 2 * n] = bytes(puzzle.col_constraints)
+    hints = 5 + 2 * n
+    for cell in range(n * n):
+        glyph = puzzle.board_str[cell // n][cell % n]
+        if glyph not in HINT_CODES:
+            raise CorpusError("unknown hint {!r}".format(glyph))
+        record[hints + cell // 2] |= HINT_CODES[glyph] << (4 * (cell % 2))
+    return bytes(record)
+
+
+class PuzzleView:
+    """A puzzle read straight out of a corpus record. The fields are decoded on access and nothing is
+    copied until then, so scanning a corpus costs one slice per record. Engines index the hint grid
+    repeatedly, convert with to_puzzle() before solving."""
+    record: memoryview
+
+    def __init__(self, record: memoryview):
+        self.record = record
+
+    @property
+    def size(self) -> int:
+        return self.record[0]
+
+    @property
+    def ship_constraints(self) -> List[int]:
+        return list(self.record[1:5])
+
+    @property
+    def row_constraints(self) -> List[int]:
+        return list(self.record[5:5 + self.size])
+
+    @property
+    def col_constraints(self) -> List[int]:
+        n = self.size
+        return list(self.record[5 + n:5 + 2 * n])
+
+    def hint(self, x: int, y: int) -> str:
+        n = self.size
+        cell = y * n + x
+        return HINTS[(self.record[5 + 2 * n + cell // 2] >> (4 * (cell % 2))) & 15]
+
+    @property
+    def board_str(self) -> List[List[str]]:
+        n = self.size
+        hints = self.record[5 + 2 * n:]
+        cells = []
+        for byte in hints:
+            cells.append(HINTS[byte & 15])
+            cells.append(HINTS[byte >> 4])
+        return [cells[row * n:(row + 1) * n] for row in range(n)]
+
+    def to_puzzle(self) -> Puzzle:
+        return Puzzle(self.size, self.row_constraints, self.col_constraints, self.ship_constraints, self.board_str)
+
+    def __repr__(self):
+        return "PuzzleView({})".format(self.to_puzzle())
+
+
+class Corpus:
+    """Memory maps a corpus file. Indexing and iterating yield PuzzleViews backed by the mapping, which stay
+    valid until the corpus is closed."""
+    path: str
+    size: int
+    count: int
+    record_size: int
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        header = self.file.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+            self.file.close()
+            raise CorpusError("{} is not a puzzle corpus".format(path))
+        self.size = header[len(MAGIC)]
+        self.count = int.from_bytes(header[len(MAGIC) + 4:], "little")
+        self.record_size = record_size(self.size)
+        if os.fstat(self.file.fileno()).st_size != HEADER_SIZE + self.count * self.record_size:
+            self.file.close()
+            raise CorpusError("{} is truncated or has trailing data".format(path))
+        # mmap refuses to map an empty file
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+        self.data = memoryview(self.map) if self.map is not None else memoryview(b"")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> PuzzleView:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("corpus index out of range")
+        start = HEADER_SIZE + index * self.record_size
+        return PuzzleView(self.data[start:start + self.record_size])
+
+    def __iter__(self) -> Iterator[PuzzleView]:
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self):
+        self.data.release()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # views are still alive, the mapping goes away with the last of them
+                pass
+        self.file.close()
+
+    def __enter__(self) -> Corpus:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_corpus(path: str, puzzles: Iterable[Puzzle]) -> int:
+    """Writes the puzzles, which must all have the same size, and returns how many were written. The corpus is
+    written next to path and renamed into place once complete, so a puzzle that can not be packed leaves any
+    earlier file at path as it was."""
+    count = 0
+    size = 0
+    partial = path + ".partial"
+    try:
+        with open(partial, "wb") as file:
+            file.write(bytes(HEADER_SIZE))
+            for puzzle in puzzles:
+                if count == 0:
+                    size = puzzle.size
+                elif puzzle.size != size:
+                    raise CorpusError("a corpus holds puzzles of one size, got {} after {}".format(
+                        puzzle.size, size))
+                file.write(pack_puzzle(puzzle))
+                count += 1
+            file.seek(0)
+            file.write(MAGIC + bytes([size, 0, 0, 0]) + count.to_bytes(4, "little"))
+    except BaseException:
+        os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return count
+
+
+def text_files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".txt"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def unpack_corpus(path: str, directory: str) -> int:
+    os.makedirs(directory, exist_ok=True)
+    with Corpus(path) as corpus:
+        for index, view in enumerate(corpus):
+            with open(os.path.join(directory, "puzzle_{:08d}.txt".format(index)), "w") as file:
+                file.write(format_puzzle(view.to_puzzle()))
+        return len(corpus)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack_parser = subparsers.add_parser("pack", help="Convert puzzle text files into a corpus.")
+    pack_parser.add_argument("corpus", type=str)
+    pack_parser.add_argument("inputs", type=str, nargs="+", help="Puzzle files or directories of them.")
+    unpack_parser = subparsers.add_parser("unpack", help="Write every puzzle of a corpus as a text file.")
+    unpack_parser.add_argument("corpus", type=str)
+    unpack_parser.add_argument("directory", type=str)
+    sweep_parser = subparsers.add_parser("sweep", help="Solve every puzzle of a corpus and report throughput.")
+    sweep_parser.add_argument("corpus", type=str)
+    sweep_parser.add_argument("--engine", type=str, default="battle")
+    sweep_parser.add_argument("--timeout", type=float, default=None, help="Seconds allowed per puzzle.")
+    sweep_parser.add_argument("--verify", action="store_true",
+                              help="Check every solution found against its puzzle, in one batch at the end.")
+    args = parser.parse_args()
+    if args.command == "pack":
+        try:
+            count = write_corpus(args.corpus, (read_puzzle(path) for path in text_files(args.inputs)))
+        except CorpusError as error:
+            sys.exit("pack failed, {} left as it was: {}".format(args.corpus, error))
+        print("packed {} puzzles".format(count))
+    elif args.command == "unpack":
+        print("unpacked {} puzzles".format(unpack_corpus(args.corpus, args.directory)))
+    else:
+        from solver import SOLVED, solve
+        counts: Dict[str, int] = {}
+        solved: List[Tuple[Puzzle, str]] = []
+        start = time.perf_counter()
+        with Corpus(args.corpus) as corpus:
+            for view in corpus:
+                puzzle = view.to_puzzle()
+                result = solve(puzzle, args.engine, args.timeout)
+                counts[result.status] = counts.get(result.status, 0) + 1
+                if args.verify and result.status == SOLVED:
+                    solved.append((puzzle, result.solution))
+            total = len(corpus)
+        elapsed = time.perf_counter() - start
+        print("{} puzzles in {:.3f}s, {:.1f} per second".format(total, elapsed, total / elapsed if elapsed else 0.0))
+        print(", ".join("{} {}".format(status, count) for status, count in sorted(counts.items())))
+        if args.verify:
+            from verifier import verify_batch
+            valid = verify_batch([puzzle for puzzle, _ in solved], [solution for _, solution in solved])
+            print("verified {} of {} solutions".format(sum(valid), len(solved)))
+            if not all(valid):
+                sys.exit(1)
@@ -1,3 +1,4 @@
+import operator
 import sys
 
 class Variable:
@@ -194,10 +195,11 @@ class CSP:
             if v not in variables:
                 print("Error: variable {} appears in constraint but specified as one of the variables of the CSP {}".format(v.name(), self.name()))
 
+        self._index = dict((v, i) for i, v in enumerate(variables))
         self.constraints_of = [[] for i in range(len(variables))]
         for c in constraints:
             for v in c.scope():
-                i = variables.index(v)
+                i = self._index[v]
                 self.constraints_of[i].append(c)
 
     def name(self):
@@ -212,7 +214,7 @@ class CSP:
     def constraintsOf(self, var):
         '''return constraints with var in their scope'''
         try:
-            i = self.variables().index(var)
+            i = self._index[var]
             return list(self.constraints_of[i])
         except:
             print("Error: tried to find constraint of variable {} that isn't in this CSP {}".format(var, self.name()))
@@ -222,6 +224,138 @@ class CSP:
         for v in self.variables():
             v.unAssign()
 
+    def unAssignedVars(self):
+        return [v for v in self._variables if not v.isAssigned()]
+
+    def components(self, variables=None):
+        '''split variables (by default the unassigned ones) into the
+           connected components of the constraint graph among them: two
+           variables are connected when a constraint has both in its
+           scope. Assigned variables connect nothing, so a problem falls
+           apart into components as the search assigns values. Returns a
+           list of lists of variables.'''
+        if variables is None:
+            variables = self.unAssignedVars()
+        remaining = set(variables)
+        components = []
+        for var in variables:
+            if var not in remaining:
+                continue
+            remaining.discard(var)
+            component = [var]
+            stack = [var]
+            while stack:
+                v = stack.pop()
+                for c in self.constraints_of[self._index[v]]:
+                    for w in c.scope():
+                        if w in remaining:
+                            remaining.discard(w)
+                            component.append(w)
+                            stack.append(w)
+            components.append(component)
+        return components
+
+    def consistent(self, var):
+        '''check the constraints of var, those with an unassigned
+           variable in their scope pass'''
+        for c in self.constraints_of[self._index[var]]:
+            if not c.check():
+                return False
+        return True
+
+    def assignedConsistent(self):
+        '''check the constraints whose scope is fully assigned. The search
+           only checks the constraints of the variables it assigns, so a
+           constraint broken by the current assignment alone has to be
+           caught before it starts.'''
+        for c in self._constraints:
+            if c.numUnassigned() == 0 and not c.check():
+                return False
+        return True
+
+    def solve(self, decompose=True):
+        '''find an assignment to the unassigned variables that satisfies
+           every constraint together with the current assignment. Returns
+           the full assignment as a list of (var, value) pairs, the format
+           check() takes, or None. The current assignment is left as it was.
+
+           With decompose the unassigned variables are split into
+           components at every step of the search and the components are
+           solved one after the other, a component without a solution
+           never backtracks into the ones solved before it.'''
+        if not self.assignedConsistent():
+            return None
+        variables = self.unAssignedVars()
+        if not self._solve(variables, decompose):
+            return None
+        solution = [(var, var.getValue()) for var in self.variables()]
+        for var in variables:
+            var.unAssign()
+        return solution
+
+    def _solve(self, variables, decompose):
+        if not variables:
+            return True
+        if decompose:
+            components = self.components(variables)
+            if len(components) > 1:
+                #small components first, they are the cheapest to fail
+                components.sort(key=len)
+                for i, component in enumerate(components):
+                    if not self._solveConnected(component, decompose):
+                        for done in components[:i]:
+                            for var in done:
+                                var.unAssign()
+                        return False
+                return True
+        return self._solveConnected(variables, decompose)
+
+    def _solveConnected(self, variables, decompose):
+        var = min(variables, key=lambda v: v.curDomainSize())
+        rest = [v for v in variables if v is not var]
+        for val in var.curDomain():
+            var.setValue(val)
+            if self.consistent(var) and self._solve(rest, decompose):
+                return True
+            var.unAssign()
+        return False
+
+    def countSolutions(self, decompose=True):
+        '''count the assignments to the unassigned variables that satisfy
+           every constraint together with the current assignment. With
+           decompose the count of a problem that falls apart is the
+           product of the counts of its components, so their solutions
+           are never enumerated together.'''
+        if not self.assignedConsistent():
+            return 0
+        return self._count(self.unAssignedVars(), decompose)
+
+    def _count(self, variables, decompose):
+        if not variables:
+            return 1
+        if decompose:
+            components = self.components(variables)
+            if len(components) > 1:
+                components.sort(key=len)
+                total = 1
+                for component in components:
+                    total *= self._countConnected(component, decompose)
+                    if total == 0:
+                        break
+                return total
+        return self._countConnected(variables, decompose)
+
+    def _countConnected(self, variables, decompose):
+        var = min(variables, key=lambda v: v.curDomainSize())
+        rest = [v for v in variables if v is not var]
+        total = 0
+        for val in var.curDomain():
+            var.setValue(val)
+            if self.consistent(var):
+                total += self._count(rest, decompose)
+            var.unAssign()
+        return total
+
     def check(self, solutions):
         '''each solution is a list of (var, value) pairs. Check to see
            if these satisfy all the constraints. Return list of
@@ -259,5 +393,62 @@ class CSP:
 
         return errs
     
+    def checkBulk(self, solutions):
+        '''check() for many solutions at once, with the same result. Each
+           solution is read into a list of values by variable index, and
+           each constraint is evaluated once per distinct assignment to its
+           scope: solutions that agree on a scope share the answer.
+           Solutions from an enumeration differ in few variables, so most
+           constraint checks become a dictionary lookup.'''
+        current_values = [(var, var.getValue()) for var in self._variables]
+        variables = set(self._variables)
+        n = len(self._variables)
+        scopes = []
+        for c in self._constraints:
+            scope = c.scope()
+            indices = [self._index[var] for var in scope]
+            if len(indices) > 1:
+                get = operator.itemgetter(*indices)
+            else:
+                #itemgetter of one index gives the value, not a tuple
+                get = lambda values, indices=indices: tuple(values[i] for i in indices)
+            scopes.append((c, scope, get, dict()))
+        errs = []
+
+        for s in solutions:
+            s_vars = [var for (var, val) in s]
+
+            if len(s_vars) != n:
+                errs.append([s, "Solution has incorrect number of variables in it"])
+                continue
+
+            if len(set(s_vars)) != n:
+                errs.append([s, "Solution has duplicate variable assignments"])
+                continue
+
+            if not variables.issuperset(s_vars):
+                errs.append([s, "Solution has incorrect variable in it"])
+                continue
+
+            values = [None] * n
+            for (var, val) in s:
+                values[self._index[var]] = val
+
+            for (c, scope, get, checked) in scopes:
+                key = get(values)
+                ok = checked.get(key)
+                if ok is None:
+                    for var, val in zip(scope, key):
+                        var.setValue(val)
+                    ok = checked[key] = c.check()
+                if not ok:
+                    errs.append([s, "Solution does not satisfy constraint {}".format(c.name())])
+                    break
+
+        for (var, val) in current_values:
+            var.setValue(val)
+
+        return errs
+
     def __str__(self):
         return "CSP {}".format(self.name())
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import *
+
+from battle import PlacementTable, placement_id, placement_table
+from budget import SOLVED, TIMEOUT, UNSAT, Budget, BudgetExceeded, SolveResult
+from puzzle import Puzzle, read_puzzle
+from stats import Stats, phase
+
+SHIP_HINTS = "S^v<>M"
+WATER_COLOR = 1
+
+
+class DLXBoard:
+    """Exact-cover engine for the fleet placement problem (Knuth's Algorithm C, dancing links with colors).
+
+    Every ship is a primary item and so is every cell hinted as part of a ship. Other cells are secondary
+    items: an option covers the cells of its ship uncolored, so no two ships overlap, and the cells around it
+    with the water color, so surrounding water can be shared but never holds another ship. Row and column
+    sums are side conditions checked as options are chosen, and ships of the same size are placed in
+    increasing placement id order so that interchangeable ships are not permuted.
+    """
+    size: int
+    ship_constraints: List[int]
+    row_constraints: List[int]
+    col_constraints: List[int]
+    table: PlacementTable
+    slots: List[int]
+    chosen: List[int]
+    chosen_slots: Dict[int, int]
+    row_counts: List[int]
+    col_counts: List[int]
+    nodes: int
+    stats: Optional[Stats]
+    budget: Optional[Budget]
+    option_slot: List[int]
+    option_placement: List[int]
+    llink: List[int]
+    rlink: List[int]
+    top: List[int]
+    ulink: List[int]
+    dlink: List[int]
+    color: List[int]
+    owner: List[int]
+
+    def __init__(self, size: int, ship_constraints: List[int] = None, row_constraints: List[int] = None,
+                 col_constraints: List[int] = None, stats: Optional[Stats] = None, budget: Optional[Budget] = None):
+        self.size = size
+        self.ship_constraints = ship_constraints
+        self.row_constraints = row_constraints
+        self.col_constraints = col_constraints
+        self.table = placement_table(size)
+        self.nodes = 0
+        self.stats = stats
+        self.budget = budget
+
+    def __repr__(self):
+        grid = bytearray(b"." * (self.size * self.size))
+        for placement in self.chosen:
+            for cell, glyph in zip(self.table.cells[placement], self.table.glyphs[placement]):
+                grid[cell] = glyph
+        return "\n".join(grid[row * self.size:(row + 1) * self.size].decode() for row in range(self.size))
+
+    def build(self, board_str: List[List[str]]):
+        n = self.size
+        hints = [board_str[cell // n][cell % n] for cell in range(n * n)]
+        ship_cells = [cell for cell in range(n * n) if hints[cell] in SHIP_HINTS]
+        open_cells = [cell for cell in range(n * n) if hints[cell] not in SHIP_HINTS and hints[cell] != "."]
+
+        self.slots = [size for size in range(4, 0, -1) for _ in range(self.ship_constraints[size - 1])]
+        num_primary = len(self.slots) + len(ship_cells)
+        item_of = {}
+        for index, cell in enumerate(ship_cells):
+            item_of[cell] = len(self.slots) + 1 + index
+        for index, cell in enumerate(open_cells):
+            item_of[cell] = num_primary + 1 + index
+        num_items = num_primary + len(open_cells)
+
+        candidates = {}
+        for size in set(self.slots):
+            candidates[size] = [placement for placement in self.candidate_placements(size)
+                                if self.fits(placement, hints)]
+
+        options = []
+        self.option_slot = []
+        self.option_placement = []
+        for slot, size in enumerate(self.slots):
+            for placement in candidates[size]:
+                cells = self.table.cells[placement]
+                option = [(slot + 1, 0)] + [(item_of[cell], 0) for cell in cells]
+                halo = {neighbour for cell in cells for neighbour in self.table.neighbourhood(cell)} - set(cells)
+                option += [(item_of[cell], WATER_COLOR) for cell in sorted(halo) if cell in item_of]
+                options.append(option)
+                self.option_slot.append(slot)
+                self.option_placement.append(placement)
+        self.link(num_primary, num_items, options)
+
+        self.chosen = []
+        self.row_counts = [0] * n
+        self.col_counts = [0] * n
+
+    def candidate_placements(self, size: int) -> List[int]:
+        n = self.size
+        placements = []
+        for y in range(n):
+            for x in range(n):
+                for vertical in ([False] if size == 1 else [True, False]):
+                    placement = placement_id(size, x, y, vertical, n)
+                    if self.table.cells[placement]:
+                        placements.append(placement)
+        return placements
+
+    def fits(self, placement: int, hints: List[str]) -> bool:
+        # static filtering: the ship must agree with the hints and fit the row and column sums on its own
+        n = self.size
+        cells = self.table.cells[placement]
+        glyphs = self.table.glyphs[placement]
+        rows = {}
+        cols = {}
+        for cell, glyph in zip(cells, glyphs):
+            if hints[cell] == "." or (hints[cell] in SHIP_HINTS and ord(hints[cell]) != glyph):
+                return False
+            rows[cell // n] = rows.get(cell // n, 0) + 1
+            cols[cell % n] = cols.get(cell % n, 0) + 1
+        if any(count > self.row_constraints[row] for row, count in rows.items()):
+            return False
+        if any(count > self.col_constraints[col] for col, count in cols.items()):
+            return False
+        for cell in cells:
+            for neighbour in self.table.neighbourhood(cell):
+                if neighbour not in cells and hints[neighbour] in SHIP_HINTS:
+                    return False
+        return True
+
+    def link(self, num_primary: int, num_items: int, options: List[List[Tuple[int, int]]]):
+        # item headers are nodes 0..num_items, the primary items form the circular list headed by 0
+        self.llink = [0] * (num_items + 2)
+        self.rlink = [0] * (num_items + 2)
+        for item in range(1, num_items + 1):
+            self.llink[item] = item - 1
+            self.rlink[item - 1] = item
+        self.llink[num_items + 1] = num_items
+        self.rlink[num_items] = num_items + 1
+        self.llink[num_primary + 1] = num_items + 1
+        self.rlink[num_items + 1] = num_primary + 1
+        self.llink[0] = num_primary
+        self.rlink[num_primary] = 0
+
+        # headers keep their option count in top, spacers have top <= 0 and link to the neighbouring options
+        self.top = [0] * (num_items + 1)
+        self.ulink = list(range(num_items + 1))
+        self.dlink = list(range(num_items + 1))
+        self.color = [0] * (num_items + 1)
+        self.owner = [-1] * (num_items + 1)
+        spacer = self.append_node(0, 0, -1)
+        for index, option in enumerate(options):
+            first = len(self.top)
+            for item, color in option:
+                node = self.append_node(item, color, index)
+                self.top[item] += 1
+                self.ulink[node] = self.ulink[item]
+                self.dlink[self.ulink[item]] = node
+                self.dlink[node] = item
+                self.ulink[item] = node
+            self.dlink[spacer] = len(self.top) - 1
+            spacer = self.append_node(-(index + 1), 0, -1)
+            self.ulink[spacer] = first
+
+    def append_node(self, top: int, color: int, owner: int) -> int:
+        self.top.append(top)
+        self.ulink.append(0)
+        self.dlink.append(0)
+        self.color.append(color)
+        self.owner.append(owner)
+        return len(self.top) - 1
+
+    def hide(self, p: int):
+        top, ulink, dlink, color = self.top, self.ulink, self.dlink, self.color
+        q = p + 1
+        while q != p:
+            x = top[q]
+            if x <= 0:
+                q = ulink[q]
+            elif color[q] < 0:
+                q += 1
+            else:
+                u = ulink[q]
+                d = dlink[q]
+                dlink[u] = d
+                ulink[d] = u
+                top[x] -= 1
+                q += 1
+
+    def unhide(self, p: int):
+        top, ulink, dlink, color = self.top, self.ulink, self.dlink, self.color
+        q = p - 1
+        while q != p:
+            x = top[q]
+            if x <= 0:
+                q = dlink[q]
+            elif color[q] < 0:
+                q -= 1
+            else:
+                u = ulink[q]
+                d = dlink[q]
+                dlink[u] = q
+                ulink[d] = q
+                top[x] += 1
+                q -= 1
+
+    def cover(self, item: int):
+        p = self.dlink[item]
+        while p != item:
+            self.hide(p)
+            p = self.dlink[p]
+        left = self.llink[item]
+        right = self.rlink[item]
+        self.rlink[left] = right
+        self.llink[right] = left
+
+    def uncover(self, item: int):
+        left = self.llink[item]
+        right = self.rlink[item]
+        self.rlink[left] = item
+        self.llink[right] = item
+        p = self.ulink[item]
+        while p != item:
+            self.unhide(p)
+            p = self.ulink[p]
+
+    def purify(self, p: int):
+        color = self.color[p]
+        item = self.top[p]
+        q = self.dlink[item]
+        while q != item:
+            if self.color[q] == color:
+                self.color[q] = -1
+            else:
+                self.hide(q)
+            q = self.dlink[q]
+
+    def unpurify(self, p: int):
+        color = self.color[p]
+        item = self.top[p]
+        q = self.ulink[item]
+        while q != item:
+            if self.color[q] < 0:
+                self.color[q] = color
+            else:
+                self.unhide(q)
+            q = self.ulink[q]
+
+    def commit(self, p: int, item: int):
+        if self.color[p] == 0:
+            self.cover(item)
+        elif self.color[p] > 0:
+            self.purify(p)
+
+    def uncommit(self, p: int, item: int):
+        if self.color[p] == 0:
+            self.uncover(item)
+        elif self.color[p] > 0:
+            self.unpurify(p)
+
+    def accept(self, option: int) -> bool:
+        slot = self.option_slot[option]
+        placement = self.option_placement[option]
+        size = self.slots[slot]
+        for other, other_placement in self.chosen_slots.items():
+            if self.slots[other] == size and (other < slot) != (other_placement < placement):
+                return False
+        n = self.size
+        cells = self.table.cells[placement]
+        if placement >> 2 & 1:
+            col = cells[0] % n
+            return (self.col_counts[col] + size <= self.col_constraints[col]
+                    and all(self.row_counts[cell // n] < self.row_constraints[cell // n] for cell in cells))
+        row = cells[0] // n
+        return (self.row_counts[row] + size <= self.row_constraints[row]
+                and all(self.col_counts[cell % n] < self.col_constraints[cell % n] for cell in cells))
+
+    def place(self, option: int, sign: int):
+        n = self.size
+        for cell in self.table.cells[self.option_placement[option]]:
+            self.row_counts[cell // n] += sign
+            self.col_counts[cell % n] += sign
+
+    def search(self) -> bool:
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.node(len(self.chosen_slots))
+        budget = self.budget
+        if budget is not None:
+            budget.tick()
+            if len(self.chosen_slots) > budget.partial_depth:
+                self.chosen = list(self.chosen_slots.values())
+                budget.keep(len(self.chosen_slots), self.__repr__())
+        if self.rlink[0] == 0:
+            return self.row_counts == list(self.row_constraints) and self.col_counts == list(self.col_constraints)
+
+        # choose the primary item with the fewest remaining options
+        item = 0
+        fewest = None
+        candidate = self.rlink[0]
+        while candidate != 0:
+            if fewest is None or self.top[candidate] < fewest:
+                item = candidate
+                fewest = self.top[candidate]
+                if fewest == 0:
+                    return False
+            candidate = self.rlink[candidate]
+
+        self.cover(item)
+        x = self.dlink[item]
+        while x != item:
+            option = self.owner[x]
+            if not self.accept(option):
+                if stats is not None:
+                    stats.prune("side conditions", 1)
+            else:
+                if stats is not None:
+                    stats.placements += 1
+                p = x + 1
+                while p != x:
+                    j = self.top[p]
+                    if j <= 0:
+                        p = self.ulink[p]
+                    else:
+                        self.commit(p, j)
+                        p += 1
+                self.place(option, 1)
+                self.chosen_slots[self.option_slot[option]] = self.option_placement[option]
+                if self.search():
+                    return True
+                if stats is not None:
+                    stats.backtracks += 1
+                del self.chosen_slots[self.option_slot[option]]
+                self.place(option, -1)
+                p = x - 1
+                while p != x:
+                    j = self.top[p]
+                    if j <= 0:
+                        p = self.dlink[p]
+                    else:
+                        self.uncommit(p, j)
+                        p -= 1
+            x = self.dlink[x]
+        self.uncover(item)
+        return False
+
+    def solve(self, board_str: List[List[str]]) -> Optional[DLXBoard]:
+        with phase(self.stats, "build"):
+            self.build(board_str)
+        self.chosen_slots = {}
+        with phase(self.stats, "search"):
+            if not self.search():
+                return None
+        self.chosen = [self.chosen_slots[slot] for slot in sorted(self.chosen_slots)]
+        return self
+
+
+def solve(puzzle: Puzzle, stats: Optional[Stats] = None, timeout: Optional[float] = None,
+          max_nodes: Optional[int] = None) -> SolveResult:
+    budget = Budget(timeout, max_nodes) if timeout is not None or max_nodes is not None else None
+    board = DLXBoard(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                     list(puzzle.col_constraints), stats, budget)
+    try:
+        final = board.solve(puzzle.board_str)
+    except BudgetExceeded:
+        return SolveResult(TIMEOUT, None, stats, budget.partial)
+    if final is None:
+        return SolveResult(UNSAT, None, stats)
+    return SolveResult(SOLVED, final.__repr__(), stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        default=None,
+        help="Report search statistics on stderr in the given format."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds of search."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="Give up after this many search nodes."
+    )
+    args = parser.parse_args()
+    stats = Stats() if args.stats else None
+    with phase(stats, "parse"):
+        puzzle = read_puzzle(args.inputfile)
+    result = solve(puzzle, stats, args.timeout, args.max_nodes)
+    with phase(stats, "output"):
+        write_file = open(args.outputfile, 'w')
+        write_file.write(result.solution.__repr__() if result.solution is None else result.solution)
+        print(result.solution)
+    if result.status != SOLVED:
+        print("status: {}".format(result.status), file=sys.stderr)
+    if stats is not None:
+        print(stats.to_json(), file=sys.stderr)
+    sys.exit(result.exit_code)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import *
+
+UNKNOWN = "?"
+WATER = "."
+SHIP = "X"
+
+LINE_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def solve_line(line: str, remaining: int, fleet: Tuple[int, ...]) -> Optional[str]:
+    """Intersect every way of filling a row or column.
+
+    line holds one of UNKNOWN, WATER or SHIP per cell, remaining is the number of ship cells the line has to
+    hold, its SHIP cells included, and fleet[i] is the number of ships of size i + 1 that are still free to lie
+    along the line. A run of two or more ship cells is a ship lying along the line, a single cell may also
+    be a ship crossing it. Returns the line with every forced cell filled in, or None if no filling exists.
+    """
+    memo: Dict[Tuple[int, int, Tuple[int, ...]], Optional[Tuple[int, int]]] = {}
+
+    def suffix(pos: int, remaining: int, fleet: Tuple[int, ...]) -> Optional[Tuple[int, int]]:
+        # returns bitmasks of the cells from pos onwards that can be a ship and that can be water
+        key = (pos, remaining, fleet)
+        if key in memo:
+            return memo[key]
+        if pos >= len(line):
+            memo[key] = (0, 0) if remaining == 0 else None
+            return memo[key]
+
+        ship = 0
+        water = 0
+        found = False
+        if line[pos] != SHIP:
+            rest = suffix(pos + 1, remaining, fleet)
+            if rest is not None:
+                found = True
+                ship |= rest[0]
+                water |= rest[1] | (1 << pos)
+
+        for length in range(1, min(remaining, len(fleet)) + 1):
+            end = pos + length
+            if end > len(line) or line[end - 1] == WATER:
+                break
+            if end < len(line) and line[end] == SHIP:
+                continue
+            if length == 1:
+                if not any(fleet):
+                    continue
+                new_fleet = fleet
+            else:
+                if fleet[length - 1] == 0:
+                    continue
+                new_fleet = fleet[:length - 1] + (fleet[length - 1] - 1,) + fleet[length:]
+            rest = suffix(end + 1, remaining - length, new_fleet)
+            if rest is not None:
+                found = True
+                ship |= rest[0] | (((1 << length) - 1) << pos)
+                water |= rest[1]
+                if end < len(line):
+                    water |= 1 << end
+
+        memo[key] = (ship, water) if found else None
+        return memo[key]
+
+    result = suffix(0, remaining, fleet)
+    if result is None:
+        return None
+    ship, water = result
+    forced = []
+    for pos in range(len(line)):
+        can_ship = ship >> pos & 1
+        can_water = water >> pos & 1
+        if can_ship and not can_water:
+            forced.append(SHIP)
+        elif can_water and not can_ship:
+            forced.append(WATER)
+        else:
+            forced.append(UNKNOWN)
+    return "".join(forced)
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import argparse
+import copy
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import *
+
+from battle import Board, Domain, ShipException, SymmetryBreaker, symmetry_breaker
+from budget import EXIT_CODES, SOLVED, TIMEOUT, UNSAT
+from precheck import MalformedPuzzle, precheck
+from puzzle import Puzzle, read_puzzle
+
+
+class Frame:
+    board: Board
+    domain: Domain
+    moves: List[int]
+
+    def __init__(self, board: Board):
+        # the search branches on the smallest domain, its untried moves are kept in reverse so pop() is next
+        self.board = board
+        self.domain = min(board.domains, key=lambda domain: domain.domain_size)
+        self.moves = list(domain for domain in self.domain.domain())[::-1]
+
+    def next_child(self) -> Optional[Board]:
+        move = self.moves.pop()
+        child = copy.deepcopy(self.board)
+        # later siblings must not place a ship here again, or solutions would be found twice
+        self.domain.prune(move >> 2, 0)
+        try:
+            child.set_ship(move)
+            child.propagate()
+        except ShipException:
+            return None
+        return child
+
+
+def split(boards: List[Board], target: int) -> List[Board]:
+    """Expand the top of the search tree breadth first until there are at least target work units."""
+    units = deque(boards)
+    solved = []
+    while units and len(units) + len(solved) < target:
+        board = units.popleft()
+        if not board.domains:
+            solved.append(board)
+            continue
+        frame = Frame(board)
+        while frame.moves:
+            child = frame.next_child()
+            if child is not None:
+                units.append(child)
+    return solved + list(units)
+
+
+@dataclass
+class ParallelResult:
+    solution: Optional[Board]
+    solutions: int
+    nodes: int
+    units: int
+    status: str = SOLVED
+    orbits: int = 0
+    # why the puzzle was rejected before any search, see precheck.py
+    reason: Optional[str] = None
+
+
+def explore(root: Board, tasks: multiprocessing.Queue, pending, hungry, stop, count_all: bool,
+            symmetry: Optional[SymmetryBreaker] = None) -> Tuple[int, int, Optional[Board], int]:
+    """Returns the solutions and orbits below root, the first solution found and the nodes explored. Without
+    symmetry breaking every solution is its own orbit, with it only the greatest solution of each orbit is
+    visited and counts for the size of its orbit."""
+    solutions = 0
+    orbits = 0
+    first = None
+    nodes = 0
+    if symmetry is not None and symmetry.violated(root):
+        return 0, 0, None, 0
+    if not root.domains:
+        return len(symmetry.orbit(root.__repr__())) if symmetry is not None else 1, 1, root, 0
+    stack = [Frame(root)]
+    while stack and not stop.is_set():
+        nodes += 1
+        if nodes % 32 == 0 and hungry.value > 0:
+            donate(stack, tasks, pending, hungry)
+        frame = stack[-1]
+        if not frame.moves:
+            stack.pop()
+            continue
+        child = frame.next_child()
+        if child is None or (symmetry is not None and symmetry.violated(child)):
+            continue
+        if not child.domains:
+            solutions += len(symmetry.orbit(child.__repr__())) if symmetry is not None else 1
+            orbits += 1
+            if first is None:
+                first = child
+            if not count_all:
+                break
+            continue
+        stack.append(Frame(child))
+    return solutions, orbits, first, nodes
+
+
+def donate(stack: List[Frame], tasks: multiprocessing.Queue, pending, hungry):
+    # Hand the untried siblings of the oldest open frame to an idle worker. The frames above it belong to
+    # the move currently being explored, so they stay on this worker's stack.
+    for index, frame in enumerate(stack):
+        if frame.moves:
+            with hungry.get_lock():
+                if hungry.value == 0:
+                    return
+                hungry.value -= 1
+            with pending.get_lock():
+                pending.value += 1
+            tasks.put(copy.deepcopy(frame.board))
+            del stack[index]
+            return
+
+
+def worker(tasks: multiprocessing.Queue, results: multiprocessing.Queue, pending, hungry, stop, count_all: bool,
+           symmetry: Optional[SymmetryBreaker]):
+    waiting = False
+    while not stop.is_set():
+        try:
+            board = tasks.get(timeout=0.01)
+        except queue.Empty:
+            if pending.value == 0:
+                break
+            if not waiting:
+                waiting = True
+                with hungry.get_lock():
+                    hungry.value += 1
+            continue
+        if waiting:
+            waiting = False
+            with hungry.get_lock():
+                if hungry.value > 0:
+                    hungry.value -= 1
+        solutions, orbits, first, nodes = explore(board, tasks, pending, hungry, stop, count_all, symmetry)
+        results.put(("done", solutions, orbits, first, nodes))
+        with pending.get_lock():
+            pending.value -= 1
+    results.put(("exit", 0, 0, None, 0))
+
+
+def drain(tasks: multiprocessing.Queue, processes: List[multiprocessing.Process]):
+    # Once the search stops, the work units nobody took are left in tasks, partly still in the feeder threads of
+    # this process and of the workers that donated them. A process waits at exit until its feeder has written
+    # everything, so read until the workers are gone and the queue stays empty.
+    while True:
+        try:
+            tasks.get(timeout=0.05)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    # all readers are gone, should a unit still sit in this process's feeder it must not block our exit
+    tasks.cancel_join_thread()
+
+
+def solve_parallel(board: Board, board_str: List[List[str]], workers: Optional[int] = None,
+                   count_all: bool = False, units_per_worker: int = 4,
+                   timeout: Optional[float] = None, symmetry: Optional[SymmetryBreaker] = None) -> ParallelResult:
+    """Search board over a process pool. The top of the tree is split into work units up front and busy
+    workers give work away when one runs dry. Stops at the first solution unless count_all is set, or when
+    timeout seconds have passed, in which case the counts cover the finished units only."""
+    # the search takes the sums as upper bounds, sums that do not add up to the fleet have to be caught here
+    reason = precheck(Puzzle(board.size, list(board.row_constraints), list(board.col_constraints),
+                             [domain.num_ships_remaining for domain in board.all_domains()], board_str))
+    if reason is not None:
+        return ParallelResult(None, 0, 0, 0, UNSAT, reason=reason)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    board.handle_simple_hints(board_str)
+    roots = []
+    for root in board.handle_complex_hints(board_str):
+        try:
+            root.propagate()
+            roots.append(root)
+        except ShipException:
+            pass
+    units = split(roots, workers * units_per_worker)
+
+    context = multiprocessing.get_context()
+    tasks = context.Queue()
+    results = context.Queue()
+    pending = context.Value("i", len(units))
+    hungry = context.Value("i", 0)
+    stop = context.Event()
+    for unit in units:
+        tasks.put(unit)
+    processes = [context.Process(target=worker, args=(tasks, results, pending, hungry, stop, count_all, symmetry),
+                                 daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    solution = None
+    solutions = 0
+    orbits = 0
+    nodes = 0
+    exited = 0
+    timed_out = False
+    while exited < workers:
+        try:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None and not timed_out else None
+            kind, found, found_orbits, first, explored = results.get(timeout=remaining)
+        except queue.Empty:
+            timed_out = True
+            stop.set()
+            continue
+        if kind == "exit":
+            exited += 1
+            continue
+        solutions += found
+        orbits += found_orbits
+        nodes += explored
+        if first is not None and solution is None:
+            solution = first
+            if not count_all:
+                stop.set()
+    drain(tasks, processes)
+    for process in processes:
+        process.join()
+    if solution is not None and not (count_all and timed_out):
+        status = SOLVED
+    else:
+        status = TIMEOUT if timed_out else UNSAT
+    return ParallelResult(solution, solutions, nodes, len(units), status, orbits)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of worker processes, defaults to the number of cores."
+    )
+    parser.add_argument(
+        "--count",
+        action="store_true",
+        help="Count every solution instead of stopping at the first one."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds."
+    )
+    parser.add_argument(
+        "--break-symmetry",
+        action="store_true",
+        help="Search one solution per orbit when the puzzle is its own mirror image or rotation, counts still "
+             "cover every solution."
+    )
+    args = parser.parse_args()
+    puzzle = read_puzzle(args.inputfile)
+    try:
+        reason = precheck(puzzle)
+    except MalformedPuzzle as error:
+        sys.exit("malformed puzzle: {}".format(error))
+    symmetry = symmetry_breaker(puzzle) if args.break_symmetry else None
+    if reason is not None:
+        result = ParallelResult(None, 0, 0, 0, UNSAT, reason=reason)
+    else:
+        try:
+            board = Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                          list(puzzle.col_constraints))
+            result = solve_parallel(board, puzzle.board_str, args.workers, args.count, timeout=args.timeout,
+                                    symmetry=symmetry)
+        except ShipException:
+            result = ParallelResult(None, 0, 0, 0, UNSAT)
+    if result.solution is not None:
+        write_file = open(args.outputfile, 'w')
+        write_file.write(result.solution.__repr__())
+        print(result.solution)
+    if args.count:
+        print("solutions: {}".format(result.solutions))
+        if symmetry is not None:
+            print("orbits: {} under {} symmetries".format(result.orbits, len(symmetry.symmetries) + 1))
+    print("nodes: {} over {} initial units".format(result.nodes, result.units), file=sys.stderr)
+    if result.status != SOLVED:
+        print("status: {}".format(result.status), file=sys.stderr)
+    if result.reason is not None:
+        print("reason: {}".format(result.reason), file=sys.stderr)
+    sys.exit(EXIT_CODES[result.status])
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import queue
+import sys
+import time
+from dataclasses import dataclass
+from typing import *
+
+from budget import EXIT_CODES, SOLVED, TIMEOUT, UNKNOWN, UNSAT
+from precheck import MalformedPuzzle, precheck
+from puzzle import Puzzle, read_puzzle, verify
+
+
+# Engine adapters take a puzzle and a seed and return the solved board as text. The engine modules are
+# imported inside the adapters so a worker only pays for the engine it runs.
+
+def solve_battle(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import battle
+    board = battle.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    result = board.solve(puzzle.board_str, battle.Search())
+    return result.__repr__() if result else None
+
+
+def solve_battle_random(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import battle
+    board = battle.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    result = board.solve(puzzle.board_str, battle.Search("random", seed))
+    return result.__repr__() if result else None
+
+
+def solve_attemp(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import attemp
+    board = attemp.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    result = board.solve(puzzle.board_str)
+    return "\n".join("".join(row) for row in result.board_repr()) if result else None
+
+
+def solve_mvp(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import Mvp
+    board = Mvp.Board(puzzle.size, list(puzzle.row_constraints), list(puzzle.col_constraints),
+                      list(puzzle.ship_constraints))
+    result = board.solve(puzzle.board_str)
+    return result.__repr__().replace("0", ".") if result else None
+
+
+def solve_mvp2(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import Mvp2
+    board = Mvp2.Board(puzzle.size, list(puzzle.row_constraints), list(puzzle.col_constraints),
+                       list(puzzle.ship_constraints))
+    result = board.solve(puzzle.board_str)
+    return result.__repr__().replace("0", ".") if result else None
+
+
+def solve_battleship(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import BattleShip
+    board = BattleShip.Board(puzzle.size, puzzle.board_str, list(puzzle.ship_constraints),
+                             list(puzzle.row_constraints), list(puzzle.col_constraints))
+    result = board.backtracking_search()
+    if result is None:
+        return None
+    return result.solution()
+
+
+def solve_dlx(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import dlx
+    board = dlx.DLXBoard(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    result = board.solve(puzzle.board_str)
+    return result.__repr__() if result else None
+
+
+def solve_sat(puzzle: Puzzle, seed: int) -> Optional[str]:
+    import cnf
+    return cnf.solve(puzzle).solution
+
+
+ENGINES: Dict[str, Callable[[Puzzle, int], Optional[str]]] = {
+    "battle": solve_battle,
+    "battle-random": solve_battle_random,
+    "attemp": solve_attemp,
+    "mvp": solve_mvp,
+    "mvp2": solve_mvp2,
+    "battleship": solve_battleship,
+    "dlx": solve_dlx,
+    "sat": solve_sat,
+}
+
+# the engines whose search is complete, so that finding nothing after precheck proves the puzzle unsatisfiable.
+# The others only ever contribute a solution, a race with nothing but them finding none ends unknown.
+COMPLETE_ENGINES = {"battle", "battle-random", "dlx", "sat"}
+
+# the legacy engines miss solutions or draw wrong grids, they stay selectable with --engines for comparison
+DEFAULT_ENGINES = ["battle", "dlx", "sat"]
+
+
+@dataclass
+class PortfolioResult:
+    engine: Optional[str]
+    seed: Optional[int]
+    solution: Optional[str]
+    elapsed: float
+    status: str = SOLVED
+    reason: Optional[str] = None
+
+
+def run_engine(name: str, puzzle: Puzzle, seed: int, results: multiprocessing.Queue):
+    start = time.time()
+    solution = None
+    error = None
+    try:
+        # several engines print their progress, keep the portfolio's own output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            solution = ENGINES[name](puzzle, seed)
+    except Exception as exception:
+        error = "{}: {}".format(type(exception).__name__, exception)
+    results.put((name, seed, solution, time.time() - start, error))
+
+
+def solve_portfolio(puzzle: Puzzle, engines: Optional[List[str]] = None, random_variants: int = 2,
+                    seed: int = 0, timeout: Optional[float] = None) -> PortfolioResult:
+    """Race the engines in separate processes and return the first verified solution, stopping the others.
+    Without one the status tells whether an engine finished without finding one (unsat), the timeout ran out, or
+    every run crashed or drew a grid that fails verification (unknown), with the reason listing the failures.
+    Puzzles that precheck proves unsatisfiable are answered before any engine starts, malformed ones raise
+    MalformedPuzzle."""
+    # the battle adapters take the sums as upper bounds, precheck makes them agree with solver.solve
+    reason = precheck(puzzle)
+    if reason is not None:
+        return PortfolioResult(None, None, None, 0.0, UNSAT, reason)
+    if engines is None:
+        engines = DEFAULT_ENGINES
+    runs = [(name, seed) for name in engines]
+    runs += [("battle-random", seed + variant) for variant in range(random_variants)]
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    processes = [context.Process(target=run_engine, args=(name, puzzle, run_seed, results), daemon=True)
+                 for name, run_seed in runs]
+    start = time.time()
+    deadline = None if timeout is None else start + timeout
+    for process in processes:
+        process.start()
+    failures = []
+    finished = False
+    try:
+        for _ in processes:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                name, run_seed, solution, elapsed, error = results.get(timeout=remaining)
+            except queue.Empty:
+                return PortfolioResult(None, None, None, time.time() - start, TIMEOUT, "; ".join(failures) or None)
+            if error is not None:
+                failures.append("{} (seed {}) failed with {}".format(name, run_seed, error))
+            elif solution is None:
+                if name in COMPLETE_ENGINES:
+                    finished = True
+                else:
+                    failures.append("{} (seed {}) found nothing".format(name, run_seed))
+            elif verify(puzzle, solution):
+                return PortfolioResult(name, run_seed, solution, elapsed)
+            else:
+                failures.append("{} (seed {}) drew a grid that fails verification".format(name, run_seed))
+        return PortfolioResult(None, None, None, time.time() - start, UNSAT if finished else UNKNOWN,
+                               "; ".join(failures) or None)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--engines",
+        type=str,
+        default=",".join(DEFAULT_ENGINES),
+        help="Comma separated engines to race, out of {}.".format(", ".join(ENGINES))
+    )
+    parser.add_argument(
+        "--random",
+        type=int,
+        default=2,
+        help="The number of randomized battle searches to add to the race."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The seed of the first randomized search."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds."
+    )
+    args = parser.parse_args()
+    puzzle = read_puzzle(args.inputfile)
+    try:
+        result = solve_portfolio(puzzle, args.engines.split(","), args.random, args.seed, args.timeout)
+    except MalformedPuzzle as error:
+        sys.exit("malformed puzzle: {}".format(error))
+    if result.status != SOLVED:
+        print("No engine found a solution ({})".format(result.status))
+        if result.reason is not None:
+            print("reason: {}".format(result.reason), file=sys.stderr)
+    else:
+        write_file = open(args.outputfile, 'w')
+        write_file.write(result.solution)
+        print(result.solution)
+        print("solved by {} (seed {}) in {:.3f} seconds".format(result.engine, result.seed, result.elapsed))
+    sys.exit(EXIT_CODES[result.status])
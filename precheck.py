@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from puzzle import SHIP_GLYPHS
+
+# imported by the library API, so no typing at run time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import *
+
+    from puzzle import Puzzle
+
+HINT_GLYPHS = "0." + SHIP_GLYPHS
+
+# the neighbour a ship end hint points at, which is the next cell of its ship
+POINTS = {"<": (1, 0), ">": (-1, 0), "^": (0, 1), "v": (0, -1)}
+DIAGONALS = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+SIDES = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+class MalformedPuzzle(ValueError):
+    pass
+
+
+def check_shape(puzzle: Puzzle):
+    n = puzzle.size
+    if n < 1:
+        raise MalformedPuzzle("the board size is {}".format(n))
+    if len(puzzle.row_constraints) != n or len(puzzle.col_constraints) != n:
+        raise MalformedPuzzle("{} row sums and {} column sums for a board of size {}".format(
+            len(puzzle.row_constraints), len(puzzle.col_constraints), n))
+    if len(puzzle.ship_constraints) != 4:
+        raise MalformedPuzzle("the fleet has {} ship counts, one per size from 1 to 4 expected".format(
+            len(puzzle.ship_constraints)))
+    if min(list(puzzle.row_constraints) + list(puzzle.col_constraints) + list(puzzle.ship_constraints)) < 0:
+        raise MalformedPuzzle("a sum or ship count is negative")
+    if len(puzzle.board_str) != n or any(len(row) != n for row in puzzle.board_str):
+        raise MalformedPuzzle("the hint grid is not {} by {}".format(n, n))
+    for y, row in enumerate(puzzle.board_str):
+        for x, hint in enumerate(row):
+            if hint not in HINT_GLYPHS:
+                raise MalformedPuzzle("unknown hint {!r} at row {}, column {}".format(hint, y, x))
+
+
+def line_capacity(length: int, ship_size: int) -> int:
+    # ships along one line are kept apart by at least one cell of water
+    return (length + 1) // (ship_size + 1)
+
+
+def precheck(puzzle: Puzzle) -> Optional[str]:
+    """Cheap global checks to run before any search. Returns why the puzzle has no solution when one of them
+    proves it, None when they all pass, which does not mean it has one. Raises MalformedPuzzle when the puzzle
+    is not a puzzle at all: sums or fleet of the wrong length, negative counts or unknown hint glyphs."""
+    check_shape(puzzle)
+    n = puzzle.size
+    rows = list(puzzle.row_constraints)
+    cols = list(puzzle.col_constraints)
+    fleet = list(puzzle.ship_constraints)
+    cells = sum(size * count for size, count in enumerate(fleet, 1))
+    if sum(rows) != cells or sum(cols) != cells:
+        return "the row sums add up to {}, the column sums to {} and the fleet has {} ship cells".format(
+            sum(rows), sum(cols), cells)
+    # the ship cells next to each other along a line are one ship, so runs of at most 4 with water between them
+    densest = n - n // 5
+    for name, sums in [("row", rows), ("column", cols)]:
+        for line, total in enumerate(sums):
+            if total > densest:
+                return "{} {} needs {} ship cells, at most {} fit in a line".format(name, line, total, densest)
+    # a ship of size 2 or more lies along one line and takes its size from that line's sum
+    for size in range(4, 1, -1):
+        ships = sum(fleet[size - 1:])
+        room = sum(min(total // size, line_capacity(n, size)) for total in rows + cols)
+        if ships > room:
+            return "{} ships of size {} or more, the sums leave room for {}".format(ships, size, room)
+    return check_hints(puzzle, rows, cols, fleet)
+
+
+def check_hints(puzzle: Puzzle, rows: List[int], cols: List[int], fleet: List[int]) -> Optional[str]:
+    n = puzzle.size
+    ship = [[False] * n for _ in range(n)]
+    water = [[False] * n for _ in range(n)]
+
+    def mark(grid: List[List[bool]], x: int, y: int):
+        if 0 <= x < n and 0 <= y < n:
+            grid[y][x] = True
+
+    counts = {glyph: 0 for glyph in SHIP_GLYPHS}
+    for y, row in enumerate(puzzle.board_str):
+        for x, hint in enumerate(row):
+            if hint == ".":
+                water[y][x] = True
+            if hint not in SHIP_GLYPHS:
+                continue
+            counts[hint] += 1
+            ship[y][x] = True
+            for dx, dy in DIAGONALS:
+                mark(water, x + dx, y + dy)
+            if hint == "S":
+                for dx, dy in SIDES:
+                    mark(water, x + dx, y + dy)
+            elif hint in POINTS:
+                dx, dy = POINTS[hint]
+                if not (0 <= x + dx < n and 0 <= y + dy < n):
+                    return "the {} at row {}, column {} points off the board".format(hint, y, x)
+                mark(ship, x + dx, y + dy)
+                mark(water, x - dx, y - dy)
+            else:
+                # a middle on an edge can only run along it
+                across = 0 < x < n - 1
+                down = 0 < y < n - 1
+                if not across and not down:
+                    return "the M at row {}, column {} has no room for a ship through it".format(y, x)
+                if not across:
+                    mark(ship, x, y - 1)
+                    mark(ship, x, y + 1)
+                    mark(water, x - 1, y)
+                    mark(water, x + 1, y)
+                if not down:
+                    mark(ship, x - 1, y)
+                    mark(ship, x + 1, y)
+                    mark(water, x, y - 1)
+                    mark(water, x, y + 1)
+    if counts["S"] > fleet[0]:
+        return "{} submarine hints for a fleet of {} submarines".format(counts["S"], fleet[0])
+    # every ship of size 2 or more has one top or left end, and size - 2 middles
+    ends = max(counts["<"] + counts["^"], counts[">"] + counts["v"])
+    if ends > sum(fleet[1:]):
+        return "{} ship end hints for a fleet of {} ships of size 2 or more".format(ends, sum(fleet[1:]))
+    middles = sum((size - 2) * count for size, count in enumerate(fleet, 1) if size > 2)
+    if counts["M"] > middles:
+        return "{} middle hints for a fleet with {} middle cells".format(counts["M"], middles)
+    for y in range(n):
+        for x in range(n):
+            if ship[y][x] and water[y][x]:
+                return "the hints make the cell at row {}, column {} both ship and water".format(y, x)
+    for name, sums, lines in [("row", rows, ship), ("column", cols, [list(line) for line in zip(*ship)])]:
+        for line, total in enumerate(sums):
+            known = sum(lines[line])
+            if known > total:
+                return "the hints put {} ship cells in {} {}, which has a sum of {}".format(known, name, line, total)
+    for name, sums, lines in [("row", rows, water), ("column", cols, [list(line) for line in zip(*water)])]:
+        for line, total in enumerate(sums):
+            free = n - sum(lines[line])
+            if free < total:
+                return "the hints leave {} cells of {} {} that can be ship, its sum is {}".format(
+                    free, name, line, total)
+    return None
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+# this module is on the import path of the library API, keep it free of typing and dataclasses at run time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import *
+
+SHIP_GLYPHS = "S^v<>M"
+
+
+class Puzzle:
+    size: int
+    row_constraints: List[int]
+    col_constraints: List[int]
+    ship_constraints: List[int]
+    board_str: List[List[str]]
+
+    def __init__(self, size: int, row_constraints: List[int], col_constraints: List[int],
+                 ship_constraints: List[int], board_str: List[List[str]]):
+        self.size = size
+        self.row_constraints = row_constraints
+        self.col_constraints = col_constraints
+        self.ship_constraints = ship_constraints
+        self.board_str = board_str
+
+    def __repr__(self):
+        return "Puzzle(size={!r}, row_constraints={!r}, col_constraints={!r}, ship_constraints={!r}, " \
+               "board_str={!r})".format(self.size, self.row_constraints, self.col_constraints,
+                                        self.ship_constraints, self.board_str)
+
+    def __eq__(self, other):
+        if not isinstance(other, Puzzle):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
+
+
+def parse_puzzle(text: str) -> Puzzle:
+    # three header lines of digits (row sums, column sums, ships per size) followed by the hint grid
+    lines = [list(row) for row in text.splitlines()]
+    return Puzzle(size=len(lines[0]),
+                  row_constraints=[int(x) for x in lines[0]],
+                  col_constraints=[int(x) for x in lines[1]],
+                  ship_constraints=[int(x) for x in lines[2]],
+                  board_str=lines[3:])
+
+
+def format_puzzle(puzzle: Puzzle) -> str:
+    # the inverse of parse_puzzle
+    lines = ["".join(str(x) for x in puzzle.row_constraints), "".join(str(x) for x in puzzle.col_constraints),
+             "".join(str(x) for x in puzzle.ship_constraints)]
+    return "\n".join(lines + ["".join(row) for row in puzzle.board_str]) + "\n"
+
+
+def read_puzzle(path: str) -> Puzzle:
+    with open(path, "r") as file:
+        return parse_puzzle(file.read())
+
+
+def find_ships(rows: List[str]) -> Optional[List[Tuple[int, bool]]]:
+    """Split the ship cells of a solution into (size, vertical) ships, or None if they do not form straight,
+    correctly drawn, non-touching ships."""
+    size = len(rows)
+    seen = set()
+    ships = []
+    for y in range(size):
+        for x in range(size):
+            if rows[y][x] == "." or (x, y) in seen:
+                continue
+            vertical = y + 1 < size and rows[y + 1][x] != "."
+            length = 1
+            while True:
+                nx, ny = (x, y + length) if vertical else (x + length, y)
+                if nx >= size or ny >= size or rows[ny][nx] == ".":
+                    break
+                length += 1
+            cells = [(x, y + offset) if vertical else (x + offset, y) for offset in range(length)]
+            if length == 1:
+                expected = "S"
+            elif vertical:
+                expected = "^" + "M" * (length - 2) + "v"
+            else:
+                expected = "<" + "M" * (length - 2) + ">"
+            if length > 4 or "".join(rows[cy][cx] for cx, cy in cells) != expected:
+                return None
+            for cx, cy in cells:
+                for nx in range(cx - 1, cx + 2):
+                    for ny in range(cy - 1, cy + 2):
+                        if 0 <= nx < size and 0 <= ny < size and (nx, ny) not in cells and rows[ny][nx] != ".":
+                            return None
+            seen.update(cells)
+            ships.append((length, vertical))
+    return ships
+
+
+def verify(puzzle: Puzzle, solution: str) -> bool:
+    rows = solution.split()
+    size = puzzle.size
+    if len(rows) != size or any(len(row) != size or set(row) - set(SHIP_GLYPHS + ".") for row in rows):
+        return False
+    if [sum(cell != "." for cell in row) for row in rows] != puzzle.row_constraints:
+        return False
+    if [sum(row[x] != "." for row in rows) for x in range(size)] != puzzle.col_constraints:
+        return False
+    for y in range(size):
+        for x in range(size):
+            hint = puzzle.board_str[y][x]
+            if hint != "0" and hint != rows[y][x]:
+                return False
+    ships = find_ships(rows)
+    if ships is None:
+        return False
+    fleet = [0, 0, 0, 0]
+    for length, _ in ships:
+        fleet[length - 1] += 1
+    return fleet == list(puzzle.ship_constraints)
@@ -1,6 +1,9 @@
 import subprocess
 import time
 
+from puzzle import read_puzzle
+from verifier import verify_batch
+
 # List of input files and output files
 input_files = ["input_easy1.txt", "input_easy2.txt", "input_hard2.txt", "input_medium1.txt", "input_medium2.txt",
                "input_impossible1.txt", "input_impossible2.txt", "input_impossible3.txt"]
@@ -35,4 +38,12 @@ for i in range(0, len(input_files)):
         solution_file = open(solution_file, "r")
         print(solution_file.read())
 
-
+# The text diff only says an output matches the stored solution, also check every solved output against the
+# rules of its puzzle, all of them in one batch
+outputs = []
+for input_file in input_files:
+    with open(input_file.replace("input", "output"), "r") as output_file_reader:
+        outputs.append(output_file_reader.read())
+solved = [(read_puzzle(input_file), output) for input_file, output in zip(input_files, outputs) if output != "None"]
+valid = verify_batch([puzzle for puzzle, _ in solved], [output for _, output in solved])
+print(f"Verified {sum(valid)} of {len(solved)} solved outputs")
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from typing import *
+
+from puzzle import parse_puzzle
+from solver import solve
+from stats import Stats
+
+
+def handle_request(request: Dict[str, Any], received: Optional[float] = None) -> Dict[str, Any]:
+    """Answer one request of the form {"id", "puzzle", "engine", "timeout", "max_nodes", "stats"} where puzzle
+    is the text of a puzzle file. Never raises, a bad request is answered with status "error"."""
+    start = time.perf_counter()
+    response: Dict[str, Any] = {"id": request.get("id")}
+    try:
+        stats = Stats() if request.get("stats") else None
+        result = solve(parse_puzzle(request["puzzle"]), request.get("engine", "battle"), request.get("timeout"),
+                       request.get("max_nodes"), stats)
+        response["status"] = result.status
+        response["solution"] = result.solution
+        if result.partial is not None:
+            response["partial"] = result.partial
+        if stats is not None:
+            response["stats"] = stats.to_dict()
+    except Exception as e:
+        response["status"] = "error"
+        response["error"] = "{}: {}".format(type(e).__name__, e)
+    end = time.perf_counter()
+    response["timings"] = {"solve": round(end - start, 6)}
+    if received is not None:
+        # perf_counter is system wide on the platforms we run on, so the queue time spans processes
+        response["timings"]["queue"] = round(start - received, 6)
+    return response
+
+
+def warm_up():
+    # build the shared tables once per process so the first request does not pay for them
+    import battle
+    import dlx
+    import cnf
+    battle.placement_table(10)
+
+
+class Service:
+    """Reads JSON requests one per line and writes one JSON response per line. With workers the requests
+    are solved concurrently in a pool of warm processes and answered as they finish, so responses can come
+    back out of order and carry the request id; without, they are solved in this process in order."""
+    pool: Optional[multiprocessing.pool.Pool]
+
+    def __init__(self, workers: int = 0):
+        self.pool = None
+        if workers > 0:
+            self.pool = multiprocessing.get_context().Pool(workers, initializer=warm_up)
+        else:
+            warm_up()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def serve(self, infile: IO[str], outfile: IO[str]):
+        lock = threading.Lock()
+        outstanding = []
+
+        def respond(response: Dict[str, Any]):
+            with lock:
+                outfile.write(json.dumps(response) + "\n")
+                outfile.flush()
+
+        for line in infile:
+            if not line.strip():
+                continue
+            received = time.perf_counter()
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                respond({"id": None, "status": "error", "error": "bad request: {}".format(e)})
+                continue
+            if self.pool is None:
+                respond(handle_request(request, received))
+            else:
+                outstanding.append(self.pool.apply_async(handle_request, (request, received), callback=respond))
+        for pending in outstanding:
+            pending.wait()
+
+
+class SocketWriter:
+    def __init__(self, wfile: IO[bytes]):
+        self.wfile = wfile
+
+    def write(self, text: str):
+        self.wfile.write(text.encode())
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        infile = (line.decode() for line in self.rfile)
+        self.server.service.serve(infile, SocketWriter(self.wfile))
+
+
+def serve_socket(path: str, workers: int):
+    if os.path.exists(path):
+        os.unlink(path)
+    service = Service(workers)
+    with socketserver.ThreadingUnixStreamServer(path, RequestHandler) as server:
+        server.service = service
+        try:
+            server.serve_forever()
+        finally:
+            service.close()
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Listen on this Unix domain socket instead of reading requests from stdin."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="The number of worker processes, 0 solves in this process one request at a time."
+    )
+    args = parser.parse_args()
+    # turn a plain kill into an orderly exit that stops the pool and removes the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if args.socket:
+        try:
+            serve_socket(args.socket, args.workers)
+        except KeyboardInterrupt:
+            pass
+    else:
+        service = Service(args.workers)
+        try:
+            service.serve(sys.stdin, sys.stdout)
+        finally:
+            service.close()
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import copy
+import time
+from dataclasses import dataclass
+from typing import *
+
+from battle import Board, Direction, ShipException
+from budget import UNSAT
+from precheck import precheck
+from puzzle import Puzzle
+
+UNIQUE = "unique"
+MULTIPLE = "multiple"
+SHIP_HINTS = "S^v<>M"
+
+
+@dataclass
+class SessionResult:
+    status: str
+    solution: Optional[str]
+    searched: bool
+    elapsed: float
+    # why the sums and fleet have no solution at all, see precheck.py
+    reason: Optional[str] = None
+
+
+def find_solutions(board: Board, limit: int, found: List[str]):
+    """Adds the solutions below a propagated board to found until it holds limit of them. Every branch takes
+    the tried placements out of its later siblings, so no solution is found twice."""
+    if not board.domains:
+        found.append(board.__repr__())
+        return
+    domain = min(board.domains, key=lambda domain: domain.domain_size)
+    for move in list(domain.domain()):
+        if len(found) >= limit:
+            return
+        child = copy.deepcopy(board)
+        domain.prune(move >> 2, 0)
+        try:
+            child.set_ship(move)
+            child.propagate()
+        except ShipException:
+            continue
+        find_solutions(child, limit, found)
+
+
+class Session:
+    """A puzzle being edited one hint or sum at a time, for editors that show whether the puzzle still has
+    exactly one solution after every change.
+
+    The session keeps the board propagated from the sums and fleet alone, and the propagated boards the hints
+    branch into (a ship end hint can be drawn by several placements). Adding a hint refines those boards in
+    place of rebuilding them; removing one replays the hints on the kept sums-only board; a new sum rebuilds
+    both. It also keeps up to two solutions of the puzzle, and only searches again when they cannot answer
+    the question: a new hint that both solutions satisfy leaves the puzzle with several solutions, a new hint
+    that the only solution satisfies leaves it unique, and removing a hint from a puzzle with several
+    solutions cannot make it unique.
+    """
+    size: int
+    row_constraints: List[int]
+    col_constraints: List[int]
+    ship_constraints: List[int]
+    hints: List[List[str]]
+    base: Optional[Board]
+    reason: Optional[str]
+    roots: List[Board]
+    solutions: List[str]
+    searches: int
+
+    def __init__(self, puzzle: Puzzle):
+        self.size = puzzle.size
+        self.row_constraints = list(puzzle.row_constraints)
+        self.col_constraints = list(puzzle.col_constraints)
+        self.ship_constraints = list(puzzle.ship_constraints)
+        self.hints = [list(row) for row in puzzle.board_str]
+        self.searches = 0
+        self.rebuild_base()
+        self.rebuild_roots()
+        self.search()
+
+    def puzzle(self) -> Puzzle:
+        return Puzzle(self.size, list(self.row_constraints), list(self.col_constraints),
+                      list(self.ship_constraints), [list(row) for row in self.hints])
+
+    @property
+    def status(self) -> str:
+        return [UNSAT, UNIQUE, MULTIPLE][len(self.solutions)]
+
+    def result(self, start: float, searched: bool) -> SessionResult:
+        return SessionResult(self.status, self.solutions[0] if self.solutions else None, searched,
+                             time.perf_counter() - start, self.reason)
+
+    def rebuild_base(self):
+        # the search takes the sums as upper bounds, sums that do not add up to the fleet have to be caught here;
+        # only the sums and fleet are checked, so the reason stays valid while hints come and go
+        self.reason = precheck(Puzzle(self.size, self.row_constraints, self.col_constraints, self.ship_constraints,
+                                      [["0"] * self.size for _ in range(self.size)]))
+        if self.reason is not None:
+            self.base = None
+            return
+        try:
+            self.base = Board(self.size, list(self.ship_constraints), list(self.row_constraints),
+                              list(self.col_constraints))
+            self.base.propagate()
+        except ShipException:
+            self.base = None
+
+    def rebuild_roots(self):
+        self.roots = [copy.deepcopy(self.base)] if self.base is not None else []
+        for y in range(self.size):
+            for x in range(self.size):
+                if self.hints[y][x] != "0":
+                    self.roots = self.refine(self.roots, x, y, self.hints[y][x])
+
+    def refine(self, roots: List[Board], x: int, y: int, hint: str) -> List[Board]:
+        cell = y * self.size + x
+        refined = []
+        for root in roots:
+            glyph = root.grid[cell + y]
+            if hint == ".":
+                if chr(glyph) in SHIP_HINTS:
+                    continue
+                boards = [copy.deepcopy(root)]
+                try:
+                    boards[0].set_water(cell, 0)
+                except ShipException:
+                    continue
+            elif glyph == ord(hint):
+                boards = [root]
+            elif chr(glyph) in SHIP_HINTS:
+                continue
+            else:
+                boards = root.find_hint(Direction(x, y), hint)
+            for board in boards:
+                try:
+                    board.propagate()
+                    refined.append(board)
+                except ShipException:
+                    pass
+        return refined
+
+    def search(self):
+        self.searches += 1
+        self.solutions = []
+        for root in self.roots:
+            find_solutions(copy.deepcopy(root), 2, self.solutions)
+            if len(self.solutions) >= 2:
+                break
+
+    def add_hint(self, x: int, y: int, hint: str) -> SessionResult:
+        """Sets the hint of a cell, "0" clears it. A cell that already has a different hint is cleared
+        first."""
+        if hint == "0":
+            return self.remove_hint(x, y)
+        start = time.perf_counter()
+        if self.hints[y][x] == hint:
+            return self.result(start, False)
+        # swapping one hint for another is not a refinement, the old solutions no longer cover every case
+        complete = len(self.solutions) < 2 and self.hints[y][x] == "0"
+        if self.hints[y][x] != "0":
+            self.hints[y][x] = "0"
+            self.rebuild_roots()
+        self.hints[y][x] = hint
+        self.roots = self.refine(self.roots, x, y, hint)
+        self.solutions = [solution for solution in self.solutions if self.satisfies(solution, x, y, hint)]
+        # a hint only removes solutions: the ones kept are all there are unless the old list was cut short
+        if complete or len(self.solutions) == 2:
+            return self.result(start, False)
+        self.search()
+        return self.result(start, True)
+
+    def remove_hint(self, x: int, y: int) -> SessionResult:
+        start = time.perf_counter()
+        if self.hints[y][x] == "0":
+            return self.result(start, False)
+        self.hints[y][x] = "0"
+        self.rebuild_roots()
+        # without the hint every old solution still stands, two of them settle the question
+        if len(self.solutions) == 2:
+            return self.result(start, False)
+        self.search()
+        return self.result(start, True)
+
+    def set_row_sum(self, row: int, value: int) -> SessionResult:
+        return self.set_sums(self.row_constraints, row, value)
+
+    def set_col_sum(self, col: int, value: int) -> SessionResult:
+        return self.set_sums(self.col_constraints, col, value)
+
+    def set_sums(self, sums: List[int], line: int, value: int) -> SessionResult:
+        start = time.perf_counter()
+        if sums[line] == value:
+            return self.result(start, False)
+        sums[line] = value
+        self.rebuild_base()
+        self.rebuild_roots()
+        self.search()
+        return self.result(start, True)
+
+    def satisfies(self, solution: str, x: int, y: int, hint: str) -> bool:
+        return solution[y * (self.size + 1) + x] == hint
@@ -0,0 +1,165 @@
+"""Library entry point for embedding the solvers:
+
+    from solver import parse_puzzle, solve
+    result = solve(parse_puzzle(text), engine="dlx", timeout=1.0)
+    if result.status == "solved":
+        print(result.solution)
+
+Importing this module only loads the puzzle reader and the result types. An engine is imported on its first
+solve, so an embedding program pays for the engines it uses and nothing else. Everything is passed in, no
+state is kept between calls.
+
+    python solver.py --check-import-time [--budget-ms MS]
+
+measures `import solver` with `python -X importtime` and fails when it takes longer than the budget.
+"""
+from __future__ import annotations
+
+import importlib
+
+from budget import EXIT_CODES, SOLVED, TIMEOUT, UNSAT, SolveResult
+from precheck import MalformedPuzzle, precheck
+from puzzle import Puzzle, parse_puzzle, read_puzzle, verify
+from stats import Stats
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import *
+
+    from cache import SolutionCache
+
+# engine name to the module whose solve(puzzle, stats=, timeout=, max_nodes=) implements it, numpy is optional
+ENGINES = {"battle": "battle", "dlx": "dlx", "sat": "cnf", "numpy": "vector"}
+
+# generous next to the few milliseconds measured, the point is to catch a heavy import sneaking in
+IMPORT_TIME_BUDGET_MS = 15.0
+
+__all__ = ["ENGINES", "EXIT_CODES", "SOLVED", "TIMEOUT", "UNSAT", "MalformedPuzzle", "Puzzle", "SolveResult",
+           "Stats", "parse_puzzle", "precheck", "read_puzzle", "solve", "verify"]
+
+
+def solve(puzzle: Puzzle, engine: str = "battle", timeout: Optional[float] = None, max_nodes: Optional[int] = None,
+          stats: Optional[Stats] = None, cache: Optional[SolutionCache] = None,
+          collect_stats: bool = False) -> SolveResult:
+    """Puzzles that the checks of precheck.py prove unsatisfiable are answered without loading an engine, with
+    the reason in the result, and malformed ones raise MalformedPuzzle. With a cache, a puzzle solved before, or
+    any of its mirror images or rotations, is answered from it. With collect_stats the statistics of a fresh
+    Stats come back as result.stats."""
+    if engine not in ENGINES:
+        raise ValueError("unknown engine {}, expected one of {}".format(engine, ", ".join(ENGINES)))
+    if collect_stats and stats is None:
+        stats = Stats()
+    reason = precheck(puzzle)
+    if reason is not None:
+        return SolveResult(UNSAT, None, stats, reason=reason)
+    if cache is not None:
+        cached = cache.lookup(puzzle)
+        if cached is not None:
+            cached.stats = stats
+            return cached
+    module = importlib.import_module(ENGINES[engine])
+    result = module.solve(puzzle, stats=stats, timeout=timeout, max_nodes=max_nodes)
+    if cache is not None:
+        cache.store(puzzle, result)
+    return result
+
+
+def import_time_ms(module: str = "solver") -> float:
+    """Cumulative import time of a module in a fresh interpreter, as reported by -X importtime."""
+    import os
+    import subprocess
+    import sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=here,
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    # lines look like "import time:  self [us] | cumulative | imported package", the module itself comes last
+    for line in reversed(process.stderr.splitlines()):
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError("no import time reported for {}".format(module))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        default="battle",
+        help="The solver to use."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds of search."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="Give up after this many search nodes."
+    )
+    parser.add_argument(
+        "--cache-db",
+        type=str,
+        default=None,
+        help="Answer from and add to the solution cache in this sqlite file, which also knows mirror images and "
+             "rotations of the puzzles in it."
+    )
+    parser.add_argument(
+        "--check-import-time",
+        action="store_true",
+        help="Measure the import time of this module instead of solving, fails when it is over the budget."
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=IMPORT_TIME_BUDGET_MS,
+        help="The import time budget in milliseconds."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Take the best of this many import time measurements."
+    )
+    args = parser.parse_args()
+    if args.check_import_time:
+        elapsed = min(import_time_ms() for _ in range(args.repeat))
+        print("import solver: {:.2f}ms, budget {:.2f}ms".format(elapsed, args.budget_ms))
+        sys.exit(0 if elapsed <= args.budget_ms else 1)
+    if not args.inputfile or not args.outputfile:
+        parser.error("--inputfile and --outputfile are required to solve")
+    cache = None
+    if args.cache_db:
+        from cache import SolutionCache
+        cache = SolutionCache(path=args.cache_db)
+    try:
+        result = solve(read_puzzle(args.inputfile), args.engine, args.timeout, args.max_nodes, cache=cache)
+    except MalformedPuzzle as error:
+        sys.exit("malformed puzzle: {}".format(error))
+    if cache is not None:
+        print("cache: {}".format(cache.stats.to_dict()), file=sys.stderr)
+        cache.close()
+    write_file = open(args.outputfile, 'w')
+    write_file.write(result.solution.__repr__() if result.solution is None else result.solution)
+    print(result.solution)
+    if result.status != SOLVED:
+        print("status: {}".format(result.status), file=sys.stderr)
+    if result.reason is not None:
+        print("reason: {}".format(result.reason), file=sys.stderr)
+    sys.exit(result.exit_code)
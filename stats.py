@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import time
+
+# imported by the library API, so no typing, contextlib or json at run time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import *
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Stats:
+    """Counters filled in by a solver when one is passed to it. Solvers take Optional[Stats] and only touch
+    it behind an `is not None` check, so a disabled run pays nothing beyond that test."""
+    nodes: int
+    backtracks: int
+    placements: int
+    max_depth: int
+    prunes: Dict[str, int]
+    phases: Dict[str, float]
+    current: Optional[PhaseTimer]
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.placements = 0
+        self.max_depth = 0
+        self.prunes = {}
+        self.phases = {}
+        # the innermost phase being timed
+        self.current = None
+
+    def node(self, depth: int):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def prune(self, propagator: str, count: int):
+        if count:
+            self.prunes[propagator] = self.prunes.get(propagator, 0) + count
+
+    def phase(self, name: str) -> PhaseTimer:
+        return PhaseTimer(self, name)
+
+    def peak_memory(self) -> Optional[int]:
+        # peak resident set size of this process in bytes, ru_maxrss is in kilobytes on Linux
+        if resource is None:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "placements": self.placements,
+            "max_depth": self.max_depth,
+            "prunes": dict(self.prunes),
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "peak_memory": self.peak_memory(),
+        }
+
+    def to_json(self) -> str:
+        import json
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+
+class PhaseTimer:
+    """Adds the time spent in a with block to a phase of the stats. Phases are exclusive: a phase entered inside
+    another pauses it until it ends, so propagation run during the search is not also counted as search, and
+    the phase times add up to the time spent in all of them."""
+    stats: Optional[Stats]
+    name: str
+    start: float
+    outer: Optional[PhaseTimer]
+
+    def __init__(self, stats: Optional[Stats], name: str):
+        self.stats = stats
+        self.name = name
+        self.start = 0.0
+        self.outer = None
+
+    def add(self, now: float):
+        self.stats.phases[self.name] = self.stats.phases.get(self.name, 0.0) + now - self.start
+
+    def __enter__(self) -> Optional[Stats]:
+        self.start = time.perf_counter()
+        if self.stats is not None:
+            self.outer = self.stats.current
+            if self.outer is not None:
+                self.outer.add(self.start)
+            self.stats.current = self
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            now = time.perf_counter()
+            self.add(now)
+            self.stats.current = self.outer
+            if self.outer is not None:
+                self.outer.start = now
+        return False
+
+
+def phase(stats: Optional[Stats], name: str) -> PhaseTimer:
+    return PhaseTimer(stats, name)
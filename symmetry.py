@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import *
+
+from puzzle import Puzzle
+
+# a symmetry of the square is (transpose, mirror left-right, mirror top-bottom), applied in that order
+Symmetry = Tuple[bool, bool, bool]
+IDENTITY: Symmetry = (False, False, False)
+SYMMETRIES: List[Symmetry] = [(swap, flip_x, flip_y) for swap in [False, True] for flip_x in [False, True]
+                              for flip_y in [False, True]]
+
+# how the ship ends are redrawn by each step, every other glyph is unchanged
+TRANSPOSE = str.maketrans("^v<>", "<>^v")
+MIRROR_X = str.maketrans("<>", "><")
+MIRROR_Y = str.maketrans("^v", "v^")
+
+
+def transform_cell(x: int, y: int, size: int, symmetry: Symmetry) -> Tuple[int, int]:
+    swap, flip_x, flip_y = symmetry
+    if swap:
+        x, y = y, x
+    if flip_x:
+        x = size - 1 - x
+    if flip_y:
+        y = size - 1 - y
+    return x, y
+
+
+def transform_grid(rows: List[str], symmetry: Symmetry) -> List[str]:
+    swap, flip_x, flip_y = symmetry
+    n = len(rows)
+    if swap:
+        rows = ["".join(rows[y][x] for y in range(n)).translate(TRANSPOSE) for x in range(n)]
+    if flip_x:
+        rows = [row[::-1].translate(MIRROR_X) for row in rows]
+    if flip_y:
+        rows = [row.translate(MIRROR_Y) for row in rows[::-1]]
+    return rows
+
+
+def transform_puzzle(puzzle: Puzzle, symmetry: Symmetry) -> Puzzle:
+    swap, flip_x, flip_y = symmetry
+    rows = list(puzzle.col_constraints if swap else puzzle.row_constraints)
+    cols = list(puzzle.row_constraints if swap else puzzle.col_constraints)
+    grid = transform_grid(["".join(row) for row in puzzle.board_str], symmetry)
+    return Puzzle(puzzle.size, rows[::-1] if flip_y else rows, cols[::-1] if flip_x else cols,
+                  list(puzzle.ship_constraints), [list(row) for row in grid])
+
+
+def inverse(symmetry: Symmetry) -> Symmetry:
+    # mirroring then transposing is transposing then mirroring along the other axis
+    swap, flip_x, flip_y = symmetry
+    return (swap, flip_y, flip_x) if swap else symmetry
+
+
+def puzzle_symmetries(puzzle: Puzzle) -> List[Symmetry]:
+    """The symmetries, other than the identity, that map the puzzle's sums and hints onto themselves. They
+    form a group with the identity, and map every solution of the puzzle to a solution."""
+    return [symmetry for symmetry in SYMMETRIES
+            if symmetry != IDENTITY and transform_puzzle(puzzle, symmetry) == puzzle]
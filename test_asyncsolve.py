@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+import asyncsolve
+from budget import SOLVED
+from puzzle import read_puzzle, verify
+
+
+class RecordingConnection:
+    """Logs when a recv returns and when the connection is closed. A recv is slow to hand back, as a thread
+    descheduled at the wrong moment would be."""
+
+    def __init__(self, connection, log):
+        self.connection = connection
+        self.log = log
+
+    def send(self, message):
+        self.connection.send(message)
+
+    def recv(self):
+        try:
+            return self.connection.recv()
+        finally:
+            time.sleep(0.2)
+            self.log.append("recv returned")
+
+    def close(self):
+        self.log.append("closed")
+        self.connection.close()
+
+
+def test_solve():
+    puzzle = read_puzzle("input_medium1.txt")
+
+    async def main():
+        async with asyncsolve.AsyncSolver(2) as solver:
+            return await asyncio.gather(solver.solve(puzzle), solver.solve(puzzle), solver.solve(puzzle, "dlx"))
+
+    for result in asyncio.run(main()):
+        assert result.status == SOLVED
+        assert verify(puzzle, result.solution)
+
+
+def test_cancel_closes_the_connection_after_the_read(monkeypatch):
+    solve = asyncsolve.solve
+    # the workers are forked, so they see the patched solve for as long as it is patched
+    monkeypatch.setattr(asyncsolve, "solve", lambda *args: time.sleep(60))
+    log = []
+    start = asyncsolve.Worker.__init__
+
+    def recording(worker, context):
+        start(worker, context)
+        worker.connection = RecordingConnection(worker.connection, log)
+
+    monkeypatch.setattr(asyncsolve.Worker, "__init__", recording)
+    puzzle = read_puzzle("input_easy1.txt")
+
+    async def main():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        solver = asyncsolve.AsyncSolver(1)
+        for close in [False, True]:
+            del log[:]
+            task = asyncio.ensure_future(solver.solve(puzzle))
+            await asyncio.sleep(0.5)
+            (job, _), = solver.jobs.values()
+            task.cancel()
+            if close:
+                # cancels the job a second time while it waits for the read
+                await solver.close()
+            await asyncio.wait([task, job])
+            assert task.cancelled() and job.cancelled()
+            assert log == ["recv returned", "closed"]
+            assert not solver.jobs and not solver.idle
+        monkeypatch.setattr(asyncsolve, "solve", solve)
+        try:
+            return await solver.solve(puzzle), errors
+        finally:
+            await solver.close()
+
+    result, errors = asyncio.run(main())
+    assert result.status == SOLVED
+    assert errors == []
@@ -0,0 +1,337 @@
+import random
+
+import pytest
+
+import battle
+from budget import SOLVED, UNSAT
+from puzzle import Puzzle, read_puzzle, verify
+
+
+def empty_puzzle(size, rows, cols, fleet):
+    return Puzzle(size, rows, cols, fleet, [["0"] * size for _ in range(size)])
+
+
+def placements(size, ship):
+    # (cells, glyphs) for every position of a ship of the given size
+    result = []
+    for vertical in ([False, True] if ship > 1 else [False]):
+        for y in range(size - (ship - 1 if vertical else 0)):
+            for x in range(size - (0 if vertical else ship - 1)):
+                cells = [(x, y + i) if vertical else (x + i, y) for i in range(ship)]
+                if ship == 1:
+                    glyphs = "S"
+                else:
+                    glyphs = ("^" + "M" * (ship - 2) + "v") if vertical else ("<" + "M" * (ship - 2) + ">")
+                result.append((cells, glyphs))
+    return result
+
+
+def enumerate_solutions(puzzle):
+    """Every solution of a small puzzle, found by trying each placement of each ship of the fleet in turn."""
+    n = puzzle.size
+    ships = [size for size in range(4, 0, -1) for _ in range(puzzle.ship_constraints[size - 1])]
+    options = {}
+    for size in set(ships):
+        options[size] = []
+        for cells, glyphs in placements(n, size):
+            mask = 0
+            halo = 0
+            for x, y in cells:
+                mask |= 1 << (y * n + x)
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        if 0 <= x + dx < n and 0 <= y + dy < n:
+                            halo |= 1 << ((y + dy) * n + x + dx)
+            hinted = all(puzzle.board_str[y][x] in ("0", glyph) for (x, y), glyph in zip(cells, glyphs))
+            if hinted:
+                options[size].append((mask, halo, [y for _, y in cells], [x for x, _ in cells], cells, glyphs))
+    water = 0
+    ship_hints = 0
+    for y in range(n):
+        for x in range(n):
+            if puzzle.board_str[y][x] == ".":
+                water |= 1 << (y * n + x)
+            elif puzzle.board_str[y][x] != "0":
+                ship_hints |= 1 << (y * n + x)
+    rows = [0] * n
+    cols = [0] * n
+    chosen = []
+    solutions = []
+
+    def place(index, start, blocked, used):
+        if index == len(ships):
+            if rows == list(puzzle.row_constraints) and cols == list(puzzle.col_constraints) and \
+                    used & ship_hints == ship_hints:
+                grid = [["."] * n for _ in range(n)]
+                for cells, glyphs in chosen:
+                    for (x, y), glyph in zip(cells, glyphs):
+                        grid[y][x] = glyph
+                solutions.append("\n".join("".join(row) for row in grid))
+            return
+        size = ships[index]
+        for number in range(start, len(options[size])):
+            mask, halo, ys, xs, cells, glyphs = options[size][number]
+            if mask & (blocked | water):
+                continue
+            for y in ys:
+                rows[y] += 1
+            for x in xs:
+                cols[x] += 1
+            if all(rows[y] <= puzzle.row_constraints[y] for y in ys) and \
+                    all(cols[x] <= puzzle.col_constraints[x] for x in xs):
+                chosen.append((cells, glyphs))
+                same = index + 1 < len(ships) and ships[index + 1] == size
+                place(index + 1, number + 1 if same else 0, blocked | halo, used | mask)
+                chosen.pop()
+            for y in ys:
+                rows[y] -= 1
+            for x in xs:
+                cols[x] -= 1
+
+    place(0, 0, 0, 0)
+    return solutions
+
+
+def place_fleet(rng, n, fleet):
+    # a random grid of the fleet, largest ships first, or None when a ship found no room
+    grid = [["."] * n for _ in range(n)]
+    for ship in range(4, 0, -1):
+        for _ in range(fleet[ship - 1]):
+            free = [(cells, glyphs) for cells, glyphs in placements(n, ship)
+                    if all(grid[y + dy][x + dx] == "." for x, y in cells for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                           if 0 <= x + dx < n and 0 <= y + dy < n)]
+            if not free:
+                return None
+            cells, glyphs = rng.choice(free)
+            for (x, y), glyph in zip(cells, glyphs):
+                grid[y][x] = glyph
+    return grid
+
+
+def random_puzzle(rng, size, fleet, hints=0, shift=False):
+    """A puzzle with the sums of a random fleet placement and some of its cells as hints. With shift one ship
+    cell of the row sums moves to another row, which keeps the totals balanced but usually leaves no solution."""
+    n = size
+    grid = None
+    while grid is None:
+        grid = place_fleet(rng, n, fleet)
+    rows = [sum(cell != "." for cell in row) for row in grid]
+    cols = [sum(row[x] != "." for row in grid) for x in range(n)]
+    if shift:
+        source = rng.choice([row for row in range(n) if rows[row] > 0])
+        rows[source] -= 1
+        rows[rng.randrange(n)] += 1
+    board_str = [["0"] * n for _ in range(n)]
+    for cell in rng.sample(range(n * n), hints):
+        board_str[cell // n][cell % n] = grid[cell // n][cell % n]
+    return Puzzle(n, rows, cols, list(fleet), board_str)
+
+
+def random_puzzles(seed, count, size=6, fleet=(3, 2, 1, 0)):
+    rng = random.Random(seed)
+    return [random_puzzle(rng, size, fleet, rng.randrange(4), index % 2 == 1) for index in range(count)]
+
+
+def test_fleet_without_ships_of_a_size():
+    # no hints, so nothing but the fleet tells the search there are no ships of the missing sizes
+    for puzzle in [empty_puzzle(6, [0, 0, 1, 2, 1, 1], [1, 1, 0, 0, 0, 3], [2, 0, 1, 0]),
+                   empty_puzzle(6, [4, 1, 1, 2, 0, 0], [1, 2, 2, 1, 0, 2], [0, 2, 0, 1])]:
+        board = battle.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                             list(puzzle.col_constraints))
+        assert all(domain.num_ships_remaining > 0 for domain in board.domains)
+        result = battle.solve(puzzle)
+        assert result.status == SOLVED
+        assert verify(puzzle, result.solution)
+
+
+def test_search_matches_enumeration():
+    # backjumping skips levels and nogoods cut branches, neither may lose a solution or invent one
+    statuses = set()
+    for puzzle in random_puzzles(26, 80) + random_puzzles(27, 20, 7, (3, 2, 1, 1)):
+        solutions = enumerate_solutions(puzzle)
+        result = battle.solve(puzzle)
+        statuses.add(result.status)
+        if solutions:
+            assert result.status == SOLVED, puzzle
+            assert result.solution in solutions
+        else:
+            assert result.status == UNSAT, puzzle
+    assert statuses == {SOLVED, UNSAT}
+
+
+def test_nogoods_are_evicted_least_recently_used():
+    store = battle.NogoodStore(capacity=2)
+    first, second, third = frozenset([1, 2]), frozenset([2, 3]), frozenset([4])
+    store.add(first)
+    store.add(second)
+    # a hit makes first the most recently used, so second goes when third arrives
+    assert store.check(1, {2: 1}) == first
+    store.add(third)
+    assert list(store.nogoods) == [first, third]
+    assert store.check(3, {2: 1}) is None
+    assert store.check(4, {}) == third
+
+
+def test_nogood_needs_all_its_other_placements_on_the_path():
+    store = battle.NogoodStore()
+    nogood = frozenset([1, 2, 3])
+    store.add(nogood)
+    assert store.check(1, {2: 1}) is None
+    assert store.check(1, {2: 1, 3: 2}) == nogood
+    assert store.check(5, {1: 1, 2: 2, 3: 4}) is None
+
+
+def test_impossible_inputs():
+    # the shipped inputs the plain backtracking search struggled with most
+    for name in ["input_impossible1.txt", "input_impossible2.txt", "input_impossible3.txt"]:
+        puzzle = read_puzzle(name)
+        result = battle.solve(puzzle)
+        assert result.status == SOLVED
+        assert verify(puzzle, result.solution)
+
+
+def propagate_capacity(board):
+    covered_by_domain = [(domain, domain.covered_cells()) for domain in board.domains]
+    covered = bytearray(board.size * board.size)
+    for _, cells in covered_by_domain:
+        for cell, alive in enumerate(cells):
+            covered[cell] |= alive
+    return board.propagate_capacity(covered_by_domain, covered)
+
+
+def test_line_supply_per_ship_size():
+    domain = battle.Domain(6, 2, 2)
+    covered = domain.covered_cells()
+    assert domain.row_supply(0, covered) == 4
+    # with no horizontal placement left along row 0 each ship crosses it in one cell at most
+    domain.prune_all(domain.table.row_lines[1][0], 0)
+    assert domain.row_supply(0, domain.covered_cells()) == 2
+    submarines = battle.Domain(6, 1, 1)
+    assert submarines.col_supply(3, submarines.covered_cells()) == 1
+
+
+def test_capacity_fails_a_row_the_fleet_cannot_fill():
+    board = battle.Board(6, [1, 0, 0, 0], [2, 0, 0, 0, 0, 0], [1, 1, 0, 0, 0, 0])
+    # a row of 2 and a single submarine
+    with pytest.raises(battle.ShipException):
+        propagate_capacity(board)
+
+
+def test_capacity_forces_the_cells_of_an_exactly_matched_row():
+    board = battle.Board(6, [0, 0, 1, 0], [3, 0, 0, 0, 0, 0], [1, 1, 1, 0, 0, 0])
+    assert propagate_capacity(board)
+    assert board.board_repr()[0] == list("<M>...")
+    assert not board.domains
+
+
+def test_capacity_prunes_on_the_hard_inputs():
+    for name in ["input_hard1.txt", "input_hard2.txt"]:
+        result = battle.solve(read_puzzle(name), collect_stats=True)
+        assert result.status == SOLVED
+        assert result.stats.prunes["capacity"] > 0
+
+
+def test_placement_ids_decode_to_ships():
+    n = 6
+    table = battle.placement_table(n)
+    seen = set()
+    for size in range(1, 5):
+        for cells, glyphs in placements(n, size):
+            (x, y), vertical = cells[0], size > 1 and cells[1][0] == cells[0][0]
+            placement = battle.placement_id(size, x, y, vertical, n)
+            assert placement not in seen
+            seen.add(placement)
+            ship = table.ship(placement)
+            assert (ship.size, ship.first_piece.x, ship.first_piece.y, ship.vertical) == (size, x, y, vertical)
+            assert table.cells[placement] == tuple(cy * n + cx for cx, cy in cells)
+            assert table.glyphs[placement].decode() == glyphs
+    # every other id runs off the board, apart from the vertical copies of submarines the domains never use
+    for placement in range(8 * n * n):
+        if placement not in seen and table.cells[placement]:
+            assert placement & 3 == 0 and placement >> 2 & 1
+
+
+def test_conflicts_are_the_placements_touching_the_halo():
+    n = 5
+    table = battle.placement_table(n)
+    for placement, cells in enumerate(table.cells):
+        if not cells:
+            continue
+        halo = {neighbour for cell in cells for neighbour in table.neighbourhood(cell)}
+        for size in range(1, 5):
+            touching = {slot for slot in range(2 * n * n) if set(table.cells[slot * 4 + size - 1]) & halo}
+            assert set(table.conflicts[placement][size - 1]) == touching
+
+
+def test_solution_is_drawn_from_its_placement_ids():
+    puzzle = read_puzzle("input_medium1.txt")
+    board = battle.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    solved = board.solve(puzzle.board_str)
+    assert solved.ships.typecode == "i"
+    n = puzzle.size
+    grid = [bytearray(b"." * n) for _ in range(n)]
+    fleet = [0] * 4
+    for placement in solved.ships:
+        ship = solved.table.ship(placement)
+        fleet[ship.size - 1] += 1
+        for offset in range(ship.size):
+            x = ship.first_piece.x + (0 if ship.vertical else offset)
+            y = ship.first_piece.y + (offset if ship.vertical else 0)
+            grid[y][x] = solved.table.glyph(placement, y * n + x)
+    assert fleet == list(puzzle.ship_constraints)
+    assert b"\n".join(grid).decode() == solved.__repr__()
+
+
+def block_puzzle(rng, fleet, n=8, split=4, shift=False):
+    """A puzzle whose ships all lie in the blocks of rows and columns before split and after it, with water
+    hints everywhere else, so propagation leaves two regions no placement joins."""
+    def inside(x, y):
+        return (x < split and y < split) or (x > split and y > split)
+
+    grid = None
+    while grid is None:
+        grid = [["."] * n for _ in range(n)]
+        for ship in [size for size in range(4, 0, -1) for _ in range(fleet[size - 1])]:
+            free = [(cells, glyphs) for cells, glyphs in placements(n, ship)
+                    if all(inside(x, y) for x, y in cells) and
+                    all(grid[y + dy][x + dx] == "." for x, y in cells for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                        if 0 <= x + dx < n and 0 <= y + dy < n)]
+            if not free:
+                grid = None
+                break
+            cells, glyphs = rng.choice(free)
+            for (x, y), glyph in zip(cells, glyphs):
+                grid[y][x] = glyph
+    rows = [sum(cell != "." for cell in row) for row in grid]
+    cols = [sum(row[x] != "." for row in grid) for x in range(n)]
+    if shift:
+        rows[rng.choice([row for row in range(n) if rows[row] > 0])] -= 1
+        rows[rng.choice([row for row in range(n) if row != split])] += 1
+    return Puzzle(n, rows, cols, list(fleet), [["0" if inside(x, y) else "." for x in range(n)] for y in range(n)])
+
+
+def test_decompose_matches_enumeration(monkeypatch):
+    split = []
+    solve_components = battle.Board.solve_components
+
+    def counted(board, components, search):
+        split.append(search.decompose)
+        return solve_components(board, components, search)
+
+    monkeypatch.setattr(battle.Board, "solve_components", counted)
+    rng = random.Random(48)
+    puzzles = [block_puzzle(rng, (3, 2, 1, 0), shift=index % 3 == 2) for index in range(30)] + \
+        [block_puzzle(rng, (3, 2, 1, 1), 10, 5, index % 2 == 1) for index in range(10)] + random_puzzles(48, 20)
+    for puzzle in puzzles:
+        solutions = enumerate_solutions(puzzle)
+        for decompose in [False, True]:
+            result = battle.solve(puzzle, decompose=decompose)
+            if solutions:
+                assert result.status == SOLVED, (puzzle, decompose)
+                assert result.solution in solutions
+            else:
+                assert result.status == UNSAT, (puzzle, decompose)
+    # the components are searched on request only, and then on a good share of the block puzzles
+    assert set(split) == {True}
+    assert len(split) >= 10
@@ -0,0 +1,37 @@
+import glob
+import os
+import subprocess
+import sys
+
+from budget import EXIT_CODES, SOLVED, UNKNOWN, UNSAT
+from puzzle import read_puzzle, verify
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_cli(inputfile, outputfile):
+    return subprocess.run([sys.executable, os.path.join(HERE, "BattleShip.py"), "--inputfile", inputfile,
+                           "--outputfile", outputfile], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, timeout=120)
+
+
+def test_shipped_inputs_are_never_called_unsat(tmp_path):
+    # every shipped puzzle has a solution, the legacy search either finds a valid one or does not know
+    for inputfile in sorted(glob.glob(os.path.join(HERE, "input_*.txt"))):
+        outputfile = str(tmp_path / "output.txt")
+        process = run_cli(inputfile, outputfile)
+        assert process.returncode in (EXIT_CODES[SOLVED], EXIT_CODES[UNKNOWN]), (inputfile, process.stderr)
+        if process.returncode == EXIT_CODES[SOLVED]:
+            with open(outputfile) as file:
+                assert verify(read_puzzle(inputfile), file.read())
+        else:
+            assert "status: {}".format(UNKNOWN) in process.stderr
+            assert "Traceback" not in process.stderr
+
+
+def test_precheck_proves_unsat(tmp_path):
+    inputfile = tmp_path / "input.txt"
+    inputfile.write_text("100103\n111001\n1010\n" + "000000\n" * 6)
+    process = run_cli(str(inputfile), str(tmp_path / "output.txt"))
+    assert process.returncode == EXIT_CODES[UNSAT]
+    assert "reason: the row sums" in process.stderr
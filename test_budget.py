@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import battle
+import cnf
+import dlx
+import vector
+from budget import EXIT_CODES, SOLVED, TIMEOUT, UNSAT, Budget, BudgetExceeded
+from puzzle import parse_puzzle, read_puzzle, verify
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# no hints, so no engine gets far on propagation alone
+NO_HINTS = "1041325013\n4123141022\n4321\n" + "0000000000\n" * 10
+UNBALANCED = "100103\n111001\n1010\n" + "000000\n" * 6
+
+ENGINES = [battle.solve, dlx.solve, vector.solve, lambda puzzle, **budget: cnf.solve(puzzle, "cdcl", **budget)]
+
+
+def test_tick_raises_once_the_nodes_are_used_up():
+    budget = Budget(max_nodes=2)
+    budget.tick()
+    budget.tick()
+    with pytest.raises(BudgetExceeded):
+        budget.tick()
+
+
+def test_tick_raises_once_the_time_is_used_up():
+    with pytest.raises(BudgetExceeded):
+        Budget(timeout=-1.0).tick()
+    Budget(timeout=60.0).tick()
+
+
+def test_keep_holds_the_deepest_partial():
+    budget = Budget()
+    budget.keep(3, "partial")
+    assert (budget.partial_depth, budget.partial) == (3, "partial")
+
+
+@pytest.mark.parametrize("solve", ENGINES, ids=["battle", "dlx", "numpy", "sat"])
+def test_budget_runs_out(solve):
+    puzzle = parse_puzzle(NO_HINTS)
+    for budget in [{"max_nodes": 5}, {"timeout": 0.0}]:
+        result = solve(puzzle, **budget)
+        assert result.status == TIMEOUT, budget
+        assert result.solution is None
+
+
+@pytest.mark.parametrize("solve", ENGINES[:3], ids=["battle", "dlx", "numpy"])
+def test_partial_is_kept(solve):
+    puzzle = parse_puzzle(NO_HINTS)
+    partial = solve(puzzle, max_nodes=5).partial
+    rows = partial.split("\n")
+    assert len(rows) == puzzle.size and all(len(row) == puzzle.size for row in rows)
+    # the ships placed so far never overfill a row or a column
+    assert any(cell != "." for row in rows for cell in row)
+    assert all(sum(cell != "." for cell in row) <= limit for row, limit in zip(rows, puzzle.row_constraints))
+    assert all(sum(row[x] != "." for row in rows) <= limit for x, limit in enumerate(puzzle.col_constraints))
+
+
+@pytest.mark.parametrize("solve", ENGINES, ids=["battle", "dlx", "numpy", "sat"])
+def test_enough_budget_solves(solve):
+    puzzle = read_puzzle(os.path.join(HERE, "input_easy1.txt"))
+    result = solve(puzzle, timeout=60.0, max_nodes=10 ** 6)
+    assert result.status == SOLVED
+    assert verify(puzzle, result.solution)
+
+
+@pytest.mark.parametrize("text, arguments, status", [
+    (None, [], SOLVED),
+    (UNBALANCED, [], UNSAT),
+    (NO_HINTS, ["--max-nodes", "5"], TIMEOUT),
+])
+def test_cli_exit_codes(tmp_path, text, arguments, status):
+    inputfile = os.path.join(HERE, "input_easy1.txt")
+    if text is not None:
+        inputfile = str(tmp_path / "input.txt")
+        with open(inputfile, "w") as file:
+            file.write(text)
+    for module in ["battle.py", "dlx.py", "solver.py"]:
+        process = subprocess.run([sys.executable, os.path.join(HERE, module), "--inputfile", inputfile,
+                                  "--outputfile", str(tmp_path / "output.txt")] + arguments,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120)
+        assert process.returncode == EXIT_CODES[status], (module, process.stderr)
@@ -0,0 +1,84 @@
+import battle
+import solver
+from budget import SOLVED, TIMEOUT, UNSAT, SolveResult
+from cache import SolutionCache, canonical_form
+from puzzle import read_puzzle, verify
+from symmetry import SYMMETRIES, inverse, transform_grid, transform_puzzle
+
+UNBALANCED = solver.parse_puzzle("100103\n111001\n1010\n" + "000000\n" * 6)
+
+
+def test_transforms_are_undone_by_their_inverse():
+    puzzle = read_puzzle("input_medium1.txt")
+    solution = battle.solve(puzzle).solution.split("\n")
+    for symmetry in SYMMETRIES:
+        assert transform_puzzle(transform_puzzle(puzzle, symmetry), inverse(symmetry)) == puzzle
+        assert transform_grid(transform_grid(solution, symmetry), inverse(symmetry)) == solution
+        # the image of a solution solves the image of the puzzle
+        assert verify(transform_puzzle(puzzle, symmetry), "\n".join(transform_grid(solution, symmetry)))
+
+
+def test_canonical_form_is_shared_by_every_image():
+    puzzle = read_puzzle("input_hard1.txt")
+    key, symmetry = canonical_form(puzzle)
+    assert solver.parse_puzzle(key) == transform_puzzle(puzzle, symmetry)
+    for image in SYMMETRIES:
+        assert canonical_form(transform_puzzle(puzzle, image))[0] == key
+
+
+def test_images_hit_with_the_solution_mapped_back():
+    puzzle = read_puzzle("input_medium2.txt")
+    cache = SolutionCache()
+    cache.store(puzzle, battle.solve(puzzle))
+    for symmetry in SYMMETRIES:
+        image = transform_puzzle(puzzle, symmetry)
+        result = cache.lookup(image)
+        assert result.status == SOLVED
+        assert verify(image, result.solution)
+    assert (cache.stats.hits, cache.stats.misses) == (8, 0)
+
+
+def test_only_verdicts_are_cached():
+    puzzle = read_puzzle("input_easy1.txt")
+    cache = SolutionCache()
+    cache.store(puzzle, SolveResult(TIMEOUT, None, partial="partial"))
+    assert cache.lookup(puzzle) is None
+    cache.store(UNBALANCED, SolveResult(UNSAT))
+    assert cache.lookup(transform_puzzle(UNBALANCED, (True, False, True))).status == UNSAT
+    assert cache.stats.to_dict() == {"hits": 1, "disk_hits": 0, "misses": 1, "hit_rate": 0.5}
+
+
+def test_least_recently_used_is_evicted():
+    puzzles = [read_puzzle(name) for name in ["input_easy1.txt", "input_easy2.txt", "input_medium1.txt"]]
+    cache = SolutionCache(capacity=2)
+    cache.store(puzzles[0], battle.solve(puzzles[0]))
+    cache.store(puzzles[1], battle.solve(puzzles[1]))
+    assert cache.lookup(puzzles[0]) is not None
+    cache.store(puzzles[2], battle.solve(puzzles[2]))
+    assert cache.lookup(puzzles[1]) is None
+    assert cache.lookup(puzzles[0]) is not None
+    assert cache.lookup(puzzles[2]) is not None
+
+
+def test_sqlite_tier_persists(tmp_path):
+    path = str(tmp_path / "cache.db")
+    puzzle = read_puzzle("input_hard2.txt")
+    with SolutionCache(path=path) as cache:
+        cache.store(puzzle, battle.solve(puzzle))
+    with SolutionCache(path=path) as cache:
+        image = transform_puzzle(puzzle, (True, True, False))
+        assert verify(image, cache.lookup(image).solution)
+        # the disk hit is now in memory too
+        assert cache.lookup(puzzle).status == SOLVED
+        assert (cache.stats.disk_hits, cache.stats.hits) == (1, 1)
+
+
+def test_solver_answers_from_the_cache():
+    puzzle = read_puzzle("input_medium1.txt")
+    cache = SolutionCache()
+    first = solver.solve(puzzle, cache=cache)
+    mirrored = transform_puzzle(puzzle, (False, True, False))
+    second = solver.solve(mirrored, cache=cache)
+    assert first.status == second.status == SOLVED
+    assert verify(mirrored, second.solution)
+    assert cache.stats.hits == 1
@@ -0,0 +1,68 @@
+import itertools
+import random
+
+from cdcl import CDCLSolver, luby
+
+
+def satisfies(model, clauses):
+    return all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+
+
+def brute_force_sat(num_vars, clauses):
+    for values in itertools.product([False, True], repeat=num_vars):
+        if satisfies((False,) + values, clauses):
+            return True
+    return False
+
+
+def pigeonhole(pigeons, holes):
+    # var(p, h) puts pigeon p in hole h, unsatisfiable with more pigeons than holes
+    def var(p, h):
+        return p * holes + h + 1
+    clauses = [[var(p, h) for h in range(holes)] for p in range(pigeons)]
+    for h in range(holes):
+        for p, q in itertools.combinations(range(pigeons), 2):
+            clauses.append([-var(p, h), -var(q, h)])
+    return pigeons * holes, clauses
+
+
+def test_luby():
+    assert [luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+
+def test_small_formulas():
+    assert CDCLSolver(1, [[1]]).solve() == [False, True]
+    assert CDCLSolver(1, [[1], [-1]]).solve() is None
+    assert CDCLSolver(2, [[]]).solve() is None
+    # a tautology is dropped, the model is free
+    model = CDCLSolver(2, [[1, -1], [2]]).solve()
+    assert model is not None and model[2]
+    num_vars, clauses = pigeonhole(3, 3)
+    model = CDCLSolver(num_vars, clauses).solve()
+    assert model is not None and satisfies(model, clauses)
+
+
+def test_pigeonhole_is_unsat():
+    for pigeons in range(2, 6):
+        num_vars, clauses = pigeonhole(pigeons, pigeons - 1)
+        solver = CDCLSolver(num_vars, clauses)
+        assert solver.solve() is None
+    # the larger ones need learning and backjumps
+    assert solver.conflicts > 0
+
+
+def test_random_3sat_against_brute_force():
+    rng = random.Random(35)
+    results = set()
+    for _ in range(150):
+        num_vars = rng.randrange(3, 11)
+        clauses = [[rng.choice([-1, 1]) * var for var in rng.sample(range(1, num_vars + 1), 3)]
+                   for _ in range(rng.randrange(1, 5 * num_vars))]
+        model = CDCLSolver(num_vars, clauses).solve()
+        expected = brute_force_sat(num_vars, clauses)
+        results.add(expected)
+        assert (model is not None) == expected
+        if model is not None:
+            assert len(model) == num_vars + 1
+            assert satisfies(model, clauses)
+    assert results == {True, False}
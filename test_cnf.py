@@ -0,0 +1,49 @@
+import glob
+import itertools
+
+import battle
+import cnf
+from budget import SOLVED, UNSAT
+from cdcl import CDCLSolver
+from puzzle import read_puzzle, verify
+from test_battle import enumerate_solutions, random_puzzles
+
+
+def test_exactly_k_of_n():
+    for n in range(1, 6):
+        for k in range(n + 2):
+            for values in itertools.product([False, True], repeat=n):
+                formula = cnf.CNF()
+                lits = [formula.new_var() for _ in range(n)]
+                formula.exactly(lits, k)
+                for lit, value in zip(lits, values):
+                    formula.add([lit if value else -lit])
+                model = CDCLSolver(formula.num_vars, formula.clauses).solve()
+                assert (model is not None) == (sum(values) == k), (n, k, values)
+
+
+def test_dimacs():
+    formula = cnf.CNF()
+    a, b = formula.new_var(), formula.new_var()
+    formula.add([a, -b])
+    formula.add([b])
+    assert formula.to_dimacs() == "p cnf 2 2\n1 -2 0\n2 0\n"
+
+
+def test_matches_enumeration():
+    for puzzle in random_puzzles(35, 40):
+        solutions = enumerate_solutions(puzzle)
+        result = cnf.solve(puzzle, "cdcl")
+        if solutions:
+            assert result.status == SOLVED, puzzle
+            assert result.solution in solutions
+        else:
+            assert result.status == UNSAT, puzzle
+
+
+def test_agrees_with_battle_on_the_shipped_inputs():
+    for name in sorted(glob.glob("input_*.txt")):
+        puzzle = read_puzzle(name)
+        result = cnf.solve(puzzle, "cdcl")
+        assert result.status == battle.solve(puzzle).status == SOLVED
+        assert verify(puzzle, result.solution)
@@ -0,0 +1,96 @@
+import glob
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import corpus
+from puzzle import Puzzle, read_puzzle
+from test_battle import random_puzzle
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def shipped_puzzles(size=10):
+    puzzles = [read_puzzle(name) for name in sorted(glob.glob(os.path.join(HERE, "input_*.txt")))]
+    return [puzzle for puzzle in puzzles if puzzle.size == size]
+
+
+def test_pack_round_trip(tmp_path):
+    rng = random.Random(42)
+    # an odd size leaves the last hint byte half used
+    for puzzles in [shipped_puzzles(), [random_puzzle(rng, 7, (3, 2, 1, 1), 10) for _ in range(20)]]:
+        path = str(tmp_path / "puzzles.corpus")
+        assert corpus.write_corpus(path, puzzles) == len(puzzles)
+        with corpus.Corpus(path) as packed:
+            assert len(packed) == len(puzzles)
+            assert [view.to_puzzle() for view in packed] == puzzles
+            assert packed[-1].to_puzzle() == puzzles[-1]
+            last = puzzles[-1]
+            assert all(packed[-1].hint(x, y) == last.board_str[y][x] for y in range(last.size)
+                       for x in range(last.size))
+            with pytest.raises(IndexError):
+                packed[len(puzzles)]
+
+
+def test_unpack_writes_the_text_files(tmp_path):
+    puzzles = shipped_puzzles()
+    path = str(tmp_path / "puzzles.corpus")
+    corpus.write_corpus(path, puzzles)
+    assert corpus.unpack_corpus(path, str(tmp_path / "out")) == len(puzzles)
+    unpacked = [read_puzzle(name) for name in sorted(glob.glob(str(tmp_path / "out" / "*.txt")))]
+    assert unpacked == puzzles
+
+
+def test_empty_corpus(tmp_path):
+    path = str(tmp_path / "empty.corpus")
+    assert corpus.write_corpus(path, []) == 0
+    with corpus.Corpus(path) as packed:
+        assert list(packed) == []
+
+
+def test_mixed_sizes_leave_the_old_corpus(tmp_path):
+    path = str(tmp_path / "puzzles.corpus")
+    corpus.write_corpus(path, shipped_puzzles()[:2])
+    with open(path, "rb") as file:
+        before = file.read()
+    with pytest.raises(corpus.CorpusError, match="one size"):
+        corpus.write_corpus(path, shipped_puzzles()[:1] + shipped_puzzles(6))
+    with open(path, "rb") as file:
+        assert file.read() == before
+    assert not os.path.exists(path + ".partial")
+
+
+def test_unpackable_puzzles():
+    puzzle = shipped_puzzles()[0]
+    puzzle.board_str[0][0] = "X"
+    with pytest.raises(corpus.CorpusError, match="unknown hint"):
+        corpus.pack_puzzle(puzzle)
+    with pytest.raises(corpus.CorpusError):
+        corpus.pack_puzzle(Puzzle(1, [256], [0], [0, 0, 0, 0], [["0"]]))
+
+
+def test_broken_files(tmp_path):
+    path = str(tmp_path / "puzzles.corpus")
+    corpus.write_corpus(path, shipped_puzzles())
+    with open(path, "rb") as file:
+        data = file.read()
+    for broken in [data[:-1], data + b"\0", b"not a corpus at all", b""]:
+        with open(path, "wb") as file:
+            file.write(broken)
+        with pytest.raises(corpus.CorpusError):
+            corpus.Corpus(path)
+
+
+def test_sweep(tmp_path):
+    path = str(tmp_path / "puzzles.corpus")
+    count = corpus.write_corpus(path, shipped_puzzles())
+    process = subprocess.run([sys.executable, os.path.join(HERE, "corpus.py"), "sweep", path, "--verify"],
+                             stdout=subprocess.PIPE, universal_newlines=True, timeout=600)
+    assert process.returncode == 0
+    lines = process.stdout.splitlines()
+    assert lines[0].startswith("{} puzzles in".format(count))
+    assert lines[1] == "solved {}".format(count)
+    assert lines[2] == "verified {0} of {0} solutions".format(count)
@@ -0,0 +1,60 @@
+import itertools
+
+from constraints import NValuesConstraint, TableConstraint
+from csp import CSP, Variable
+
+
+def broken_csp():
+    # A and B are assigned values their constraint forbids, C is free and only constrained together with D
+    a, b, c, d = (Variable(name, [0, 1]) for name in "ABCD")
+    equal = TableConstraint("AB", [a, b], [[0, 0], [1, 1]])
+    differ = TableConstraint("CD", [c, d], [[0, 1], [1, 0]])
+    csp = CSP("broken", [a, b, c, d], [equal, differ])
+    a.setValue(0)
+    b.setValue(1)
+    return csp, [a, b, c, d]
+
+
+def test_assignment_that_breaks_a_constraint_has_no_solution():
+    for decompose in [True, False]:
+        csp, variables = broken_csp()
+        assert csp.solve(decompose) is None
+        assert csp.countSolutions(decompose) == 0
+        assert [var.getValue() for var in variables] == [0, 1, None, None]
+
+
+def test_fully_assigned_csp_is_checked():
+    csp, variables = broken_csp()
+    variables[2].setValue(0)
+    variables[3].setValue(1)
+    assert csp.solve() is None
+    assert csp.countSolutions() == 0
+    variables[1].setValue(0)
+    assert csp.solve() == [(var, var.getValue()) for var in variables]
+    assert csp.countSolutions() == 1
+
+
+def test_components_are_solved_and_counted_separately():
+    csp, variables = broken_csp()
+    variables[1].setValue(0)
+    for decompose in [True, False]:
+        solution = csp.solve(decompose)
+        assert solution is not None and csp.check([solution]) == []
+        assert csp.countSolutions(decompose) == 2
+
+
+def test_check_bulk_agrees_with_check():
+    a, b, c, d = variables = [Variable(name, [0, 1, 2]) for name in "ABCD"]
+    constraints = [TableConstraint("AB", [a, b], [[x, y] for x in range(3) for y in range(3) if x != y]),
+                   TableConstraint("C", [c], [[0], [2]]),
+                   NValuesConstraint("BCD", [b, c, d], [2], 1, 2)]
+    csp = CSP("bulk", variables, constraints)
+    a.setValue(1)
+    solutions = [list(zip(variables, values)) for values in itertools.product(range(3), repeat=4)]
+    stranger = Variable("E", [0])
+    solutions += [list(zip(variables[:3], [0, 1, 2])), list(zip([a, a, c, d], [0, 1, 2, 2])),
+                  list(zip([a, b, c, stranger], [0, 1, 2, 0]))]
+    errs = csp.checkBulk(solutions)
+    assert errs == csp.check(solutions)
+    assert 0 < len(errs) < len(solutions)
+    assert [var.getValue() for var in variables] == [1, None, None, None]
@@ -0,0 +1,43 @@
+import glob
+import random
+
+import battle
+import dlx
+from budget import SOLVED, UNSAT
+from puzzle import read_puzzle, verify
+from test_battle import enumerate_solutions, random_puzzles
+
+
+def test_matches_enumeration():
+    puzzles = random_puzzles(34, 60) + random_puzzles(35, 20, 7, (3, 2, 1, 1))
+    # sums that do not add up to the fleet, the side conditions must hold exactly and not as upper bounds
+    rng = random.Random(36)
+    for puzzle in random_puzzles(36, 20):
+        puzzle.row_constraints[rng.randrange(puzzle.size)] += 1
+        puzzles.append(puzzle)
+    for puzzle in puzzles:
+        solutions = enumerate_solutions(puzzle)
+        result = dlx.solve(puzzle)
+        if solutions:
+            assert result.status == SOLVED, puzzle
+            assert result.solution in solutions
+        else:
+            assert result.status == UNSAT, puzzle
+
+
+def test_agrees_with_battle_on_the_shipped_inputs():
+    for name in sorted(glob.glob("input_*.txt")):
+        puzzle = read_puzzle(name)
+        result = dlx.solve(puzzle)
+        assert result.status == battle.solve(puzzle).status == SOLVED
+        assert verify(puzzle, result.solution)
+
+
+def test_board_draws_the_chosen_placements():
+    puzzle = read_puzzle("input_easy1.txt")
+    board = dlx.DLXBoard(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    solved = board.solve(puzzle.board_str)
+    assert solved is board
+    assert len(board.chosen) == sum(puzzle.ship_constraints)
+    assert verify(puzzle, board.__repr__())
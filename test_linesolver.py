@@ -0,0 +1,101 @@
+import itertools
+
+from linesolver import SHIP, UNKNOWN, WATER, solve_line
+
+FLEETS = [(1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 1), (2, 1, 1, 0), (1, 1, 0, 0), (0, 0, 0, 0)]
+
+
+def fillings(line, remaining):
+    # every way to fill the unknown cells with remaining ship cells on the whole line
+    unknown = [pos for pos, cell in enumerate(line) if cell == UNKNOWN]
+    for cells in itertools.product([WATER, SHIP], repeat=len(unknown)):
+        filled = list(line)
+        for pos, cell in zip(unknown, cells):
+            filled[pos] = cell
+        if filled.count(SHIP) == remaining:
+            yield "".join(filled)
+
+
+def runs(filling):
+    return [len(run) for run in filling.split(WATER) if run]
+
+
+def fits(filling, fleet):
+    # the solver's rule: from left to right, a run of two or more takes a ship of its size from the fleet, a
+    # lone cell may be a ship crossing the line as long as the fleet has any ship left
+    left = list(fleet)
+    for run in runs(filling):
+        if run == 1:
+            if not any(left):
+                return False
+        elif run > len(left) or left[run - 1] == 0:
+            return False
+        else:
+            left[run - 1] -= 1
+    return True
+
+
+def fits_strictly(filling, fleet):
+    # every run is a ship of its own, a lone cell one of any size still free
+    left = list(fleet)
+    for run in sorted(runs(filling), reverse=True):
+        sizes = [size for size in range(len(left)) if left[size]] if run == 1 else [run - 1]
+        if not sizes or sizes[0] >= len(left) or left[sizes[0]] == 0:
+            return False
+        left[sizes[0]] -= 1
+    return True
+
+
+def intersect(solutions):
+    if not solutions:
+        return None
+    return "".join(cells[0] if len(set(cells)) == 1 else UNKNOWN for cells in zip(*solutions))
+
+
+def all_lines(longest):
+    for length in range(1, longest + 1):
+        for line in itertools.product([UNKNOWN, WATER, SHIP], repeat=length):
+            line = "".join(line)
+            for remaining in range(line.count(SHIP), line.count(SHIP) + line.count(UNKNOWN) + 1):
+                yield line, remaining
+
+
+def test_hand_written_lines():
+    assert solve_line("????", 4, (0, 0, 0, 1)) == "XXXX"
+    assert solve_line("?????", 4, (0, 0, 0, 1)) == "?XXX?"
+    assert solve_line("??????", 0, (1, 1, 1, 1)) == "......"
+    # a battleship and a crossing ship cover five cells of six at most
+    assert solve_line("??????", 6, (0, 0, 0, 1)) is None
+    assert solve_line("???", 3, (0, 1, 0, 0)) is None
+    # the known ship cells count towards the sum, one that makes it is a lone cell with water beside it
+    assert solve_line("X??", 1, (1, 0, 0, 0)) == "X.."
+    assert solve_line("X??", 2, (0, 1, 0, 0)) == "X??"
+    assert solve_line("X?X", 2, (1, 0, 0, 0)) == "X.X"
+    assert solve_line("X??", 2, (0, 0, 0, 0)) is None
+    # a cruiser cannot fit left of the water, so the right part takes the cells it can
+    assert solve_line("??.???", 3, (0, 0, 1, 0)) == "??.X?X"
+
+
+def test_matches_brute_force():
+    for line, remaining in all_lines(6):
+        for fleet in FLEETS:
+            expected = intersect([filling for filling in fillings(line, remaining) if fits(filling, fleet)])
+            assert solve_line(line, remaining, fleet) == expected, (line, remaining, fleet)
+
+
+def test_never_rules_out_a_real_filling():
+    # the solver relaxes the fleet for lone cells, it may keep fillings no fleet allows but never drop one
+    for line, remaining in all_lines(5):
+        for fleet in FLEETS:
+            forced = solve_line(line, remaining, fleet)
+            for filling in fillings(line, remaining):
+                if fits_strictly(filling, fleet):
+                    assert forced is not None
+                    assert all(cell in (UNKNOWN, state) for cell, state in zip(forced, filling)), (line, filling)
+
+
+def test_repeated_lines_come_from_the_cache():
+    solve_line("???????", 3, (1, 1, 1, 0))
+    hits = solve_line.cache_info().hits
+    solve_line("???????", 3, (1, 1, 1, 0))
+    assert solve_line.cache_info().hits == hits + 1
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# no hints, so the top of the tree splits into far more units than a queue's pipe holds
+NO_HINTS_10 = "1041325013\n4123141022\n4321\n" + "0000000000\n" * 10
+NO_HINTS_8 = "11504213\n03212333\n3221\n" + "00000000\n" * 8
+
+RUNS = """
+import sys
+from battle import Board
+from parallel import solve_parallel
+from puzzle import parse_puzzle
+puzzle = parse_puzzle(sys.stdin.read())
+for _ in range({runs}):
+    board = Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                  list(puzzle.col_constraints))
+    result = solve_parallel(board, puzzle.board_str, {workers}, units_per_worker={units_per_worker})
+    assert result.status == "solved", result
+print("done")
+"""
+
+
+def run_to_exit(puzzle: str, runs: int, workers: int, units_per_worker: int):
+    # the work left queued when the first solution stops the search used to hang the interpreter at exit
+    process = subprocess.run([sys.executable, "-c", RUNS.format(runs=runs, workers=workers,
+                                                                units_per_worker=units_per_worker)],
+                             input=puzzle, cwd=HERE, stdout=subprocess.PIPE, universal_newlines=True, timeout=120)
+    assert process.returncode == 0
+    assert process.stdout.split() == ["done"]
+
+
+def test_units_left_queued_after_the_first_solution():
+    run_to_exit(NO_HINTS_10, 3, 2, 100)
+
+
+def test_more_workers_than_units():
+    run_to_exit(NO_HINTS_8, 4, 8, 1)
@@ -0,0 +1,41 @@
+import portfolio
+from budget import SOLVED, UNKNOWN, UNSAT
+from puzzle import Puzzle, read_puzzle, verify
+
+
+def empty_puzzle(size, rows, cols, fleet):
+    return Puzzle(size, rows, cols, fleet, [["0"] * size for _ in range(size)])
+
+
+def test_default_engines_solve():
+    for name in ["input_easy1.txt", "input_medium1.txt"]:
+        puzzle = read_puzzle(name)
+        result = portfolio.solve_portfolio(puzzle)
+        assert result.status == SOLVED
+        assert result.engine in portfolio.DEFAULT_ENGINES + ["battle-random"]
+        assert verify(puzzle, result.solution)
+
+
+def test_precheck_runs_before_the_race():
+    result = portfolio.solve_portfolio(empty_puzzle(6, [1, 0, 1, 0, 0, 3], [1, 1, 1, 0, 0, 1], [1, 0, 1, 0]),
+                                       ["battleship"], 0)
+    assert result.status == UNSAT
+    assert result.engine is None
+    assert "row sums" in result.reason
+
+
+def test_incomplete_engine_finding_nothing_is_unknown(monkeypatch):
+    # the workers are forked, so they see the patched engine table
+    monkeypatch.setitem(portfolio.ENGINES, "nothing", lambda puzzle, seed: None)
+    result = portfolio.solve_portfolio(read_puzzle("input_easy1.txt"), ["nothing"], 0)
+    assert result.status == UNKNOWN
+    assert "nothing (seed 0) found nothing" in result.reason
+
+
+def test_crashed_engine_is_unknown(monkeypatch):
+    def crash(puzzle, seed):
+        raise RuntimeError("boom")
+    monkeypatch.setitem(portfolio.ENGINES, "battle", crash)
+    result = portfolio.solve_portfolio(read_puzzle("input_easy1.txt"), ["battle"], 0)
+    assert result.status == UNKNOWN
+    assert "RuntimeError: boom" in result.reason
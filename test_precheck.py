@@ -0,0 +1,89 @@
+import glob
+import random
+
+import pytest
+
+from precheck import HINT_GLYPHS, MalformedPuzzle, precheck
+from puzzle import Puzzle, read_puzzle, verify
+from test_battle import enumerate_solutions, random_puzzles
+
+# a solution for the fleet of three submarines, two destroyers and a cruiser
+SOLUTION = ["<>..S.",
+            "......",
+            "^.S..S",
+            "M.....",
+            "v..<>.",
+            "......"]
+
+
+def puzzle_with(hints=(), rows=None, cols=None, fleet=(3, 2, 1, 0)):
+    board = [["0"] * 6 for _ in range(6)]
+    for x, y, hint in hints:
+        board[y][x] = hint
+    if rows is None:
+        rows = [sum(cell != "." for cell in row) for row in SOLUTION]
+    if cols is None:
+        cols = [sum(row[x] != "." for row in SOLUTION) for x in range(6)]
+    return Puzzle(6, list(rows), list(cols), list(fleet), board)
+
+
+def test_solution_fits_the_base_puzzle():
+    assert verify(puzzle_with(), "\n".join(SOLUTION))
+    assert precheck(puzzle_with()) is None
+    assert precheck(puzzle_with([(4, 0, "S"), (0, 3, "M"), (3, 4, "<"), (1, 1, ".")])) is None
+
+
+def test_shipped_inputs_pass():
+    for name in glob.glob("input_*.txt"):
+        assert precheck(read_puzzle(name)) is None
+
+
+@pytest.mark.parametrize("puzzle, reason", [
+    (puzzle_with(rows=[3, 0, 3, 1, 2, 0]), "the row sums add up to 9, the column sums to 10 and the fleet has 10"),
+    (Puzzle(6, [6, 0, 0, 0, 0, 0], [1] * 6, [0, 1, 0, 1], [["0"] * 6 for _ in range(6)]),
+     "row 0 needs 6 ship cells, at most 5 fit in a line"),
+    (Puzzle(6, [4, 2, 2, 0, 0, 0], [1, 1, 1, 1, 2, 2], [0, 0, 0, 2], [["0"] * 6 for _ in range(6)]),
+     "2 ships of size 4 or more, the sums leave room for 1"),
+    (puzzle_with([(0, 2, ">")]), "the > at row 2, column 0 points off the board"),
+    (puzzle_with([(5, 5, "M")]), "the M at row 5, column 5 has no room for a ship through it"),
+    (puzzle_with([(4, 0, "S"), (2, 2, "S"), (5, 2, "S"), (2, 5, "S")]), "4 submarine hints for a fleet of 3"),
+    (puzzle_with([(0, 0, "<"), (3, 4, "<"), (0, 2, "^"), (2, 2, "^")]),
+     "4 ship end hints for a fleet of 3 ships of size 2 or more"),
+    (puzzle_with([(0, 3, "M"), (3, 3, "M")]), "2 middle hints for a fleet with 1 middle cells"),
+    (puzzle_with([(0, 0, "S"), (1, 0, "S")]), "the hints make the cell at row 0, column 0 both ship and water"),
+    (puzzle_with([(3, 1, "S")]), "the hints put 1 ship cells in row 1, which has a sum of 0"),
+    (puzzle_with([(0, 0, "."), (2, 0, "."), (3, 0, "."), (5, 0, ".")]),
+     "the hints leave 2 cells of row 0 that can be ship, its sum is 3"),
+    (puzzle_with([(0, 0, "."), (0, 1, "."), (0, 5, ".")]),
+     "the hints leave 3 cells of column 0 that can be ship, its sum is 4"),
+])
+def test_rejection_reasons(puzzle, reason):
+    assert precheck(puzzle).startswith(reason)
+    assert not enumerate_solutions(puzzle)
+
+
+@pytest.mark.parametrize("puzzle, message", [
+    (Puzzle(0, [], [], [0, 0, 0, 0], []), "the board size is 0"),
+    (puzzle_with(rows=[3, 0, 3, 1, 3]), "5 row sums and 6 column sums"),
+    (puzzle_with(fleet=(3, 2, 1)), "the fleet has 3 ship counts"),
+    (puzzle_with(rows=[4, 0, 3, 1, 3, -1]), "a sum or ship count is negative"),
+    (Puzzle(6, [3, 0, 3, 1, 3, 0], [4, 1, 1, 1, 1, 2], [3, 2, 1, 0], [["0"] * 6 for _ in range(5)]),
+     "the hint grid is not 6 by 6"),
+    (puzzle_with([(2, 3, "X")]), "unknown hint 'X' at row 3, column 2"),
+])
+def test_malformed_puzzles(puzzle, message):
+    with pytest.raises(MalformedPuzzle, match=message):
+        precheck(puzzle)
+
+
+def test_rejections_are_sound():
+    # a reason is a proof, a puzzle with a solution never gets one, whatever hints were added
+    rng = random.Random(47)
+    rejected = 0
+    for puzzle in random_puzzles(47, 150):
+        for _ in range(rng.randrange(3)):
+            puzzle.board_str[rng.randrange(6)][rng.randrange(6)] = rng.choice(HINT_GLYPHS)
+        if precheck(puzzle) is not None:
+            rejected += 1
+            assert not enumerate_solutions(puzzle), precheck(puzzle)
+    assert rejected > 10
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import battle
+import service
+from budget import SOLVED, TIMEOUT, UNSAT
+from puzzle import parse_puzzle, verify
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_text(name):
+    with open(os.path.join(HERE, name)) as file:
+        return file.read()
+
+
+EASY = read_text("input_easy1.txt")
+MEDIUM = read_text("input_medium1.txt")
+NO_HINTS = "1041325013\n4123141022\n4321\n" + "0000000000\n" * 10
+UNBALANCED = "100103\n111001\n1010\n" + "000000\n" * 6
+
+
+def serve(lines, workers=0):
+    out = io.StringIO()
+    server = service.Service(workers)
+    try:
+        server.serve(io.StringIO("".join(line + "\n" for line in lines)), out)
+    finally:
+        server.close()
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_handle_request():
+    response = service.handle_request({"id": 7, "puzzle": EASY, "engine": "dlx", "stats": True})
+    assert response["id"] == 7
+    assert response["status"] == SOLVED
+    assert verify(parse_puzzle(EASY), response["solution"])
+    assert response["stats"]["nodes"] >= 0
+    assert response["timings"]["solve"] >= 0
+    assert "queue" not in response["timings"]
+
+
+def test_handle_request_out_of_budget():
+    response = service.handle_request({"id": "a", "puzzle": NO_HINTS, "max_nodes": 5}, time.perf_counter())
+    assert response["status"] == TIMEOUT
+    assert response["solution"] is None
+    assert response["partial"]
+    assert response["timings"]["queue"] >= 0
+
+
+def test_bad_requests_are_answered():
+    for request in [{"id": 1}, {"id": 1, "puzzle": "not a puzzle"}, {"id": 1, "puzzle": EASY, "engine": "nope"}]:
+        response = service.handle_request(request)
+        assert response["id"] == 1
+        assert response["status"] == "error"
+        assert response["error"]
+
+
+def test_serve_in_order():
+    responses = serve([json.dumps({"id": 1, "puzzle": EASY}), "", "{not json", "[1, 2]",
+                       json.dumps({"id": 2, "puzzle": UNBALANCED})])
+    assert [response["id"] for response in responses] == [1, None, None, 2]
+    assert [response["status"] for response in responses] == [SOLVED, "error", "error", UNSAT]
+    assert responses[1]["error"].startswith("bad request")
+
+
+def test_tables_stay_warm_between_requests():
+    before = battle.placement_table.cache_info()
+    serve([json.dumps({"id": index, "puzzle": EASY}) for index in range(3)])
+    after = battle.placement_table.cache_info()
+    assert after.misses - before.misses <= 1
+    assert after.hits > before.hits
+
+
+def test_serve_with_workers():
+    requests = [{"id": index, "puzzle": [EASY, MEDIUM][index % 2]} for index in range(6)]
+    responses = serve([json.dumps(request) for request in requests], workers=2)
+    # answered as they finish, the ids tell them apart
+    assert sorted(response["id"] for response in responses) == list(range(6))
+    for response in responses:
+        assert response["status"] == SOLVED
+        assert verify(parse_puzzle(requests[response["id"]]["puzzle"]), response["solution"])
+        assert response["timings"]["queue"] >= 0
+
+
+def test_socket(tmp_path):
+    path = str(tmp_path / "solver.sock")
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, "service.py"), "--socket", path,
+                                "--workers", "2"], cwd=HERE)
+    try:
+        deadline = time.monotonic() + 60
+        while not os.path.exists(path):
+            assert time.monotonic() < deadline and process.poll() is None
+            time.sleep(0.05)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            client.sendall("".join(json.dumps({"id": index, "puzzle": EASY}) + "\n" for index in range(3)).encode())
+            client.shutdown(socket.SHUT_WR)
+            with client.makefile() as answers:
+                responses = [json.loads(line) for line in answers]
+        assert sorted(response["id"] for response in responses) == [0, 1, 2]
+        assert all(response["status"] == SOLVED for response in responses)
+    finally:
+        process.terminate()
+        assert process.wait(timeout=60) == 0
+    assert not os.path.exists(path)
@@ -0,0 +1,32 @@
+from budget import UNSAT
+from puzzle import Puzzle, parse_puzzle, verify
+from session import UNIQUE, Session
+
+
+def empty_puzzle(size, rows, cols, fleet):
+    return Puzzle(size, rows, cols, fleet, [["0"] * size for _ in range(size)])
+
+
+def test_unbalanced_sums_are_unsat():
+    session = Session(empty_puzzle(6, [1, 0, 1, 0, 0, 3], [1, 1, 1, 0, 0, 1], [1, 0, 1, 0]))
+    assert session.status == UNSAT
+    assert session.solutions == []
+
+
+def test_sum_edit_that_unbalances_the_totals():
+    with open("input_easy1.txt") as file:
+        puzzle = parse_puzzle(file.read())
+    session = Session(puzzle)
+    assert session.status == UNIQUE
+    assert verify(puzzle, session.solutions[0])
+    row = 0
+    value = puzzle.row_constraints[row]
+    result = session.set_row_sum(row, value + 1)
+    assert result.status == UNSAT
+    assert result.solution is None
+    assert result.reason is not None and "row sums" in result.reason
+    # putting the sum back restores the puzzle
+    result = session.set_row_sum(row, value)
+    assert result.status == UNIQUE
+    assert result.reason is None
+    assert verify(puzzle, result.solution)
@@ -0,0 +1,33 @@
+import time
+
+import battle
+from puzzle import read_puzzle
+from stats import Stats, phase
+
+
+def test_nested_phases_are_exclusive():
+    stats = Stats()
+    with phase(stats, "outer"):
+        time.sleep(0.01)
+        with phase(stats, "inner"):
+            time.sleep(0.1)
+        time.sleep(0.01)
+    # counted in both, outer would take longer than inner
+    assert 0.02 <= stats.phases["outer"] < stats.phases["inner"]
+    assert stats.phases["inner"] >= 0.1
+    assert stats.current is None
+
+
+def test_phase_without_stats():
+    with phase(None, "search") as stats:
+        assert stats is None
+
+
+def test_phases_add_up_to_the_solve():
+    puzzle = read_puzzle("input_hard1.txt")
+    start = time.perf_counter()
+    result = battle.solve(puzzle, collect_stats=True)
+    elapsed = time.perf_counter() - start
+    phases = result.stats.phases
+    assert phases["propagation"] > 0 and phases["search"] > 0
+    assert sum(phases.values()) <= elapsed
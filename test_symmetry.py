@@ -0,0 +1,88 @@
+import random
+
+import battle
+from parallel import solve_parallel
+from puzzle import read_puzzle, verify
+from symmetry import IDENTITY, SYMMETRIES, puzzle_symmetries, transform_grid, transform_puzzle
+from test_battle import empty_puzzle, enumerate_solutions
+
+
+def symmetric_puzzles(seed, count, size=6, fleet=(3, 2, 1, 0)):
+    """Hintless puzzles with a solution whose sums are palindromes or whose rows and columns agree."""
+    rng = random.Random(seed)
+    cells = sum(ship * number for ship, number in enumerate(fleet, 1))
+    puzzles = []
+    while len(puzzles) < count:
+        rows = [0] * size
+        for _ in range(cells):
+            rows[rng.randrange(size)] += 1
+        if len(puzzles) % 2:
+            half = [0] * (size // 2)
+            for _ in range(cells // 2):
+                half[rng.randrange(size // 2)] += 1
+            rows = half + half[::-1]
+            cols = rows[:]
+            rng.shuffle(cols)
+        else:
+            cols = rows
+        puzzle = empty_puzzle(size, rows, cols, list(fleet))
+        if puzzle_symmetries(puzzle) and enumerate_solutions(puzzle):
+            puzzles.append(puzzle)
+    return puzzles
+
+
+def orbits(puzzle, solutions):
+    symmetries = [IDENTITY] + puzzle_symmetries(puzzle)
+    return {min("\n".join(transform_grid(solution.split("\n"), symmetry)) for symmetry in symmetries)
+            for solution in solutions}
+
+
+def test_symmetries_form_a_group():
+    for puzzle in symmetric_puzzles(44, 10):
+        group = [IDENTITY] + puzzle_symmetries(puzzle)
+        for first in group:
+            for second in group:
+                image = transform_puzzle(transform_puzzle(puzzle, first), second)
+                assert image == puzzle
+        assert len(group) in (2, 4, 8)
+
+
+def test_placement_images_are_a_permutation():
+    size = 6
+    for symmetry in SYMMETRIES:
+        breaker = battle.SymmetryBreaker(size, [symmetry])
+        placements = {placement for pairs in breaker.pairs for placement, _ in pairs}
+        images = {image for pairs in breaker.pairs for _, image in pairs}
+        assert placements == images
+
+
+def test_solution_is_the_leader_of_its_orbit():
+    for puzzle in symmetric_puzzles(45, 10):
+        solutions = enumerate_solutions(puzzle)
+        result = battle.solve(puzzle, break_symmetry=True)
+        assert result.solution in solutions
+        breaker = battle.symmetry_breaker(puzzle)
+        orbit = breaker.orbit(result.solution)
+        assert orbit[0] == result.solution
+        assert all(image in solutions for image in orbit)
+
+
+def test_counts_expand_orbits_to_every_solution():
+    # the last one has all 8 symmetries, its 16 solutions fall into 2 orbits
+    square = empty_puzzle(6, [3, 1, 1, 1, 1, 3], [3, 1, 1, 1, 1, 3], [3, 2, 1, 0])
+    for puzzle in symmetric_puzzles(46, 6) + [square]:
+        solutions = enumerate_solutions(puzzle)
+        breaker = battle.symmetry_breaker(puzzle)
+        for symmetry in [None, breaker]:
+            board = battle.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                                 list(puzzle.col_constraints))
+            result = solve_parallel(board, puzzle.board_str, 2, count_all=True, symmetry=symmetry)
+            assert result.solutions == len(solutions)
+            assert result.orbits == (len(orbits(puzzle, solutions)) if symmetry else len(solutions))
+
+
+def test_shipped_inputs_solve_with_symmetry_breaking():
+    for name in ["input_easy1.txt", "input_medium1.txt", "input_hard1.txt"]:
+        puzzle = read_puzzle(name)
+        result = battle.solve(puzzle, break_symmetry=True)
+        assert verify(puzzle, result.solution)
@@ -0,0 +1,43 @@
+import pytest
+
+import battle
+import tracer
+from puzzle import read_puzzle
+
+
+def trace_search(path, binary):
+    puzzle = read_puzzle("input_medium2.txt")
+    events, file = tracer.open_tracer(str(path), binary)
+    board = battle.Board(puzzle.size, list(puzzle.ship_constraints), list(puzzle.row_constraints),
+                         list(puzzle.col_constraints))
+    with file:
+        result = battle.run(board, puzzle.board_str, battle.Search(tracer=events))
+    assert result.status == "solved"
+    return list(tracer.read_events(str(path)))
+
+
+def test_event_tracer_needs_emit():
+    with pytest.raises(TypeError):
+        tracer.EventTracer()
+
+    class Collect(tracer.EventTracer):
+        def __init__(self):
+            super().__init__()
+            self.events = []
+
+        def emit(self, event):
+            self.events.append(event)
+
+    collect = Collect()
+    collect.on_prune(2, "lines", 5)
+    assert [event.key() for event in collect.events] == [("prune", 2, 5, "lines")]
+
+
+def test_logs_record_the_same_search(tmp_path):
+    jsonl = trace_search(tmp_path / "trace.jsonl", False)
+    binary = trace_search(tmp_path / "trace.bin", True)
+    assert jsonl and jsonl[-1].kind == "solution"
+    assert tracer.first_difference(jsonl, binary) is None
+    index, first, second = tracer.first_difference(jsonl, binary[:-1])
+    assert (index, first, second) == (len(jsonl) - 1, jsonl[-1], None)
+    assert "solution at depth" in tracer.summarize(binary)
@@ -0,0 +1,66 @@
+import glob
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import battle
+import vector
+from budget import SOLVED, UNSAT
+from puzzle import read_puzzle, verify
+from stats import Stats
+from test_battle import empty_puzzle, enumerate_solutions, random_puzzles
+
+
+def test_matrices_match_the_placement_table():
+    n = 6
+    table = battle.placement_table(n)
+    m = vector.placement_matrices(n)
+    assert vector.placement_matrices(n) is m
+    for index, placement in enumerate(m.ids):
+        cells = table.cells[placement]
+        assert set(np.flatnonzero(m.cells[index])) == set(cells)
+        assert set(np.flatnonzero(m.halo[index])) == {neighbour for cell in cells
+                                                      for neighbour in table.neighbourhood(cell)}
+        assert m.sizes[index] == len(cells)
+        # each cell needs room in its row and column for every cell of the ship sharing them
+        for slot, cell in enumerate(cells):
+            assert m.row_need[index, slot] == sum(other // n == cell // n for other in cells)
+            assert m.col_need[index, slot] == sum(other % n == cell % n for other in cells)
+        assert not m.row_need[index, len(cells):].any() and not m.col_need[index, len(cells):].any()
+
+
+def test_matches_enumeration():
+    for puzzle in random_puzzles(46, 60) + random_puzzles(47, 10, 7, (3, 2, 1, 1)):
+        solutions = enumerate_solutions(puzzle)
+        result = vector.solve(puzzle)
+        if solutions:
+            assert result.status == SOLVED, puzzle
+            assert result.solution in solutions
+        else:
+            assert result.status == UNSAT, puzzle
+
+
+def test_agrees_with_battle_on_the_shipped_inputs():
+    for name in sorted(glob.glob("input_*.txt")):
+        puzzle = read_puzzle(name)
+        stats = Stats()
+        result = vector.solve(puzzle, stats)
+        assert result.status == battle.solve(puzzle).status == SOLVED
+        assert verify(puzzle, result.solution)
+        assert stats.prunes["capacity"] > 0
+
+
+def test_propagation_places_the_forced_ships():
+    # a row of three and a cruiser to fill it, nothing is left to search
+    board = vector.VectorBoard(empty_puzzle(6, [3, 0, 0, 0, 0, 0], [1, 1, 1, 0, 0, 0], [0, 0, 1, 0]))
+    board.propagate()
+    assert board.__repr__().split("\n")[0] == "<M>..."
+    assert not board.fleet.any()
+
+
+def test_propagation_fails_a_row_the_fleet_cannot_fill():
+    board = vector.VectorBoard(empty_puzzle(6, [2, 0, 0, 0, 0, 0], [1, 1, 0, 0, 0, 0], [1, 0, 0, 0]))
+    with pytest.raises(vector.Infeasible):
+        board.propagate()
+
@@ -0,0 +1,71 @@
+import glob
+import random
+
+import verifier
+from puzzle import SHIP_GLYPHS, Puzzle, read_puzzle, verify
+from test_battle import enumerate_solutions, random_puzzles
+
+
+def corruptions(rng, solution):
+    """The solution with one cell redrawn, two cells swapped, a ship stretched or cut, and broken shapes."""
+    rows = solution.split("\n")
+    n = len(rows)
+    grids = []
+    for _ in range(6):
+        cells = [list(row) for row in rows]
+        x, y = rng.randrange(n), rng.randrange(n)
+        cells[y][x] = rng.choice("." + SHIP_GLYPHS)
+        grids.append(cells)
+    for _ in range(3):
+        cells = [list(row) for row in rows]
+        (x1, y1), (x2, y2) = [(rng.randrange(n), rng.randrange(n)) for _ in range(2)]
+        cells[y1][x1], cells[y2][x2] = cells[y2][x2], cells[y1][x1]
+        grids.append(cells)
+    texts = ["\n".join("".join(row) for row in cells) for cells in grids]
+    return texts + ["\n".join(rows[::-1]), "\n".join(rows[:-1]), "\n".join(row + "." for row in rows),
+                    solution.replace(".", "é", 1), solution.replace("<", "S", 1), None, ""]
+
+
+def test_batch_agrees_with_verify():
+    rng = random.Random(50)
+    puzzles = []
+    solutions = []
+    for puzzle in random_puzzles(50, 40) + random_puzzles(51, 10, 7, (3, 2, 1, 1)):
+        for solution in enumerate_solutions(puzzle)[:5] or [None]:
+            for candidate in [solution] + (corruptions(rng, solution) if solution is not None else []):
+                puzzles.append(puzzle)
+                solutions.append(candidate)
+    expected = [candidate is not None and verify(puzzle, candidate) for puzzle, candidate in zip(puzzles, solutions)]
+    assert verifier.verify_batch(puzzles, solutions) == expected
+    assert 0 < sum(expected) < len(expected)
+
+
+def test_shapes_the_sums_do_not_catch():
+    # a battleship in the top row, every other grid has its sums but draws the wrong ships
+    puzzle = Puzzle(6, [4, 0, 0, 0, 0, 0], [1, 1, 1, 1, 0, 0], [0, 0, 0, 1], [["0"] * 6 for _ in range(6)])
+    candidates = ["<MM>..", "<M>M..", "S<M>..", "<>S>..", "<MMM..", "MMMM..", "<MvM.."]
+    candidates = [row + "\n......" * 5 for row in candidates]
+    expected = [True] + [False] * (len(candidates) - 1)
+    assert [verify(puzzle, candidate) for candidate in candidates] == expected
+    assert verifier.verify_batch([puzzle] * len(candidates), candidates) == expected
+
+
+def test_shipped_solutions_of_mixed_sizes():
+    puzzles = [read_puzzle(name) for name in sorted(glob.glob("input_*.txt"))]
+    solutions = []
+    for name in sorted(glob.glob("solution_*.txt")):
+        with open(name) as file:
+            solutions.append(file.read())
+    assert verifier.verify_batch(puzzles, solutions) == [True] * len(puzzles)
+    # every solution checked against the puzzle after it
+    shifted = solutions[1:] + solutions[:1]
+    assert verifier.verify_batch(puzzles, shifted) == [verify(puzzle, solution)
+                                                        for puzzle, solution in zip(puzzles, shifted)]
+
+
+def test_without_numpy(monkeypatch):
+    monkeypatch.setattr(verifier, "np", None)
+    puzzle = read_puzzle("input_easy1.txt")
+    with open("solution_easy1.txt") as file:
+        solution = file.read()
+    assert verifier.verify_batch([puzzle, puzzle, puzzle], [solution, None, solution[::-1]]) == [True, False, False]
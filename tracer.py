@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import *
+
+EVENTS = ["node", "assign", "prune", "fail", "solution"]
+PROPAGATORS = ["placement", "capacity", "lines", "nogoods", "forward check", "side conditions", "unit propagation",
+               "symmetry"]
+
+# binary log: a magic line followed by fixed size records of event, propagator, depth, value and time
+MAGIC = b"BSTRACE1\n"
+RECORD = struct.Struct("<BBHif")
+NO_PROPAGATOR = 255
+
+
+class Tracer:
+    """Search event hooks. Every hook is a no-op here, and solvers only call them when a tracer was passed,
+    so an untraced search costs one `is not None` test per event site.
+
+    assignment is an engine specific integer id: the placement id in battle.Board and
+    cell * len(values) + value index in BattleShip.Board.
+    """
+
+    def on_node(self, depth: int):
+        pass
+
+    def on_assign(self, depth: int, assignment: int):
+        pass
+
+    def on_prune(self, depth: int, propagator: str, count: int):
+        pass
+
+    def on_fail(self, depth: int, assignment: int):
+        pass
+
+    def on_solution(self, depth: int):
+        pass
+
+
+@dataclass
+class Event:
+    kind: str
+    depth: int
+    value: int = 0
+    propagator: Optional[str] = None
+    time: float = 0.0
+
+    def key(self) -> Tuple[str, int, int, Optional[str]]:
+        # everything but the time, which differs between any two runs
+        return self.kind, self.depth, self.value, self.propagator
+
+
+class EventTracer(Tracer, ABC):
+    """Turns the hooks into Event records with the time since the tracer was created. Subclasses say what
+    becomes of each record in emit."""
+    start: float
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    @abstractmethod
+    def emit(self, event: Event):
+        pass
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def on_node(self, depth: int):
+        self.emit(Event("node", depth, 0, None, self.elapsed()))
+
+    def on_assign(self, depth: int, assignment: int):
+        self.emit(Event("assign", depth, assignment, None, self.elapsed()))
+
+    def on_prune(self, depth: int, propagator: str, count: int):
+        self.emit(Event("prune", depth, count, propagator, self.elapsed()))
+
+    def on_fail(self, depth: int, assignment: int):
+        self.emit(Event("fail", depth, assignment, None, self.elapsed()))
+
+    def on_solution(self, depth: int):
+        self.emit(Event("solution", depth, 0, None, self.elapsed()))
+
+
+class JsonlTracer(EventTracer):
+    file: IO[str]
+
+    def __init__(self, file: IO[str]):
+        super().__init__()
+        self.file = file
+
+    def emit(self, event: Event):
+        record = {"event": event.kind, "depth": event.depth, "value": event.value, "t": round(event.time, 6)}
+        if event.propagator is not None:
+            record["propagator"] = event.propagator
+        self.file.write(json.dumps(record) + "\n")
+
+
+class BinaryTracer(EventTracer):
+    file: IO[bytes]
+
+    def __init__(self, file: IO[bytes]):
+        super().__init__()
+        self.file = file
+        self.file.write(MAGIC)
+
+    def emit(self, event: Event):
+        propagator = PROPAGATORS.index(event.propagator) if event.propagator is not None else NO_PROPAGATOR
+        self.file.write(RECORD.pack(EVENTS.index(event.kind), propagator, event.depth, event.value, event.time))
+
+
+class TreeTracer(EventTracer):
+    """Aggregates the events per depth of the search tree."""
+    levels: List[Dict[str, int]]
+    prunes: Dict[str, int]
+    solution_depth: Optional[int]
+    last_time: float
+
+    def __init__(self):
+        super().__init__()
+        self.levels = []
+        self.prunes = {}
+        self.solution_depth = None
+        self.last_time = 0.0
+
+    def emit(self, event: Event):
+        while len(self.levels) <= event.depth:
+            self.levels.append({kind: 0 for kind in EVENTS})
+        if event.kind == "prune":
+            self.levels[event.depth]["prune"] += event.value
+            self.prunes[event.propagator] = self.prunes.get(event.propagator, 0) + event.value
+        else:
+            self.levels[event.depth][event.kind] += 1
+        if event.kind == "solution":
+            self.solution_depth = event.depth
+        self.last_time = max(self.last_time, event.time)
+
+    def render(self) -> str:
+        lines = ["depth      nodes    assigns      fails     prunes  branching"]
+        for depth, level in enumerate(self.levels):
+            branching = level["assign"] / level["node"] if level["node"] else 0.0
+            lines.append("{:5d} {:10d} {:10d} {:10d} {:10d} {:10.2f}".format(
+                depth, level["node"], level["assign"], level["fail"], level["prune"], branching))
+        lines.append("total nodes {}, fails {}, elapsed {:.6f}s".format(
+            sum(level["node"] for level in self.levels), sum(level["fail"] for level in self.levels),
+            self.last_time))
+        lines.append("prunes " + ", ".join("{} {}".format(name, count) for name, count in sorted(self.prunes.items())))
+        lines.append("solution at depth {}".format(self.solution_depth) if self.solution_depth is not None
+                     else "no solution")
+        return "\n".join(lines)
+
+
+def open_tracer(path: str, binary: bool = False) -> Tuple[EventTracer, IO]:
+    file = open(path, "wb" if binary else "w")
+    return (BinaryTracer(file) if binary else JsonlTracer(file)), file
+
+
+def read_events(path: str) -> Iterator[Event]:
+    with open(path, "rb") as file:
+        data = file.read()
+    if data.startswith(MAGIC):
+        for kind, propagator, depth, value, seconds in RECORD.iter_unpack(data[len(MAGIC):]):
+            yield Event(EVENTS[kind], depth, value, None if propagator == NO_PROPAGATOR else PROPAGATORS[propagator],
+                        seconds)
+    else:
+        for line in data.decode().splitlines():
+            if line:
+                record = json.loads(line)
+                yield Event(record["event"], record["depth"], record["value"], record.get("propagator"),
+                            record.get("t", 0.0))
+
+
+def replay(events: Iterable[Event], tracer: EventTracer):
+    for event in events:
+        tracer.emit(event)
+
+
+def summarize(events: Iterable[Event]) -> str:
+    tree = TreeTracer()
+    replay(events, tree)
+    return tree.render()
+
+
+def first_difference(first: Iterable[Event], second: Iterable[Event]) -> Optional[Tuple[int, Optional[Event], Optional[Event]]]:
+    """The index of the first event where two logs diverge along with both events (None past the end of a log),
+    or None if the logs record the same search."""
+    first = iter(first)
+    second = iter(second)
+    index = 0
+    while True:
+        a = next(first, None)
+        b = next(second, None)
+        if a is None and b is None:
+            return None
+        if a is None or b is None or a.key() != b.key():
+            return index, a, b
+        index += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="Render the search tree summary of an event log.")
+    summary_parser.add_argument("log", type=str)
+    diff_parser = subparsers.add_parser("diff", help="Report where two event logs start to differ.")
+    diff_parser.add_argument("first", type=str)
+    diff_parser.add_argument("second", type=str)
+    args = parser.parse_args()
+    if args.command == "summary":
+        print(summarize(read_events(args.log)))
+    else:
+        difference = first_difference(read_events(args.first), read_events(args.second))
+        if difference is None:
+            print("same search")
+        else:
+            index, a, b = difference
+            print("diverge at event {}".format(index))
+            print("first:  {}".format(a))
+            print("second: {}".format(b))
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from functools import lru_cache
+from typing import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from battle import placement_table
+from budget import SOLVED, TIMEOUT, UNSAT, Budget, BudgetExceeded, SolveResult
+from puzzle import Puzzle, read_puzzle
+from stats import Stats, phase
+
+SHIP_HINTS = "S^v<>M"
+
+
+class Infeasible(Exception):
+    pass
+
+
+class PlacementMatrices:
+    """Every placement of every ship size on a board as rows of matrices: the cells it covers and the cells
+    it keeps clear (its halo, itself included) as masks over the board, and the glyph it draws on each cell.
+    A ship has at most four cells, so the cells are also kept as indices, cell_index[i] padded with the
+    extra cell n * n, along with the row and column of each and how many ship cells the placement puts in
+    that row and column. Checks over all placements then gather a few entries per placement instead of
+    scanning the whole board."""
+    board_size: int
+    ids: List[int]
+    sizes: np.ndarray
+    cells: np.ndarray
+    halo: np.ndarray
+    glyphs: np.ndarray
+    cell_index: np.ndarray
+    cell_rows: np.ndarray
+    cell_cols: np.ndarray
+    row_need: np.ndarray
+    col_need: np.ndarray
+
+    def __init__(self, board_size: int):
+        n = board_size
+        table = placement_table(n)
+        self.board_size = n
+        # a submarine is kept once, as the horizontal placement of its cell
+        self.ids = [placement for placement in range(8 * n * n)
+                    if table.cells[placement] and not (placement & 3 == 0 and placement >> 2 & 1)]
+        count = len(self.ids)
+        self.sizes = np.array([(placement & 3) + 1 for placement in self.ids], dtype=np.int8)
+        self.cells = np.zeros((count, n * n), dtype=bool)
+        self.halo = np.zeros((count, n * n), dtype=bool)
+        self.glyphs = np.zeros((count, n * n), dtype=np.uint8)
+        self.cell_index = np.full((count, 4), n * n, dtype=np.intp)
+        for index, placement in enumerate(self.ids):
+            cells = table.cells[placement]
+            self.cell_index[index, :len(cells)] = cells
+            for cell, glyph in zip(cells, table.glyphs[placement]):
+                self.cells[index, cell] = True
+                self.glyphs[index, cell] = glyph
+                self.halo[index, table.neighbourhood(cell)] = True
+        padding = self.cell_index == n * n
+        self.cell_rows = np.where(padding, n, self.cell_index // n)
+        self.cell_cols = np.where(padding, n, self.cell_index % n)
+        # a horizontal ship needs its size in its row and one in each of its columns, a vertical one the reverse
+        vertical = self.cell_cols[:, :1] == self.cell_cols[:, 1:2]
+        sizes = self.sizes[:, None].astype(np.int16)
+        self.row_need = np.where(padding, 0, np.where(vertical, 1, sizes)).astype(np.int16)
+        self.col_need = np.where(padding, 0, np.where(vertical, sizes, 1)).astype(np.int16)
+
+
+@lru_cache(maxsize=None)
+def placement_matrices(board_size: int) -> PlacementMatrices:
+    return PlacementMatrices(board_size)
+
+
+class VectorBoard:
+    """Search state as vectors over the placements and cells of PlacementMatrices. Propagation filters all
+    live placements at once with boolean matrix operations instead of looping over cells and slots."""
+    matrices: PlacementMatrices
+    live: np.ndarray
+    rows: np.ndarray
+    cols: np.ndarray
+    fleet: np.ndarray
+    water: np.ndarray
+    required: np.ndarray
+    covered: np.ndarray
+    placed: List[int]
+
+    def __init__(self, puzzle: Puzzle):
+        n = puzzle.size
+        self.matrices = placement_matrices(n)
+        m = self.matrices
+        self.live = np.ones(len(m.ids), dtype=bool)
+        self.rows = np.array(puzzle.row_constraints, dtype=np.int16)
+        self.cols = np.array(puzzle.col_constraints, dtype=np.int16)
+        self.fleet = np.array(puzzle.ship_constraints, dtype=np.int16)
+        hints = np.array([ord(glyph) for row in puzzle.board_str for glyph in row], dtype=np.uint8)
+        self.water = hints == ord(".")
+        self.required = np.isin(hints, np.frombuffer(SHIP_HINTS.encode(), dtype=np.uint8))
+        # a placement over a ship hint has to draw that very glyph there
+        self.live &= ~(m.cells[:, self.required] & (m.glyphs[:, self.required] != hints[self.required])).any(axis=1)
+        self.covered = np.zeros(n * n, dtype=bool)
+        self.placed = []
+
+    def copy(self) -> VectorBoard:
+        new = VectorBoard.__new__(VectorBoard)
+        new.matrices = self.matrices
+        new.live = self.live.copy()
+        new.rows = self.rows.copy()
+        new.cols = self.cols.copy()
+        new.fleet = self.fleet.copy()
+        new.water = self.water.copy()
+        new.required = self.required.copy()
+        new.covered = self.covered.copy()
+        new.placed = self.placed.copy()
+        return new
+
+    def place(self, index: int):
+        m = self.matrices
+        if not self.live[index] or (m.cells[index] & (self.water | self.covered)).any():
+            raise Infeasible("placement is no longer possible")
+        self.placed.append(index)
+        self.live[index] = False
+        self.rows -= m.cells[index].reshape(m.board_size, m.board_size).sum(axis=1, dtype=np.int16)
+        self.cols -= m.cells[index].reshape(m.board_size, m.board_size).sum(axis=0, dtype=np.int16)
+        self.fleet[m.sizes[index] - 1] -= 1
+        if self.fleet.min() < 0 or self.rows.min() < 0 or self.cols.min() < 0:
+            raise Infeasible("placement exceeds the fleet or a sum")
+        self.covered |= m.cells[index]
+        self.water |= m.halo[index] & ~m.cells[index]
+
+    def covering(self) -> np.ndarray:
+        # how many live placements cover each cell
+        m = self.matrices
+        n = m.board_size
+        return np.bincount(m.cell_index[self.live].ravel(), minlength=n * n + 1)[:n * n]
+
+    def propagate(self, stats: Optional[Stats] = None):
+        m = self.matrices
+        n = m.board_size
+        while True:
+            before = int(np.count_nonzero(self.live))
+            # conflicts are placements over a cell that is water or already taken, which covers the halos
+            occupied = np.append(self.water | self.covered, False)
+            self.live &= ~occupied[m.cell_index].any(axis=1)
+            self.live &= self.fleet[m.sizes - 1] > 0
+            rows = np.append(self.rows, 0)
+            cols = np.append(self.cols, 0)
+            self.live &= (rows[m.cell_rows] >= m.row_need).all(axis=1) & (cols[m.cell_cols] >= m.col_need).all(axis=1)
+            if (np.bincount(m.sizes[self.live] - 1, minlength=4) < self.fleet).any():
+                raise Infeasible("not enough placements left for the fleet")
+            covering = self.covering()
+            coverable = covering > 0
+            supply = coverable.reshape(n, n)
+            row_supply = supply.sum(axis=1)
+            col_supply = supply.sum(axis=0)
+            if (row_supply < self.rows).any() or (col_supply < self.cols).any():
+                raise Infeasible("a line cannot reach its sum")
+            # a line with exactly as many coverable cells as it needs is all ship
+            tight = ((row_supply == self.rows) & (self.rows > 0))[:, None] | \
+                    ((col_supply == self.cols) & (self.cols > 0))[None, :]
+            self.required |= coverable & tight.reshape(n * n)
+            self.water |= ~coverable & ~self.covered
+            needed = self.required & ~self.covered
+            if (needed & ~coverable).any():
+                raise Infeasible("a ship cell cannot be covered")
+            forced = np.append(needed & (covering == 1), False)
+            after = int(np.count_nonzero(self.live))
+            if stats is not None:
+                stats.prune("capacity", before - after)
+            if forced.any():
+                # the one placement left for each such cell, placing one may rule out the next
+                for index in np.flatnonzero(self.live & forced[m.cell_index].any(axis=1)):
+                    self.place(int(index))
+                if stats is not None:
+                    stats.prune("placement", after - int(np.count_nonzero(self.live)))
+                continue
+            if after == before:
+                return
+
+    def branches(self) -> np.ndarray:
+        """The placements to branch on: those covering the ship cell with the fewest ways to cover it, or if
+        every ship cell is covered, the placements of the largest ship still to place."""
+        m = self.matrices
+        needed = self.required & ~self.covered
+        if needed.any():
+            cell = int(np.argmin(np.where(needed, self.covering(), np.iinfo(np.intp).max)))
+            return np.flatnonzero(self.live & m.cells[:, cell])
+        size = int(np.flatnonzero(self.fleet > 0)[-1]) + 1
+        return np.flatnonzero(self.live & (m.sizes == size))
+
+    def __repr__(self):
+        m = self.matrices
+        n = m.board_size
+        grid = np.full(n * n, ord("."), dtype=np.uint8)
+        for index in self.placed:
+            grid = np.where(m.cells[index], m.glyphs[index], grid)
+        return "\n".join(grid[row * n:(row + 1) * n].tobytes().decode() for row in range(n))
+
+
+def search(board: VectorBoard, depth: int, stats: Optional[Stats], budget: Optional[Budget]) -> Optional[VectorBoard]:
+    if not board.fleet.any():
+        return board
+    if budget is not None:
+        budget.tick()
+        if depth > budget.partial_depth:
+            budget.keep(depth, board.__repr__())
+    if stats is not None:
+        stats.node(depth)
+    for index in board.branches():
+        child = board.copy()
+        # the later branches leave this placement out, so no solution is reached twice
+        board.live[index] = False
+        try:
+            child.place(int(index))
+            if stats is not None:
+                stats.placements += 1
+            child.propagate(stats)
+        except Infeasible:
+            if stats is not None:
+                stats.backtracks += 1
+            continue
+        result = search(child, depth + 1, stats, budget)
+        if result is not None:
+            return result
+        if stats is not None:
+            stats.backtracks += 1
+    return None
+
+
+def solve(puzzle: Puzzle, stats: Optional[Stats] = None, timeout: Optional[float] = None,
+          max_nodes: Optional[int] = None) -> SolveResult:
+    if np is None:
+        raise ImportError("the numpy engine needs numpy installed")
+    budget = Budget(timeout, max_nodes) if timeout is not None or max_nodes is not None else None
+    try:
+        with phase(stats, "build"):
+            board = VectorBoard(puzzle)
+        with phase(stats, "search"):
+            board.propagate(stats)
+            final = search(board, 0, stats, budget)
+    except BudgetExceeded:
+        return SolveResult(TIMEOUT, None, stats, budget.partial)
+    except Infeasible:
+        final = None
+    if final is None:
+        return SolveResult(UNSAT, None, stats)
+    return SolveResult(SOLVED, final.__repr__(), stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        default=None,
+        help="Report search statistics on stderr in the given format."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up after this many seconds of search."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="Give up after this many search nodes."
+    )
+    args = parser.parse_args()
+    stats = Stats() if args.stats else None
+    with phase(stats, "parse"):
+        puzzle = read_puzzle(args.inputfile)
+    result = solve(puzzle, stats, args.timeout, args.max_nodes)
+    with phase(stats, "output"):
+        write_file = open(args.outputfile, 'w')
+        write_file.write(result.solution.__repr__() if result.solution is None else result.solution)
+        print(result.solution)
+    if result.status != SOLVED:
+        print("status: {}".format(result.status), file=sys.stderr)
+    if stats is not None:
+        print(stats.to_json(), file=sys.stderr)
+    sys.exit(result.exit_code)
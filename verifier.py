@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from puzzle import SHIP_GLYPHS, Puzzle, read_puzzle, verify
+
+# the frame of water around the stacked grids, wide enough to look three cells past a ship end
+FRAME = 3
+
+# the ship neighbours a glyph has to have, as left * 8 + right * 4 + up * 2 + down, a middle runs either way
+NEIGHBOURS = {"S": [0], "<": [4], ">": [8], "^": [1], "v": [2], "M": [12, 3]}
+
+
+def allowed_neighbours() -> np.ndarray:
+    allowed = np.zeros((256, 16), dtype=bool)
+    allowed[ord(".")] = True
+    for glyph, codes in NEIGHBOURS.items():
+        allowed[ord(glyph), codes] = True
+    return allowed
+
+
+def stack_grids(solutions: Sequence[Optional[str]], size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The solutions as one (count, size + 2 * FRAME, size + 2 * FRAME) array of glyph bytes framed by water,
+    and which of them are a size by size grid at all."""
+    grids = np.full((len(solutions), size + 2 * FRAME, size + 2 * FRAME), ord("."), dtype=np.uint8)
+    shaped = np.zeros(len(solutions), dtype=bool)
+    texts = []
+    for index, solution in enumerate(solutions):
+        rows = solution.split() if solution is not None else []
+        if len(rows) == size and all(len(row) == size for row in rows):
+            shaped[index] = True
+            texts.append("".join(rows))
+    if texts:
+        # anything but ascii becomes "?", which is no glyph
+        cells = np.frombuffer("".join(texts).encode("ascii", "replace"), dtype=np.uint8)
+        grids[shaped, FRAME:-FRAME, FRAME:-FRAME] = cells.reshape(len(texts), size, size)
+    return grids, shaped
+
+
+def verify_size(puzzles: Sequence[Puzzle], solutions: Sequence[Optional[str]], size: int) -> np.ndarray:
+    grids, valid = stack_grids(solutions, size)
+    ships = grids != ord(".")
+
+    def shifted(grid: np.ndarray, dy: int, dx: int) -> np.ndarray:
+        # the entries dy rows down and dx columns right of every cell
+        return grid[:, FRAME + dy:FRAME + dy + size, FRAME + dx:FRAME + dx + size]
+
+    cells = shifted(grids, 0, 0)
+    ship = shifted(ships, 0, 0)
+    valid &= np.isin(cells, np.frombuffer(("." + SHIP_GLYPHS).encode(), dtype=np.uint8)).all(axis=(1, 2))
+    valid &= (ship.sum(axis=2) == np.array([puzzle.row_constraints for puzzle in puzzles])).all(axis=1)
+    valid &= (ship.sum(axis=1) == np.array([puzzle.col_constraints for puzzle in puzzles])).all(axis=1)
+    hints = np.frombuffer("".join("".join(row) for puzzle in puzzles for row in puzzle.board_str).encode(),
+                          dtype=np.uint8).reshape(len(puzzles), size, size)
+    valid &= ((hints == ord("0")) | (hints == cells)).all(axis=(1, 2))
+    # ships never touch corner to corner, and each glyph has exactly the ship neighbours its shape draws, which
+    # makes every ship a straight run from an end or submarine glyph through middles to the other end
+    diagonal = shifted(ships, -1, -1) | shifted(ships, -1, 1) | shifted(ships, 1, -1) | shifted(ships, 1, 1)
+    valid &= ~(ship & diagonal).any(axis=(1, 2))
+    code = shifted(ships, 0, -1) * np.uint8(8) + shifted(ships, 0, 1) * np.uint8(4) + \
+        shifted(ships, -1, 0) * np.uint8(2) + shifted(ships, 1, 0)
+    valid &= allowed_neighbours()[cells, code].all(axis=(1, 2))
+    # at_least[k] counts the ships of k + 1 cells or more, from their left or top end and the middles after it
+    horizontal = cells == ord("<")
+    vertical = cells == ord("^")
+    at_least = [(cells == ord("S")) | horizontal | vertical, horizontal | vertical]
+    for step in range(1, 4):
+        horizontal = horizontal & (shifted(grids, 0, step) == ord("M"))
+        vertical = vertical & (shifted(grids, step, 0) == ord("M"))
+        at_least.append(horizontal | vertical)
+    at_least = np.stack([counted.sum(axis=(1, 2)) for counted in at_least], axis=1)
+    fleet = at_least[:, :4] - at_least[:, 1:]
+    valid &= at_least[:, 4] == 0
+    valid &= (fleet == np.array([puzzle.ship_constraints for puzzle in puzzles])).all(axis=1)
+    return valid
+
+
+def verify_batch(puzzles: Sequence[Puzzle], solutions: Sequence[Optional[str]]) -> List[bool]:
+    """puzzle.verify for many solutions at once: sums, hints, ship shapes, no touching ships and the fleet are
+    checked for all solutions of a board size together on stacked arrays. None, for a puzzle without a
+    solution, never verifies. Without numpy the solutions are verified one at a time."""
+    if np is None:
+        return [solution is not None and verify(puzzle, solution) for puzzle, solution in zip(puzzles, solutions)]
+    results = [False] * len(puzzles)
+    by_size: Dict[int, List[int]] = {}
+    for index, puzzle in enumerate(puzzles):
+        by_size.setdefault(puzzle.size, []).append(index)
+    for size, indices in by_size.items():
+        valid = verify_size([puzzles[index] for index in indices], [solutions[index] for index in indices], size)
+        for index, ok in zip(indices, valid):
+            results[index] = bool(ok)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfiles",
+        type=str,
+        nargs="+",
+        required=True,
+        help="The input files that contain the puzzles."
+    )
+    parser.add_argument(
+        "--outputfiles",
+        type=str,
+        nargs="+",
+        required=True,
+        help="The output files that contain the solutions, one per input file in the same order."
+    )
+    args = parser.parse_args()
+    if len(args.inputfiles) != len(args.outputfiles):
+        parser.error("{} input files but {} output files".format(len(args.inputfiles), len(args.outputfiles)))
+    puzzles = [read_puzzle(path) for path in args.inputfiles]
+    solutions = []
+    for path in args.outputfiles:
+        with open(path, "r") as file:
+            solutions.append(file.read())
+    results = verify_batch(puzzles, solutions)
+    for path, ok in zip(args.outputfiles, results):
+        if not ok:
+            print("invalid: {}".format(path))
+    print("verified {} of {} solutions".format(sum(results), len(results)))
+    sys.exit(0 if all(results) else 1)